@@ -0,0 +1,155 @@
+import logging
+import shutil
+import subprocess
+import threading
+import time
+
+# get_throttled bits that are active right now: under-voltage, ARM frequency capped,
+# currently throttled, soft temperature limit
+THROTTLED_NOW_MASK = 0xF
+
+
+class SystemMonitor:
+    """
+    Reads SoC temperature, throttling state and battery level from sysfs (and vcgencmd on
+    Raspberry Pi OS images without the sysfs throttling node). Readings are cached for
+    poll_interval seconds, so calling read() every cycle stays cheap.
+    Signals that are not available on the device read as None.
+    """
+
+    THROTTLED_PATH = "/sys/devices/platform/soc/soc:firmware/get_throttled"
+
+    def __init__(self, thermal_path="/sys/class/thermal/thermal_zone0/temp",
+                 battery_path="/sys/class/power_supply/BAT0/capacity", poll_interval=5.0):
+        self.thermal_path = thermal_path
+        self.battery_path = battery_path
+        self.poll_interval = float(poll_interval)
+        self._vcgencmd = shutil.which("vcgencmd")
+        self._last_read = None
+        self._readings = {}
+
+    def read(self):
+        """
+        Returns {"soc_temperature" (°C), "throttled" (bool), "battery" (%)}.
+        """
+        now = time.monotonic()
+        if self._last_read is None or now - self._last_read >= self.poll_interval:
+            self._last_read = now
+            millidegrees = self._read_number(self.thermal_path)
+            self._readings = {
+                "soc_temperature": millidegrees / 1000.0 if millidegrees is not None else None,
+                "throttled": self._read_throttled(),
+                "battery": self._read_number(self.battery_path)
+            }
+        return self._readings
+
+    def _read_number(self, path):
+        try:
+            with open(path, "r") as f:
+                return float(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def _read_throttled(self):
+        value = None
+        try:
+            with open(self.THROTTLED_PATH, "r") as f:
+                value = int(f.read().strip(), 16)
+        except (OSError, ValueError):
+            if self._vcgencmd:
+                try:
+                    output = subprocess.run([self._vcgencmd, "get_throttled"], capture_output=True,
+                                            text=True, timeout=1.0).stdout
+                    value = int(output.strip().split("=")[1], 16)
+                except (OSError, subprocess.SubprocessError, IndexError, ValueError):
+                    value = None
+        return bool(value & THROTTLED_NOW_MASK) if value is not None else None
+
+
+class AdaptiveRate:
+    """
+    Adjusts the sampling interval between min_interval and max_interval.
+
+    The interval grows by slow_factor when the node is under pressure: the SoC is above
+    temp_high, the firmware reports throttling, the battery is below battery_low, or the
+    pipeline queues hold more than max_backlog items. Below battery_critical the node runs
+    at max_interval. When the SoC is below temp_low and nothing else is under pressure, the
+    interval shrinks by speedup_factor. The interval never drops below latency_headroom times
+    the measured inference latency (EWMA), so the interpreter keeps some idle time. The
+    interval changes at most once every adjust_every seconds to avoid oscillation.
+    """
+
+    def __init__(self, interval, min_interval=1.0, max_interval=30.0, monitor=None, adjust_every=10.0,
+                 temp_high=75.0, temp_low=65.0, battery_low=30.0, battery_critical=10.0,
+                 max_backlog=2, latency_headroom=1.5, slow_factor=1.5, speedup_factor=0.8):
+        self.min_interval = float(min_interval)
+        self.max_interval = float(max(max_interval, min_interval))
+        self.interval = min(max(float(interval), self.min_interval), self.max_interval)
+        self.monitor = monitor or SystemMonitor()
+        self.adjust_every = float(adjust_every)
+        self.temp_high = temp_high
+        self.temp_low = temp_low
+        self.battery_low = battery_low
+        self.battery_critical = battery_critical
+        self.max_backlog = max_backlog
+        self.latency_headroom = float(latency_headroom)
+        self.slow_factor = float(slow_factor)
+        self.speedup_factor = float(speedup_factor)
+
+        self.latency = None
+        self.reason = "initial"
+        self._last_adjust = time.monotonic()
+        self._lock = threading.Lock()
+
+    def observe_latency(self, seconds, alpha=0.2):
+        """
+        Feeds one measured inference latency into the moving average.
+        """
+        with self._lock:
+            self.latency = seconds if self.latency is None else (1 - alpha) * self.latency + alpha * seconds
+
+    def update(self, backlog=0):
+        """
+        Re-evaluates the signals and returns the (possibly new) interval in seconds.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_adjust < self.adjust_every:
+                return self.interval
+            self._last_adjust = now
+
+            readings = self.monitor.read()
+            soc_temperature = readings.get("soc_temperature")
+            battery = readings.get("battery")
+
+            pressure = []
+            if soc_temperature is not None and soc_temperature >= self.temp_high:
+                pressure.append(f"SoC at {soc_temperature:.1f} °C")
+            if readings.get("throttled"):
+                pressure.append("throttling")
+            if battery is not None and battery <= self.battery_low:
+                pressure.append(f"battery at {battery:.0f}%")
+            if backlog > self.max_backlog:
+                pressure.append(f"backlog of {backlog}")
+
+            if battery is not None and battery <= self.battery_critical:
+                interval, reason = self.max_interval, f"battery critical ({battery:.0f}%)"
+            elif pressure:
+                interval, reason = self.interval * self.slow_factor, ", ".join(pressure)
+            elif soc_temperature is None or soc_temperature <= self.temp_low:
+                interval, reason = self.interval * self.speedup_factor, "headroom"
+            else:
+                interval, reason = self.interval, "steady"
+
+            floor = self.min_interval
+            if self.latency is not None and self.latency * self.latency_headroom > floor:
+                floor = self.latency * self.latency_headroom
+                if interval < floor:
+                    reason = f"inference latency {self.latency * 1000:.0f} ms"
+            interval = min(max(interval, floor), self.max_interval)
+
+            if abs(interval - self.interval) > 1e-3:
+                logging.info(f"Sampling interval {self.interval:.2f}s -> {interval:.2f}s ({reason})")
+            self.interval = interval
+            self.reason = reason
+            return self.interval
@@ -0,0 +1,109 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Collects frames submitted from one or more threads and dispatches them to
+    InferenceEngine.predict_batch in groups. A batch is dispatched as soon as it
+    holds max_batch_size frames or max_wait_ms have passed since its first frame.
+    """
+
+    def __init__(self, engine, max_batch_size=4, max_wait_ms=20):
+        self.engine = engine
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.batches = 0
+        self.frames = 0
+
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """
+        Starts the background dispatch thread.
+        """
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """
+        Stops the dispatch thread after flushing frames that are already pending.
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, frame):
+        """
+        Queues a frame for batched inference.
+
+        Parameters:
+            frame (np.ndarray): Input shaped like model.input_shape
+
+        Returns:
+            Future: Resolves to the model output for this frame (leading batch axis of 1);
+                    its engine attribute is the engine that ran the batch
+        """
+        future = Future()
+        with self._cond:
+            if not self._running:
+                raise RuntimeError("MicroBatcher is not running.")
+            self._pending.append((frame, future))
+            self._cond.notify_all()
+        return future
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending and self._running:
+                self._cond.wait()
+            if not self._pending:
+                return None
+
+            deadline = time.monotonic() + self.max_wait
+            while self._running and len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            count = min(self.max_batch_size, len(self._pending))
+            return [self._pending.popleft() for _ in range(count)]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+
+            futures = [future for _, future in batch if future.set_running_or_notify_cancel()]
+            frames = [frame for frame, future in batch if future.running()]
+            if not frames:
+                continue
+            # A hot reload may swap the engine; each result records the one that produced it
+            engine = self.engine
+            try:
+                outputs = engine.predict_batch(frames)
+            except Exception as e:
+                logging.error(f"Batched inference failed: {e}")
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.frames += len(frames)
+            for i, future in enumerate(futures):
+                future.engine = engine
+                future.set_result(outputs[i:i + 1])
@@ -1,31 +1,330 @@
-import json
+import gzip
 import logging
+import socket
+import threading
+import time
 import requests
 import numpy as np
 import paho.mqtt.client as mqtt
+from collections import deque
 from config import Config
+from spool import DiskSpool
+from payload_codec import get_codec
+from metrics import REGISTRY, STAGE_SECONDS
+
+SERIALIZE_SECONDS = STAGE_SECONDS.labels("serialize")
+# 4xx responses that signal back-pressure rather than an invalid message
+RETRYABLE_REST_STATUS = (408, 429)
+PUBLISH_FAILURES = REGISTRY.counter(
+    "edge_publish_failures_total", "Failed MQTT/REST delivery attempts", labels=("channel",)
+)
+PUBLISHED_EVENTS = REGISTRY.counter(
+    "edge_publish_events_total", "Results published by the delta policy, by trigger", labels=("reason",)
+)
+SUPPRESSED_RESULTS = REGISTRY.counter(
+    "edge_publish_suppressed_total", "Results not published because nothing relevant changed"
+)
+
+
+def top_class(result):
+    """
+    Returns (class, confidence) of the highest-scoring class of a result: the first class
+    of a postprocessed result, or the argmax of a raw output. (None, None) if unknown.
+    """
+    if isinstance(result, dict):
+        classes = result.get("classes") or []
+        scores = result.get("scores") or []
+        if not classes:
+            return None, None
+        return classes[0], float(scores[0]) if scores else None
+    try:
+        values = np.asarray(result, dtype=np.float32).ravel()
+    except (TypeError, ValueError):
+        return None, None
+    if values.size == 0:
+        return None, None
+    index = int(values.argmax())
+    return index, float(values[index])
+
+
+class DeltaPolicy:
+    """
+    Publishes a result only when it carries news compared with the last published result
+    of the same stream (its "source", one per camera): the top class changed, its
+    confidence moved more than confidence_band away from the last published confidence,
+    or the temperature moved more than temperature_deadband. Small changes do not move
+    the reference values, so slow drifts are still reported once they add up.
+
+    A heartbeat is published when nothing was sent for heartbeat_interval seconds. Every
+    published payload gets "event" (what triggered it) and "suppressed" (results skipped
+    since the previous one).
+    """
+
+    def __init__(self, confidence_band=0.1, temperature_deadband=0.5, heartbeat_interval=60.0):
+        self.confidence_band = float(confidence_band)
+        self.temperature_deadband = float(temperature_deadband)
+        self.heartbeat_interval = float(heartbeat_interval)
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def filter(self, data, top1=None):
+        """
+        Returns the payload to publish (annotated with "event" and "suppressed"), or None
+        if it should be suppressed. top1 is the (class, score) of a raw result, dequantized
+        by the engine; without it the result must be postprocessed (or already real-valued).
+        """
+        label, confidence = top1 if top1 is not None else top_class(data.get("result"))
+        temperature = data.get("temperature")
+        key = data.get("source", "")
+        now = time.monotonic()
+
+        with self._lock:
+            last = self._last.get(key)
+            if last is None:
+                reason = "initial"
+            elif label != last["class"]:
+                reason = "class_change"
+            elif (confidence is not None and last["confidence"] is not None
+                  and abs(confidence - last["confidence"]) > self.confidence_band):
+                reason = "confidence"
+            elif temperature is not None and (
+                    last["temperature"] is None
+                    or abs(temperature - last["temperature"]) > self.temperature_deadband):
+                reason = "temperature"
+            elif now - last["published_at"] >= self.heartbeat_interval:
+                reason = "heartbeat"
+            else:
+                last["suppressed"] += 1
+                SUPPRESSED_RESULTS.inc()
+                return None
+
+            suppressed = last["suppressed"] if last else 0
+            self._last[key] = {
+                "class": label,
+                "confidence": confidence,
+                "temperature": temperature,
+                "published_at": now,
+                "suppressed": 0
+            }
+        PUBLISHED_EVENTS.labels(reason).inc()
+        return dict(data, event=reason, suppressed=suppressed)
+
+    def reset(self):
+        """
+        Forgets the last published values, so the next result of every stream is published.
+        """
+        with self._lock:
+            self._last.clear()
+
+
+class DeliveryWorker:
+    """
+    Delivers serialized messages for one channel (MQTT or REST) on a background thread.
+
+    Messages wait in a bounded in-memory queue. When that queue is full, or as soon as a
+    delivery fails, messages are spilled to the on-disk spool (if configured) so they
+    survive long outages and restarts. Each message carries a sequence number, so
+    delivery is always in publish order, whether it comes from memory or from disk.
+    Failed deliveries are retried with exponential backoff.
+
+    send receives a list of message bodies. With batch_size > 1, up to batch_size
+    messages are grouped, waiting at most batch_max_wait seconds for a batch to fill.
+    """
+
+    def __init__(self, name, send, spool=None, queue_size=100, backoff_initial=1.0, backoff_max=60.0,
+                 batch_size=1, batch_max_wait=0.0):
+        self.name = name
+        self.send = send
+        self.spool = spool
+        self.queue_size = max(1, int(queue_size))
+        self.backoff_initial = float(backoff_initial)
+        self.backoff_max = float(backoff_max)
+        self.batch_size = max(1, int(batch_size))
+        self.batch_max_wait = float(batch_max_wait)
+
+        self.delivered = 0
+        self.failures = 0
+        self.dropped = 0
+
+        self._memory = deque()
+        self._spooled = spool.count(name) if spool else 0
+        self._seq = (spool.last_seq(name) + 1) if spool else 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+        if self._spooled:
+            logging.info(f"{self.name}: {self._spooled} spooled messages pending from a previous run")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"publisher-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """
+        Stops the worker and moves undelivered in-memory messages to the spool.
+        """
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._cond:
+            if self.spool:
+                self._spill_memory()
+            elif self._memory:
+                logging.warning(f"{self.name}: {len(self._memory)} undelivered messages discarded on shutdown")
+
+    def submit(self, body):
+        """
+        Queues a serialized message for delivery. Never blocks on the network.
+        """
+        with self._cond:
+            seq = self._seq
+            self._seq += 1
+            if len(self._memory) >= self.queue_size:
+                if self.spool:
+                    self.spool.append(self.name, seq, body)
+                    self._spooled += 1
+                else:
+                    self._memory.popleft()
+                    self.dropped += 1
+                    self._memory.append((seq, body, time.monotonic()))
+            else:
+                self._memory.append((seq, body, time.monotonic()))
+            self._cond.notify_all()
+
+    def pending(self):
+        with self._cond:
+            return len(self._memory) + self._spooled
+
+    def _next_batch(self):
+        """
+        Returns the oldest pending messages as a list of (seq, body), plus whether they
+        come from the spool. Returns (None, False) if nothing is pending.
+        """
+        with self._cond:
+            if not self._memory and not self._spooled:
+                self._cond.wait(1.0)
+
+            if self._spooled:
+                head_seq = self._memory[0][0] if self._memory else None
+                rows = self.spool.peek(self.name, self.batch_size)
+                rows = [row for row in rows if head_seq is None or row[0] < head_seq]
+                if rows:
+                    return rows, True
+                if not self.spool.peek(self.name, 1):
+                    self._spooled = 0
+
+            if not self._memory:
+                return None, False
+
+            # Give a partial batch up to batch_max_wait seconds (since its oldest message) to fill
+            while (len(self._memory) < self.batch_size and not self._stop.is_set()
+                   and not self._spooled):
+                remaining = self._memory[0][2] + self.batch_max_wait - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            count = min(self.batch_size, len(self._memory))
+            return [(self._memory[i][0], self._memory[i][1]) for i in range(count)], False
+
+    def _spill_memory(self):
+        # Caller holds self._cond
+        if self._memory:
+            self.spool.append_many(self.name, [(seq, body) for seq, body, _ in self._memory])
+            self._spooled += len(self._memory)
+            self._memory.clear()
+
+    def _run(self):
+        backoff = self.backoff_initial
+        while not self._stop.is_set():
+            batch, from_spool = self._next_batch()
+            if not batch:
+                continue
+
+            if self.send([body for _, body in batch]):
+                with self._cond:
+                    if from_spool:
+                        self.spool.delete(self.name, [seq for seq, _ in batch])
+                        self._spooled -= len(batch)
+                    else:
+                        sent = {seq for seq, _ in batch}
+                        while self._memory and self._memory[0][0] in sent:
+                            self._memory.popleft()
+                self.delivered += len(batch)
+                backoff = self.backoff_initial
+                continue
+
+            self.failures += 1
+            if self.spool:
+                with self._cond:
+                    self._spill_memory()
+            logging.warning(f"{self.name}: delivery failed, retrying in {backoff:.1f}s ({self.pending()} pending)")
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, self.backoff_max)
+
 
 class Communicator:
     """
     Manages outgoing communication via MQTT and/or REST based on configuration.
     Sends inference results and additional sensor data to configured endpoints.
+
+    With communication.publisher.async enabled, publish_result only queues the message;
+    background workers deliver it and store it on disk while the network is unavailable.
+    With communication.policy.mode "delta", results that repeat the last published one
+    are dropped by a DeltaPolicy before serialization.
     """
 
-    def __init__(self, config_path="config/settings.yaml"):
-        self.cfg = Config(config_path)
+    def __init__(self, config_path="config/settings.yaml", config=None):
+        self.cfg = config or Config.load(config_path)
 
         # MQTT setup
         mqtt_cfg = self.cfg.get("communication", "mqtt", default={})
         self.mqtt_enabled = mqtt_cfg.get("enabled", False)
         self.mqtt_topic = mqtt_cfg.get("topic", "rpi/ai/results")
+        self.mqtt_qos = mqtt_cfg.get("qos", 0)
+        self.mqtt_codec = get_codec(mqtt_cfg.get("codec", "json"), float16=mqtt_cfg.get("float16", False))
+        self.mqtt_metrics_topic = self.cfg.get("metrics", "mqtt_topic")
         self.mqtt_client = None
 
+        # Identifier added to every payload so receivers can tell nodes apart; it must be
+        # unique per node, so it defaults to the hostname rather than a shared value
+        self.node_id = self.cfg.get("communication", "node_id") or socket.gethostname()
+        # Sequence number and send time added to every payload, so receivers can detect
+        # lost messages and measure latency (the sequence restarts at 0 with the process)
+        self._seq = 0
+        self._seq_lock = threading.Lock()
+
+        # Publish every result, or only changes plus heartbeats
+        policy_cfg = self.cfg.get("communication", "policy", default={})
+        self.policy = None
+        if policy_cfg.get("mode", "all") == "delta":
+            self.policy = DeltaPolicy(
+                confidence_band=policy_cfg.get("confidence_band", 0.1),
+                temperature_deadband=policy_cfg.get("temperature_deadband", 0.5),
+                heartbeat_interval=policy_cfg.get("heartbeat_interval", 60)
+            )
+
+        # Delivery settings
+        publisher_cfg = self.cfg.get("communication", "publisher", default={})
+        self.async_enabled = publisher_cfg.get("async", False)
+        self.publish_timeout = publisher_cfg.get("timeout", 2)
+
         if self.mqtt_enabled:
             try:
                 self.mqtt_client = mqtt.Client()
-                self.mqtt_client.connect(mqtt_cfg["broker"], mqtt_cfg["port"])
-                self.mqtt_client.loop_start()
-                logging.info(f"MQTT connected to {mqtt_cfg['broker']}:{mqtt_cfg['port']}")
+                if self.async_enabled:
+                    # Let the network loop keep retrying, even if the broker is down at startup
+                    self.mqtt_client.connect_async(mqtt_cfg["broker"], mqtt_cfg["port"])
+                    self.mqtt_client.loop_start()
+                    logging.info(f"MQTT connecting to {mqtt_cfg['broker']}:{mqtt_cfg['port']} in background")
+                else:
+                    self.mqtt_client.connect(mqtt_cfg["broker"], mqtt_cfg["port"])
+                    self.mqtt_client.loop_start()
+                    logging.info(f"MQTT connected to {mqtt_cfg['broker']}:{mqtt_cfg['port']}")
             except Exception as e:
                 logging.error(f"Failed to connect to MQTT broker: {e}")
                 self.mqtt_enabled = False
@@ -34,47 +333,175 @@ class Communicator:
         rest_cfg = self.cfg.get("communication", "rest", default={})
         self.rest_enabled = rest_cfg.get("enabled", False)
         self.rest_endpoint = rest_cfg.get("endpoint", "")
+        self.rest_batch_endpoint = rest_cfg.get("batch_endpoint", "")
+        self.rest_batch_size = rest_cfg.get("batch_size", 1) if self.rest_batch_endpoint else 1
+        self.rest_gzip = rest_cfg.get("gzip", False)
+        self.rest_codec = get_codec(rest_cfg.get("codec", "json"), float16=rest_cfg.get("float16", False))
+        # Keep-alive connection pool reused by every POST
+        self.session = requests.Session()
+
+        # Background delivery workers (one per channel) with optional disk spool
+        self.spool = None
+        self.workers = {}
+        if self.async_enabled:
+            spool_path = publisher_cfg.get("spool_path")
+            if spool_path:
+                max_mb = publisher_cfg.get("spool_max_mb", 50)
+                self.spool = DiskSpool(spool_path, max_bytes=max_mb * 1024 * 1024)
+            channels = []
+            if self.mqtt_enabled and self.mqtt_client:
+                channels.append(("mqtt", self._send_mqtt, 1, 0.0))
+            if self.rest_enabled and self.rest_endpoint:
+                channels.append(("rest", self._send_rest, self.rest_batch_size,
+                                 rest_cfg.get("batch_max_wait", 1.0)))
+            for name, send, batch_size, batch_max_wait in channels:
+                worker = DeliveryWorker(
+                    name, send, spool=self.spool,
+                    queue_size=publisher_cfg.get("queue_size", 100),
+                    backoff_initial=publisher_cfg.get("backoff_initial", 1.0),
+                    backoff_max=publisher_cfg.get("backoff_max", 60.0),
+                    batch_size=batch_size,
+                    batch_max_wait=batch_max_wait
+                )
+                worker.start()
+                self.workers[name] = worker
 
-    def publish_result(self, data: dict):
+        REGISTRY.callback(
+            "edge_publish_pending", "Messages waiting for delivery (memory and spool)",
+            lambda: {name: worker.pending() for name, worker in self.workers.items()}, label="channel"
+        )
+        REGISTRY.callback(
+            "edge_publish_dropped_total", "Messages discarded because the delivery queue was full",
+            lambda: {name: worker.dropped for name, worker in self.workers.items()},
+            type="counter", label="channel"
+        )
+
+    def publish_result(self, data: dict, top1=None):
         """
         Publishes a data dictionary containing inference result and sensor readings.
         Example: {"result": np.array([...]), "temperature": 23.5}
 
         Parameters:
             data (dict): Inference and sensor data
+            top1 (tuple): (class, score) of a raw result on the probability scale, used by
+                          the delta policy instead of the raw (possibly quantized) values
         """
-        # Prepare payload for publishing
+        if self.policy:
+            data = self.policy.filter(data, top1)
+            if data is None:
+                return
+        with self._seq_lock:
+            seq = self._seq
+            self._seq += 1
+        data = dict(data, seq=seq, sent_at=round(time.time(), 3))
+        if self.node_id and "node" not in data:
+            data["node"] = self.node_id
+
+        # Serialize the payload once per codec in use
+        channels = []
+        if self.mqtt_enabled and self.mqtt_client:
+            channels.append(("mqtt", self.mqtt_codec, self._send_mqtt))
+        if self.rest_enabled and self.rest_endpoint:
+            channels.append(("rest", self.rest_codec, self._send_rest))
+
+        bodies = {}
         try:
-            payload = {}
-            for key, value in data.items():
-                if isinstance(value, np.ndarray):
-                    payload[key] = value.tolist()
-                else:
-                    payload[key] = value
+            with SERIALIZE_SECONDS.time():
+                for _, codec, _ in channels:
+                    if codec.name not in bodies:
+                        bodies[codec.name] = codec.encode(data)
         except Exception as e:
             logging.error(f"Failed to serialize payload: {e}")
+            PUBLISH_FAILURES.labels("serialize").inc()
             return
 
-        # Send via MQTT
-        if self.mqtt_enabled and self.mqtt_client:
-            try:
-                self.mqtt_client.publish(self.mqtt_topic, json.dumps(payload))
-                logging.debug(f"MQTT published to {self.mqtt_topic}: {payload}")
-            except Exception as e:
-                logging.error(f"MQTT publish failed: {e}")
+        for name, codec, send in channels:
+            body = bodies[codec.name]
+            if self.async_enabled:
+                if name in self.workers:
+                    self.workers[name].submit(body)
+            else:
+                send([body])
 
-        # Send via REST
-        if self.rest_enabled and self.rest_endpoint:
-            try:
-                response = requests.post(self.rest_endpoint, json=payload, timeout=2)
-                logging.info(f"REST POST to {self.rest_endpoint} [status {response.status_code}]")
-            except Exception as e:
-                logging.error(f"REST POST failed: {e}")
+    def publish_metrics(self, body):
+        """
+        Publishes a metrics snapshot to the MQTT metrics topic (best effort, QoS 0).
+        """
+        if self.mqtt_enabled and self.mqtt_client and self.mqtt_metrics_topic:
+            self.mqtt_client.publish(self.mqtt_metrics_topic, body, qos=0)
+
+    def _send_mqtt(self, bodies):
+        """
+        Publishes serialized messages to the MQTT topic. Returns True on success.
+        """
+        with STAGE_SECONDS.labels("send_mqtt").time():
+            for body in bodies:
+                if not self._publish_mqtt(body):
+                    PUBLISH_FAILURES.labels("mqtt").inc()
+                    return False
+        return True
+
+    def _publish_mqtt(self, body):
+        try:
+            info = self.mqtt_client.publish(self.mqtt_topic, body, qos=self.mqtt_qos)
+            if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                logging.error(f"MQTT publish failed: {mqtt.error_string(info.rc)}")
+                return False
+            if self.mqtt_qos > 0:
+                info.wait_for_publish(timeout=self.publish_timeout)
+                if not info.is_published():
+                    logging.error("MQTT publish not acknowledged by broker")
+                    return False
+            logging.debug(f"MQTT published {len(body)} bytes to {self.mqtt_topic}")
+            return True
+        except Exception as e:
+            logging.error(f"MQTT publish failed: {e}")
+            return False
+
+    def _send_rest(self, bodies):
+        """
+        POSTs serialized messages to the REST endpoint: a single message to the results
+        endpoint, several as one encoded array to the batch endpoint. Returns True if they
+        were accepted or rejected as invalid (4xx), since retrying cannot succeed. Server
+        errors, 408 Request Timeout and 429 Too Many Requests return False to be retried.
+        """
+        if len(bodies) == 1:
+            endpoint, data = self.rest_endpoint, bodies[0]
+        else:
+            endpoint, data = self.rest_batch_endpoint, self.rest_codec.encode_batch(bodies)
+
+        headers = {"Content-Type": self.rest_codec.content_type}
+        if self.rest_gzip:
+            data = gzip.compress(data, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+
+        try:
+            with STAGE_SECONDS.labels("send_rest").time():
+                response = self.session.post(endpoint, data=data, headers=headers, timeout=self.publish_timeout)
+            logging.info(f"REST POST of {len(bodies)} message(s) to {endpoint} [status {response.status_code}]")
+            status = response.status_code
+            if status >= 400:
+                PUBLISH_FAILURES.labels("rest").inc()
+            if status in RETRYABLE_REST_STATUS:
+                logging.warning(f"REST endpoint is overloaded [status {status}]; will retry")
+                return False
+            if 400 <= status < 500:
+                logging.error(f"REST endpoint rejected message [status {status}]; discarding it")
+            return status < 500
+        except Exception as e:
+            logging.error(f"REST POST failed: {e}")
+            PUBLISH_FAILURES.labels("rest").inc()
+            return False
 
     def stop(self):
         """
-        Cleanly disconnects from MQTT if active.
+        Stops delivery workers (spooling undelivered messages) and disconnects from MQTT if active.
         """
+        for worker in self.workers.values():
+            worker.stop()
+        if self.spool:
+            self.spool.close()
+        self.session.close()
         if self.mqtt_client:
             self.mqtt_client.loop_stop()
-            self.mqtt_client.disconnect()
\ No newline at end of file
+            self.mqtt_client.disconnect()
@@ -1,20 +1,171 @@
-import yaml
 import os
+import threading
+from collections.abc import Mapping
+from types import MappingProxyType
+
+import yaml
+
+DEFAULT_CONFIG_PATH = "config/settings.yaml"
+
+
+def _merge(base, overrides):
+    """
+    Returns base with overrides merged in recursively (nested mappings are merged, other values replaced).
+    """
+    merged = dict(base)
+    for key, value in overrides.items():
+        if isinstance(value, Mapping) and isinstance(merged.get(key), Mapping):
+            value = _merge(merged[key], value)
+        merged[key] = value
+    return merged
+
+
+def _freeze(value):
+    """
+    Recursively turns dicts into read-only mappings and lists into tuples.
+    """
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
 
 class Config:
-    def __init__(self, config_path="config/settings.yaml"):
+    """
+    Read-only view of settings.yaml.
+
+    Config.load() parses and validates each file once per process and returns the same
+    instance afterwards, so main() can share one object with every component instead of
+    each of them re-reading the file. Sections are immutable mappings and lists are tuples.
+    """
+
+    _cache = {}
+    _cache_lock = threading.Lock()
+
+    def __init__(self, config_path=DEFAULT_CONFIG_PATH):
         with open(config_path, 'r') as f:
-            self.config = yaml.safe_load(f)
+            self.config = _freeze(yaml.safe_load(f) or {})
+        self.path = config_path
+
+    @classmethod
+    def load(cls, config_path=DEFAULT_CONFIG_PATH):
+        """
+        Returns the cached, validated Config for config_path, loading it on first use.
+        """
+        key = os.path.abspath(config_path)
+        with cls._cache_lock:
+            config = cls._cache.get(key)
+            if config is None:
+                config = cls(config_path)
+                config.validate()
+                cls._cache[key] = config
+            return config
+
+    def with_overrides(self, overrides):
+        """
+        Returns a new validated Config with overrides (a nested dict) merged into this one,
+        e.g. {"communication": {"node_id": "node-7"}}. The cached instance is not modified.
+        """
+        config = object.__new__(type(self))
+        config.config = _freeze(_merge(self.config, overrides))
+        config.path = self.path
+        return config.validate()
 
     def get(self, *keys, default=None):
         """Access config with dot-like syntax, e.g., get('model', 'path')"""
         value = self.config
         for key in keys:
-            value = value.get(key, {})
-        return value or default
+            if not isinstance(value, Mapping) or key not in value:
+                return default
+            value = value[key]
+        # Explicit false/0/"" values are kept; only missing or null keys fall back to the default
+        return default if value is None else value
+
+    def validate(self):
+        """
+        Checks the settings the edge node cannot start without and raises ValueError
+        listing every problem found.
+        """
+        errors = []
+        model_path = self.get("model", "path")
+        if not isinstance(model_path, str) or not model_path.endswith((".tflite", ".onnx")):
+            errors.append("model.path must be a .tflite or .onnx file")
+
+        input_shape = self.get("model", "input_shape")
+        if (not isinstance(input_shape, tuple) or len(input_shape) != 4
+                or not all(isinstance(d, int) and d > 0 for d in input_shape)):
+            errors.append("model.input_shape must be a list of 4 positive integers, e.g. [1, 224, 224, 3]")
+
+        num_threads = self.get("model", "num_threads")
+        if num_threads is not None and (not isinstance(num_threads, int) or num_threads < 1):
+            errors.append("model.num_threads must be a positive integer")
+
+        if self.get("model", "update", "enabled", default=False) and not self.get("model", "update", "info_url"):
+            errors.append("model.update.info_url is required when model updates are enabled")
+
+        interval = self.get("sensors", "read_interval", default=5)
+        if not isinstance(interval, (int, float)) or interval <= 0:
+            errors.append("sensors.read_interval must be a positive number of seconds")
+
+        for i, camera in enumerate(self.get("sensors", "cameras", default=())):
+            if not isinstance(camera, Mapping) or not isinstance(camera.get("index"), int):
+                errors.append(f"sensors.cameras[{i}] must have an integer index")
+            elif camera.get("replay") is not None:
+                errors.extend(self._replay_errors(camera["replay"], f"sensors.cameras[{i}].replay"))
+        errors.extend(self._replay_errors(self.get("sensors", "replay", default={}), "sensors.replay"))
+
+        tiling = self.get("tiling", default={})
+        if tiling.get("enabled", False):
+            grid = tiling.get("grid", (2, 2))
+            if (not isinstance(grid, tuple) or len(grid) != 2
+                    or not all(isinstance(n, int) and n > 0 for n in grid)):
+                errors.append("tiling.grid must be [rows, cols] of positive integers")
+            overlap = tiling.get("overlap", 0.2)
+            if not isinstance(overlap, (int, float)) or not 0 <= overlap < 1:
+                errors.append("tiling.overlap must be a fraction between 0 and 1")
+            for i, roi in enumerate(tiling.get("rois") or ()):
+                if (not isinstance(roi, tuple) or len(roi) != 4
+                        or not all(isinstance(v, (int, float)) and v >= 0 for v in roi) or not roi[2] or not roi[3]):
+                    errors.append(f"tiling.rois[{i}] must be [x, y, width, height]")
+
+        mode = self.get("runtime", "mode", default="sequential")
+        if mode not in ("sequential", "pipelined"):
+            errors.append("runtime.mode must be 'sequential' or 'pipelined'")
+        overflow = self.get("runtime", "overflow_policy", default="drop_oldest")
+        if overflow not in ("drop_oldest", "block"):
+            errors.append("runtime.overflow_policy must be 'drop_oldest' or 'block'")
+
+        for channel in ("mqtt", "rest"):
+            codec = self.get("communication", channel, "codec", default="json")
+            if codec not in ("json", "msgpack", "cbor"):
+                errors.append(f"communication.{channel}.codec must be json, msgpack or cbor")
+        if self.get("communication", "policy", "mode", default="all") not in ("all", "delta"):
+            errors.append("communication.policy.mode must be 'all' or 'delta'")
+        if self.get("communication", "mqtt", "enabled", default=False):
+            if not self.get("communication", "mqtt", "broker"):
+                errors.append("communication.mqtt.broker is required when MQTT is enabled")
+
+        if errors:
+            raise ValueError(f"Invalid configuration in {self.path}: " + "; ".join(errors))
+        return self
+
+    @staticmethod
+    def _replay_errors(replay, name):
+        if not isinstance(replay, Mapping):
+            return [f"{name} must be a mapping"]
+        if not replay.get("enabled", False):
+            return []
+        errors = []
+        if not isinstance(replay.get("path"), str):
+            errors.append(f"{name}.path must be a video file, image directory or .npy file")
+        rate = replay.get("rate")
+        if rate is not None and (not isinstance(rate, (int, float)) or rate < 0):
+            errors.append(f"{name}.rate must be a number of frames per second (0 = as fast as possible)")
+        return errors
 
 # Ejemplo de uso
 if __name__ == "__main__":
-    cfg = Config()
+    cfg = Config.load()
     print(cfg.get("model", "path"))
-    print(cfg.get("sensors", "read_interval"))
\ No newline at end of file
+    print(cfg.get("sensors", "read_interval"))
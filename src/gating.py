@@ -0,0 +1,104 @@
+import threading
+import time
+import numpy as np
+import cv2
+
+GATING_METHODS = ("diff", "phash")
+
+
+class ChangeGate:
+    """
+    Skips inference on frames that have not changed since the last inferred frame.
+
+    Each frame is reduced to a tiny grayscale signature and compared with the signature
+    of the last frame that actually went through the model:
+      - "diff": mean absolute difference of a downsampled frame, normalized to 0..1
+      - "phash": 64-bit difference hash (dHash), compared by Hamming distance
+    While the scene stays within the threshold, the cached result is reused until it is
+    older than max_reuse_age seconds.
+    """
+
+    def __init__(self, method="diff", diff_threshold=0.03, hash_threshold=6,
+                 grid_size=32, max_reuse_age=60):
+        if method not in GATING_METHODS:
+            raise ValueError(f"Unknown gating method '{method}'. Use one of {GATING_METHODS}.")
+        self.method = method
+        self.diff_threshold = float(diff_threshold)
+        self.hash_threshold = int(hash_threshold)
+        self.grid_size = int(grid_size)
+        self.max_reuse_age = float(max_reuse_age)
+
+        self.executed = 0
+        self.skipped = 0
+
+        self._reference = None
+        self._result = None
+        self._result_time = 0.0
+        self._lock = threading.Lock()
+
+    def check(self, frame):
+        """
+        Decides whether the frame needs inference.
+
+        Parameters:
+            frame (np.ndarray): Image shaped (H, W, 3) or (1, H, W, 3)
+
+        Returns:
+            tuple: (cached_result, signature). cached_result is None when inference must
+                   run; in that case pass the signature to update() with the new result.
+        """
+        signature = self._signature(frame)
+        with self._lock:
+            fresh = (time.monotonic() - self._result_time) <= self.max_reuse_age
+            if self._result is not None and fresh and not self._changed(signature):
+                self.skipped += 1
+                return self._result, signature
+            self.executed += 1
+            return None, signature
+
+    def update(self, signature, result):
+        """
+        Stores the result of an executed inference as the new reference.
+        """
+        with self._lock:
+            self._reference = signature
+            self._result = result
+            self._result_time = time.monotonic()
+
+    def reset(self):
+        """
+        Forgets the reference frame and cached result (e.g. after a model swap).
+        """
+        with self._lock:
+            self._reference = None
+            self._result = None
+
+    def stats(self):
+        """
+        Returns counters of executed and skipped inferences.
+        """
+        with self._lock:
+            return {"executed": self.executed, "skipped": self.skipped}
+
+    def _signature(self, frame):
+        if frame.ndim == 4:
+            frame = frame[0]
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+
+        if self.method == "phash":
+            # dHash: compare horizontally adjacent pixels of a 9x8 thumbnail
+            small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+            return np.packbits(small[:, 1:] > small[:, :-1])
+
+        return cv2.resize(gray, (self.grid_size, self.grid_size), interpolation=cv2.INTER_AREA)
+
+    def _changed(self, signature):
+        if self._reference is None:
+            return True
+        if self.method == "phash":
+            distance = int(np.unpackbits(np.bitwise_xor(signature, self._reference)).sum())
+            return distance > self.hash_threshold
+
+        diff = cv2.absdiff(signature, self._reference)
+        return float(diff.mean()) / 255.0 > self.diff_threshold
+
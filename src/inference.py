@@ -1,56 +1,286 @@
+import importlib.util
 import numpy as np
 from config import Config
 import logging
 import os
+from postprocess import Postprocessor
+from metrics import STAGE_SECONDS
 
-# For TFLite
-import tflite_runtime.interpreter as tflite
+# Backends are imported when the first model of that type is loaded (see _load_tflite/_load_onnx)
+ONNX_AVAILABLE = importlib.util.find_spec("onnxruntime") is not None
 
-# Optional: ONNX
-try:
+
+def _load_tflite():
+    """
+    Imports the TFLite interpreter module: tflite_runtime, or TensorFlow's copy as a fallback.
+    """
+    try:
+        import tflite_runtime.interpreter as tflite
+    except ImportError:
+        import tensorflow.lite as tflite
+    return tflite
+
+
+def _load_onnx():
     import onnxruntime as ort
-except ImportError:
-    ONNX_AVAILABLE = False
+    return ort
+
+# ONNX input element types mapped to numpy dtypes
+ONNX_DTYPES = {
+    "tensor(uint8)": np.uint8,
+    "tensor(int8)": np.int8,
+    "tensor(float)": np.float32,
+    "tensor(float16)": np.float16,
+}
+
+PREPROCESS_SECONDS = STAGE_SECONDS.labels("preprocess")
+INVOKE_SECONDS = STAGE_SECONDS.labels("invoke")
+POSTPROCESS_SECONDS = STAGE_SECONDS.labels("postprocess")
 
 class InferenceEngine:
-    def __init__(self, config_path="config/settings.yaml"):
-        self.config = Config(config_path)
-        self.model_path = self.config.get("model", "path")
+    def __init__(self, config_path="config/settings.yaml", model_path=None, num_threads=None, config=None):
+        # A Config shared by main() avoids re-reading settings.yaml
+        self.config = config or Config.load(config_path)
+        # model_path / num_threads override settings.yaml (used by benchmarks and validation)
+        self.model_path = model_path or self.config.get("model", "path")
+        self.num_threads = num_threads or self.config.get("model", "num_threads")
         self.input_shape = self.config.get("model", "input_shape")
         self.threshold = self.config.get("model", "threshold", default=0.5)
+        self.fused_preprocessing = self.config.get("model", "fused_preprocessing", default=False)
 
         if self.model_path.endswith(".tflite"):
             self.backend = "tflite"
-            self.interpreter = tflite.Interpreter(model_path=self.model_path)
+            tflite = _load_tflite()
+            self.interpreter = tflite.Interpreter(model_path=self.model_path, num_threads=self.num_threads)
             self.interpreter.allocate_tensors()
             self.input_details = self.interpreter.get_input_details()
             self.output_details = self.interpreter.get_output_details()
+            self._batch_size = 1
+            self._batch_supported = True
+            self.input_dtype = np.dtype(self.input_details[0]['dtype'])
+            self.input_quantization = tuple(self.input_details[0].get('quantization', (0.0, 0)))
         elif self.model_path.endswith(".onnx") and ONNX_AVAILABLE:
             self.backend = "onnx"
-            self.session = ort.InferenceSession(self.model_path)
+            ort = _load_onnx()
+            options = ort.SessionOptions()
+            if self.num_threads:
+                options.intra_op_num_threads = self.num_threads
+            self.session = ort.InferenceSession(self.model_path, sess_options=options)
             self.input_name = self.session.get_inputs()[0].name
+            # A fixed integer batch dimension means the exported graph cannot take batches
+            batch_dim = self.session.get_inputs()[0].shape[0]
+            self._batch_supported = not (isinstance(batch_dim, int) and batch_dim == 1)
+            self.input_dtype = np.dtype(ONNX_DTYPES.get(self.session.get_inputs()[0].type, np.uint8))
+            self.input_quantization = (0.0, 0)
+            self._input_buffers = {}
         else:
             raise ValueError("Unsupported model format or missing ONNXRuntime.")
 
         logging.info(f"Model loaded from {self.model_path} using {self.backend.upper()} backend")
         print("Expected input shape:", self.input_shape)
-        print("Model input details:", self.input_details)
+        if self.backend == "tflite":
+            print("Model input details:", self.input_details)
 
+        # Reused buffers for preprocessing raw camera frames into the model input
+        self._preprocessor = None
+        if self.fused_preprocessing:
+            self.preprocessor  # build it now so the first frame does not pay for it
+
+        # Output postprocessing: dequantization, top-k, threshold and labels
+        post_cfg = self.config.get("model", "postprocess", default={})
+        self.postprocess_enabled = post_cfg.get("enabled", False)
+        if self.backend == "tflite":
+            output_quantization = tuple(self.output_details[0].get('quantization', (0.0, 0)))
+        else:
+            output_quantization = (0.0, 0)
+        self.postprocessor = Postprocessor(
+            quantization=output_quantization,
+            top_k=post_cfg.get("top_k", 5),
+            threshold=self.threshold,
+            softmax=post_cfg.get("softmax", False),
+            labels_path=post_cfg.get("labels_path")
+        )
+
+    @property
+    def preprocessor(self):
+        """
+        Frame preprocessor, built on first use so OpenCV is only imported when raw frames
+        are actually fed to the engine.
+        """
+        if self._preprocessor is None:
+            from preprocess import Preprocessor
+            self._preprocessor = Preprocessor(
+                self.input_shape,
+                dtype=self.input_dtype,
+                quantization=self.input_quantization,
+                mean=self.config.get("model", "input_mean", default=127.5),
+                std=self.config.get("model", "input_std", default=127.5)
+            )
+        return self._preprocessor
 
     def predict(self, input_data: np.ndarray):
-        # Reshape y tipo correctos
-        input_data = input_data.astype(np.uint8).reshape(self.input_shape)
+        # Reshape y tipo correctos (sin copia si ya coinciden)
+        input_data = np.asarray(input_data).reshape(self.input_shape)
+        if input_data.dtype != self.input_dtype:
+            input_data = input_data.astype(self.input_dtype)
+
+        with INVOKE_SECONDS.time():
+            if self.backend == "tflite":
+                self._resize_batch(1)
+                self.interpreter.set_tensor(self.input_details[0]['index'], input_data)
+                self.interpreter.invoke()
+                output = self.interpreter.get_tensor(self.output_details[0]['index'])
+            elif self.backend == "onnx":
+                output = self.session.run(None, {self.input_name: input_data})[0]
+            else:
+                raise RuntimeError("Unsupported backend")
+
+        return output
+
+    def warmup(self, iterations=1):
+        """
+        Runs a few inferences on a zero input so that the first real frame does not pay
+        for lazy allocations and kernel initialization. Returns the engine itself.
+        """
+        dummy = np.zeros(self.input_shape, dtype=self.input_dtype)
+        for _ in range(iterations):
+            self.predict(dummy)
+        return self
+
+    def postprocess(self, output):
+        """
+        Reduces a raw output to the top-k classes above model.threshold (see Postprocessor.run).
+        """
+        with POSTPROCESS_SECONDS.time():
+            return self.postprocessor.run(output)
+
+    def top1(self, output):
+        """
+        Returns (class, score) of the best class of a raw output, dequantized like postprocess().
+        """
+        return self.postprocessor.top1(output)
 
+    def predict_frame(self, frame):
+        """
+        Runs inference on a raw BGR camera frame of any resolution.
+        The frame is resized and color-converted directly into the interpreter input
+        tensor (or a reused input buffer for ONNX), avoiding intermediate copies.
+
+        Parameters:
+            frame (np.ndarray): BGR frame shaped (H, W, 3) or (1, H, W, 3)
+
+        Returns:
+            np.ndarray: Model output
+        """
         if self.backend == "tflite":
-            self.interpreter.set_tensor(self.input_details[0]['index'], input_data)
-            self.interpreter.invoke()
-            output = self.interpreter.get_tensor(self.output_details[0]['index'])
+            self._resize_batch(1)
+            with PREPROCESS_SECONDS.time():
+                self._fill_input_tensor([frame])
+            with INVOKE_SECONDS.time():
+                self.interpreter.invoke()
+                return self.interpreter.get_tensor(self.output_details[0]['index'])
         elif self.backend == "onnx":
-            output = self.session.run(None, {self.input_name: input_data})[0]
+            batch = self._onnx_buffer(1)
+            with PREPROCESS_SECONDS.time():
+                self.preprocessor.run(frame, out=batch[0])
+            with INVOKE_SECONDS.time():
+                return self.session.run(None, {self.input_name: batch})[0]
         else:
             raise RuntimeError("Unsupported backend")
 
-        return output
+    def predict_batch(self, frames):
+        """
+        Runs inference on several frames with a single interpreter/session call.
+        Frames are raw BGR camera frames when fused preprocessing is enabled, otherwise
+        tensors holding exactly one sample shaped like model.input_shape.
+        Falls back to one invoke per frame if the model has a fixed batch dimension.
+
+        Parameters:
+            frames (list[np.ndarray]): Input frames
+
+        Returns:
+            np.ndarray: Model outputs stacked along the first axis (one row per frame)
+        """
+        if len(frames) == 0:
+            raise ValueError("predict_batch requires at least one frame.")
+        single = self.predict_frame if self.fused_preprocessing else self.predict
+
+        if not self._batch_supported or len(frames) == 1:
+            return np.concatenate([single(frame) for frame in frames])
+
+        if self.backend == "tflite":
+            if not self._resize_batch(len(frames)):
+                return np.concatenate([single(frame) for frame in frames])
+            with PREPROCESS_SECONDS.time():
+                if self.fused_preprocessing:
+                    self._fill_input_tensor(frames)
+                else:
+                    self.interpreter.set_tensor(self.input_details[0]['index'], self._stack(frames))
+            with INVOKE_SECONDS.time():
+                self.interpreter.invoke()
+                return self.interpreter.get_tensor(self.output_details[0]['index'])
+        elif self.backend == "onnx":
+            with PREPROCESS_SECONDS.time():
+                if self.fused_preprocessing:
+                    batch = self._onnx_buffer(len(frames))
+                    for i, frame in enumerate(frames):
+                        self.preprocessor.run(frame, out=batch[i])
+                else:
+                    batch = self._stack(frames)
+            with INVOKE_SECONDS.time():
+                return self.session.run(None, {self.input_name: batch})[0]
+        else:
+            raise RuntimeError("Unsupported backend")
+
+    def _stack(self, frames):
+        """
+        Stacks model-shaped samples into one batch array with the model input dtype.
+        """
+        sample_shape = self.input_shape[1:]
+        batch = np.empty([len(frames)] + list(sample_shape), dtype=self.input_dtype)
+        for i, frame in enumerate(frames):
+            batch[i] = np.asarray(frame).reshape(sample_shape)
+        return batch
+
+    def _fill_input_tensor(self, frames):
+        """
+        Preprocesses frames straight into the TFLite input tensor memory.
+        The tensor view is local so no reference outlives this call, as required
+        before invoke(), resize_tensor_input() or allocate_tensors().
+        """
+        tensor = self.interpreter.tensor(self.input_details[0]['index'])()
+        for i, frame in enumerate(frames):
+            self.preprocessor.run(frame, out=tensor[i])
+
+    def _onnx_buffer(self, batch_size):
+        """
+        Returns a reused ONNX input buffer for the given batch size.
+        """
+        if batch_size not in self._input_buffers:
+            shape = [batch_size] + list(self.input_shape[1:])
+            self._input_buffers[batch_size] = np.empty(shape, dtype=self.input_dtype)
+        return self._input_buffers[batch_size]
+
+    def _resize_batch(self, batch_size):
+        """
+        Resizes the TFLite input tensor to the given batch size, reallocating only on change.
+        Returns False (and restores a batch of 1) if the model cannot be resized.
+        """
+        if batch_size == self._batch_size:
+            return True
+        index = self.input_details[0]['index']
+        try:
+            self.interpreter.resize_tensor_input(index, [batch_size] + list(self.input_shape[1:]))
+            self.interpreter.allocate_tensors()
+            self._batch_size = batch_size
+            return True
+        except (RuntimeError, ValueError) as e:
+            logging.warning(f"Model does not support batch size {batch_size} ({e}). Using per-frame inference.")
+            self._batch_supported = False
+            self.interpreter.resize_tensor_input(index, list(self.input_shape))
+            self.interpreter.allocate_tensors()
+            self._batch_size = 1
+            return False
 
 
 # Basic Test
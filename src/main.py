@@ -3,11 +3,25 @@ from datetime import datetime
 import time
 import logging
 import numpy as np
-import cv2
+from concurrent.futures import ThreadPoolExecutor
 from config import Config
 from inference import InferenceEngine
 from sensors import SensorInput
 from communication import Communicator
+from pipeline import Pipeline, MultiSourcePipeline
+from batching import MicroBatcher
+from model_watcher import ModelWatcher
+from metrics import MetricsServer, MetricsPublisher
+
+def replay_interval(replay_cfg, default):
+    """
+    Returns the capture interval of an enabled replay with a rate: a fixed frame rate,
+    or 0 (as fast as the pipeline allows) with rate 0. Otherwise returns default.
+    """
+    if not replay_cfg.get("enabled", False) or "rate" not in replay_cfg:
+        return default
+    rate = replay_cfg["rate"]
+    return 1.0 / rate if rate > 0 else 0
 
 def main():
     # Configure logging to both file and console
@@ -23,49 +37,196 @@ def main():
         ]
     )
 
-    cfg = Config()
-
-    # Load AI model and configuration
-    engine = InferenceEngine()
-    input_shape = engine.input_shape
+    # Parsed and validated once, then shared by every component
+    cfg = Config.load()
     interval = cfg.get("sensors", "read_interval", default=5)
+    runtime_cfg = cfg.get("runtime", default={})
+    cameras = cfg.get("sensors", "cameras", default=[])
+    replay_cfg = cfg.get("sensors", "replay", default={})
+    interval = replay_interval(replay_cfg, interval)
+    # A camera entry's own replay (else sensors.replay, as in SensorInput) sets its capture rate
+    camera_intervals = [replay_interval(camera.get("replay") or replay_cfg, interval) for camera in cameras]
+
+    # Load AI model(s): one engine per inference worker in multi-camera mode
+    if cameras:
+        pool_cfg = runtime_cfg.get("pool", {})
+        workers = pool_cfg.get("workers") or min(len(cameras), os.cpu_count() or 1)
+        threads_per_engine = pool_cfg.get("num_threads") or max(1, (os.cpu_count() or 1) // workers)
+        load_engines = lambda: [
+            InferenceEngine(num_threads=threads_per_engine, config=cfg).warmup() for _ in range(workers)
+        ]
+    else:
+        load_engines = lambda: [InferenceEngine(config=cfg).warmup()]
+
+    # Load and warm up the model in the background while cameras and MQTT are set up
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-loader") as loader:
+        engines_future = loader.submit(load_engines)
+
+        # Initialize sensors and communication
+        if cameras:
+            sensors = [SensorInput(camera=camera, config=cfg) for camera in cameras]
+        else:
+            sensors = [SensorInput(config=cfg)]
+        comm = Communicator(config=cfg)
+
+        engines = engines_future.result()
+    engine = engines[0]
+
+    # Build the capture -> inference -> publish runtime
+    gating_cfg = cfg.get("gating", default={})
+
+    def build_gate():
+        from gating import ChangeGate
+        return ChangeGate(
+            method=gating_cfg.get("method", "diff"),
+            diff_threshold=gating_cfg.get("diff_threshold", 0.03),
+            hash_threshold=gating_cfg.get("hash_threshold", 6),
+            grid_size=gating_cfg.get("grid_size", 32),
+            max_reuse_age=gating_cfg.get("max_reuse_age", 60)
+        )
+
+    tiling_cfg = cfg.get("tiling", default={})
+
+    def build_tiler():
+        from tiling import TiledInference
+        return TiledInference(
+            grid=tiling_cfg.get("grid", (2, 2)),
+            overlap=tiling_cfg.get("overlap", 0.2),
+            rois=tiling_cfg.get("rois"),
+            gate_factory=build_gate if tiling_cfg.get("skip_unchanged", True) else None,
+            include_tiles=tiling_cfg.get("include_tiles", True)
+        )
 
-    # Initialize sensors and communication
-    sensor = SensorInput()
-    comm = Communicator()
+    adaptive_cfg = runtime_cfg.get("adaptive", {})
+    adaptive = None
+    if adaptive_cfg.get("enabled", False):
+        from adaptive import AdaptiveRate, SystemMonitor
+        adaptive = AdaptiveRate(
+            interval,
+            min_interval=adaptive_cfg.get("min_interval", 1),
+            max_interval=adaptive_cfg.get("max_interval", 30),
+            monitor=SystemMonitor(
+                thermal_path=adaptive_cfg.get("thermal_path", "/sys/class/thermal/thermal_zone0/temp"),
+                battery_path=adaptive_cfg.get("battery_path", "/sys/class/power_supply/BAT0/capacity")
+            ),
+            adjust_every=adaptive_cfg.get("adjust_every", 10),
+            temp_high=adaptive_cfg.get("temp_high", 75),
+            temp_low=adaptive_cfg.get("temp_low", 65),
+            battery_low=adaptive_cfg.get("battery_low", 30),
+            battery_critical=adaptive_cfg.get("battery_critical", 10),
+            max_backlog=adaptive_cfg.get("max_backlog", runtime_cfg.get("queue_size", 2)),
+            latency_headroom=adaptive_cfg.get("latency_headroom", 1.5)
+        )
 
-    logging.info(f"Starting inference loop every {interval} seconds...")
+    if cameras:
+        gates = None
+        if gating_cfg.get("enabled", False):
+            gates = {sensor.source_id: build_gate() for sensor in sensors}
+        tilers = None
+        if tiling_cfg.get("enabled", False):
+            tilers = {sensor.source_id: build_tiler() for sensor in sensors}
+        pipeline = MultiSourcePipeline(
+            sensors, engines, comm, interval,
+            queue_size=runtime_cfg.get("queue_size", 2),
+            overflow=runtime_cfg.get("overflow_policy", "drop_oldest"),
+            gates=gates,
+            adaptive=adaptive,
+            tilers=tilers,
+            intervals=camera_intervals
+        )
+        load = load_engines
+    else:
+        batching_cfg = runtime_cfg.get("batching", {})
+        batcher = None
+        if batching_cfg.get("enabled", False) and tiling_cfg.get("enabled", False):
+            logging.warning("runtime.batching is ignored with tiling: the tiles of each frame are already batched.")
+        elif batching_cfg.get("enabled", False):
+            batcher = MicroBatcher(
+                engine,
+                max_batch_size=batching_cfg.get("max_batch_size", 4),
+                max_wait_ms=batching_cfg.get("max_wait_ms", 20)
+            )
 
-    while True:
-        # Acquire inputs from all active sensors
-        data = sensor.get_input()
-        image = data["image"]
-        temperature = data.get("temperature")
+        pipeline = Pipeline(
+            sensors[0], engine, comm, interval,
+            mode=runtime_cfg.get("mode", "sequential"),
+            queue_size=runtime_cfg.get("queue_size", 2),
+            overflow=runtime_cfg.get("overflow_policy", "drop_oldest"),
+            batcher=batcher,
+            gate=build_gate() if gating_cfg.get("enabled", False) else None,
+            adaptive=adaptive,
+            tiler=build_tiler() if tiling_cfg.get("enabled", False) else None
+        )
+        load = lambda: InferenceEngine(config=cfg).warmup()
 
-        # Run inference on the image input
-        result = engine.predict(image)
-        logging.info(f"Inference result: {result}")
+    # Reload the model in the background whenever the model file is replaced
+    reload_cfg = cfg.get("model", "hot_reload", default={})
+    watcher = None
+    if reload_cfg.get("enabled", False):
+        watcher = ModelWatcher(
+            engine.model_path,
+            load=load,
+            on_ready=pipeline.swap_engine,
+            poll_interval=reload_cfg.get("poll_interval", 5),
+            settle_time=reload_cfg.get("settle_time", 1)
+        )
+        watcher.start()
 
-        # Log any additional sensor values (e.g., temperature)
-        if temperature is not None:
-            logging.info(f"Temperature reading: {temperature} °C")
+    # Pull new model versions from the receiver; ModelWatcher then hot-swaps them in
+    update_cfg = cfg.get("model", "update", default={})
+    fetcher = None
+    if update_cfg.get("enabled", False):
+        from model_fetcher import ModelFetcher
+        fetcher = ModelFetcher(
+            engine.model_path,
+            update_cfg["info_url"],
+            poll_interval=update_cfg.get("poll_interval", 300),
+            retry_interval=update_cfg.get("retry_interval", 10),
+            timeout=update_cfg.get("timeout", 30)
+        )
+        fetcher.start()
 
-        # Build payload with all available data
-        payload = {
-            "result": result,
-            "temperature": temperature
-        }
+    # Prometheus endpoint and optional periodic metrics snapshots over MQTT
+    metrics_cfg = cfg.get("metrics", default={})
+    metrics_server = None
+    metrics_publisher = None
+    if metrics_cfg.get("enabled", False):
+        metrics_server = MetricsServer(
+            host=metrics_cfg.get("host", "0.0.0.0"),
+            port=metrics_cfg.get("port", 9100)
+        )
+        try:
+            metrics_server.start()
+        except OSError as e:
+            logging.error(f"Failed to start metrics endpoint: {e}")
+            metrics_server = None
+        if metrics_cfg.get("mqtt_interval") and comm.mqtt_metrics_topic:
+            metrics_publisher = MetricsPublisher(
+                comm.publish_metrics,
+                interval=metrics_cfg["mqtt_interval"],
+                node_id=comm.node_id
+            )
+            metrics_publisher.start()
 
-        # Publish the result through communication channels (MQTT/REST)
-        comm.publish_result(payload)
+    try:
+        pipeline.run()
+    except KeyboardInterrupt:
+        logging.info("Interrupted by user. Stopping...")
+        pipeline.stop()
 
-        # Wait before the next sensor read
-        time.sleep(interval)
+    if fetcher:
+        fetcher.stop()
+    if watcher:
+        watcher.stop()
+    if metrics_publisher:
+        metrics_publisher.stop()
+    if metrics_server:
+        metrics_server.stop()
 
     # Cleanup: release hardware and communication resources
-    sensor.release()
+    for sensor in sensors:
+        sensor.release()
     comm.stop()
-    cv2.destroyAllWindows()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,371 @@
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets in seconds, from a fast preprocessing step to a slow network call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f"{k}=\"{v}\"" for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Timer:
+    """
+    Context manager that observes the elapsed monotonic time into a histogram.
+    """
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram.observe(time.perf_counter() - self._start)
+        return False
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+    def quantile(self, q, counts=None, count=None):
+        """
+        Estimates a quantile by linear interpolation inside the bucket that contains it.
+        """
+        if counts is None:
+            counts, _, count = self.snapshot()
+        if not count:
+            return None
+        rank = q * count
+        cumulative = 0
+        for i, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                if i == len(self.bounds):
+                    return lower
+                upper = self.bounds[i]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.bounds[-1]
+
+
+class _Metric:
+    """
+    A metric family: one child per combination of label values.
+    Children are created on first use and cached, so the hot path is a dict lookup.
+    """
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.label_names:
+            self._default = self.labels()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def items(self):
+        with self._lock:
+            return list(self._children.items())
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def expose(self):
+        return [f"{self.name}{_format_labels(self.label_names, values)} {_format_value(child.value)}"
+                for values, child in self.items()]
+
+    def collect(self):
+        return {",".join(values): child.value for values, child in self.items()}
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labels)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def expose(self):
+        lines = []
+        for values, child in self.items():
+            counts, total, count = child.snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(self.bounds + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.label_names, values, ("le", _format_value(float(bound))))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+    def collect(self):
+        summary = {}
+        for values, child in self.items():
+            counts, total, count = child.snapshot()
+            summary[",".join(values)] = {
+                "count": count,
+                "sum": round(total, 6),
+                "p50": child.quantile(0.5, counts, count),
+                "p90": child.quantile(0.9, counts, count),
+                "p99": child.quantile(0.99, counts, count)
+            }
+        return summary
+
+
+class CallbackMetric:
+    """
+    A counter or gauge whose value is read from a function at scrape time, for values
+    that components already track themselves (queue lengths, dropped items).
+    The function returns a number, or a dict mapping a label value to a number.
+    """
+
+    def __init__(self, name, documentation, function, type="gauge", label=None):
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+        self.type = type
+        self.label = label
+
+    def _values(self):
+        try:
+            value = self.function()
+        except Exception as e:
+            logging.debug(f"Metric {self.name} could not be read: {e}")
+            return {}
+        if isinstance(value, dict):
+            return value
+        return {"": value}
+
+    def expose(self):
+        lines = []
+        for key, value in self._values().items():
+            labels = _format_labels((self.label,), (key,)) if self.label and key != "" else ""
+            lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+    def collect(self):
+        values = self._values()
+        return values.get("", None) if list(values) == [""] else values
+
+
+class MetricsRegistry:
+    """
+    Holds all metrics of the process and renders them in the Prometheus text format.
+    Registering a name twice returns the existing metric (callbacks are replaced), so
+    components can be rebuilt, e.g. on a hot model reload, without duplicates.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name, documentation, labels=()):
+        return self._register(name, lambda: Counter(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(name, lambda: Histogram(name, documentation, labels, buckets))
+
+    def callback(self, name, documentation, function, type="gauge", label=None):
+        metric = CallbackMetric(name, documentation, function, type, label)
+        with self._lock:
+            self._metrics[name] = metric
+        return metric
+
+    def expose(self):
+        """
+        Returns all metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+    def collect(self):
+        """
+        Returns a compact dict of all metrics (histograms as count/sum/p50/p90/p99).
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.collect() for metric in metrics}
+
+    def _register(self, name, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+
+# Process-wide registry used by SensorInput, InferenceEngine, Communicator and Pipeline
+REGISTRY = MetricsRegistry()
+
+# Time spent in each step of a cycle: capture, preprocess, invoke, postprocess, serialize, send_<channel>
+STAGE_SECONDS = REGISTRY.histogram(
+    "edge_stage_duration_seconds", "Duration of each processing stage", labels=("stage",)
+)
+
+
+class MetricsServer:
+    """
+    Serves REGISTRY in the Prometheus text format at http://host:port/metrics
+    from a background thread.
+    """
+
+    def __init__(self, registry=REGISTRY, host="0.0.0.0", port=9100):
+        self.registry = registry
+        self.host = host
+        self.port = int(port)
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.expose().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+        logging.info(f"Metrics available at http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._thread:
+            self._thread.join(2.0)
+            self._thread = None
+
+
+class MetricsPublisher:
+    """
+    Periodically hands a JSON snapshot of the registry to publish(body) (e.g. an MQTT topic).
+    """
+
+    def __init__(self, publish, interval=60.0, registry=REGISTRY, node_id=None):
+        self.publish = publish
+        self.interval = float(interval)
+        self.registry = registry
+        self.node_id = node_id
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="metrics-publisher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            snapshot = {"timestamp": time.time(), "metrics": self.registry.collect()}
+            if self.node_id:
+                snapshot["node"] = self.node_id
+            try:
+                self.publish(json.dumps(snapshot, separators=(",", ":")).encode("utf-8"))
+            except Exception as e:
+                logging.warning(f"Failed to publish metrics: {e}")
@@ -0,0 +1,134 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from urllib.parse import urljoin
+
+import requests
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """
+    Returns the hex SHA-256 digest of a file, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelFetcher:
+    """
+    Pulls new model versions published by the REST receiver.
+
+    Every poll_interval seconds the advertised model (sha256, size and download url) is
+    read from info_url and compared with the SHA-256 of the local model file. Only when
+    they differ, the new version is downloaded next to the model as a .part file. An
+    interrupted download keeps its .part file and is resumed with an HTTP Range request
+    on the next attempt (after retry_interval seconds). The complete file is verified
+    against the advertised hash and atomically renamed over model_path, where
+    ModelWatcher picks it up for a hot reload.
+    """
+
+    def __init__(self, model_path, info_url, poll_interval=300.0, retry_interval=10.0, timeout=30.0,
+                 chunk_size=1 << 20, session=None):
+        self.model_path = model_path
+        self.info_url = info_url
+        self.poll_interval = float(poll_interval)
+        self.retry_interval = float(retry_interval)
+        self.timeout = float(timeout)
+        self.chunk_size = int(chunk_size)
+        self.session = session or requests.Session()
+        self.updates = 0
+
+        self._local = (None, None)  # (stat signature, sha256) of the local model
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="model-fetcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def local_sha256(self):
+        """
+        Returns the SHA-256 of the local model (None if missing), re-hashed only when the file changed.
+        """
+        try:
+            st = os.stat(self.model_path)
+        except OSError:
+            return None
+        signature = (st.st_size, st.st_mtime_ns, st.st_ino)
+        if self._local[0] != signature:
+            self._local = (signature, file_sha256(self.model_path))
+        return self._local[1]
+
+    def check(self):
+        """
+        Downloads and installs the advertised model if its hash differs from the local one.
+        Returns True if the model file was replaced. Raises on network or integrity errors.
+        """
+        response = self.session.get(self.info_url, timeout=self.timeout)
+        response.raise_for_status()
+        model = response.json().get("model") or {}
+        sha256 = model.get("sha256")
+        if not sha256 or not model.get("url") or sha256 == self.local_sha256():
+            return False
+
+        logging.info(f"New model version {sha256[:12]} available ({model.get('size_bytes')} bytes). Downloading...")
+        started = time.monotonic()
+        part_path = self._download(urljoin(self.info_url, model["url"]), sha256)
+        os.replace(part_path, self.model_path)
+        self.updates += 1
+        logging.info(f"Model {sha256[:12]} installed at {self.model_path} in {time.monotonic() - started:.1f}s")
+        return True
+
+    def _download(self, url, sha256):
+        part_path = os.path.join(os.path.dirname(self.model_path) or ".",
+                                 f".{os.path.basename(self.model_path)}.{sha256[:16]}.part")
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416:
+                # The .part file already holds the whole model
+                pass
+            elif response.status_code in (200, 206):
+                if response.status_code == 200 and offset:
+                    logging.info("Server ignored the range request; restarting the download.")
+                    offset = 0
+                elif offset:
+                    logging.info(f"Resuming model download at byte {offset}")
+                with open(part_path, "r+b" if offset else "wb") as f:
+                    f.seek(offset)
+                    f.truncate()
+                    for chunk in response.iter_content(self.chunk_size):
+                        f.write(chunk)
+                    f.flush()
+                    os.fsync(f.fileno())
+            else:
+                response.raise_for_status()
+                raise requests.HTTPError(f"Unexpected status {response.status_code} downloading {url}")
+
+        actual = file_sha256(part_path)
+        if actual != sha256:
+            os.remove(part_path)
+            raise ValueError(f"Downloaded model hash {actual[:12]} does not match {sha256[:12]}; discarded")
+        return part_path
+
+    def _run(self):
+        wait = 0.0
+        while not self._stop.wait(wait):
+            try:
+                self.check()
+                wait = self.poll_interval
+            except Exception as e:
+                logging.warning(f"Model update failed, retrying in {self.retry_interval:.0f}s: {e}")
+                wait = self.retry_interval
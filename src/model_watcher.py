@@ -0,0 +1,73 @@
+import logging
+import os
+import threading
+import time
+
+
+class ModelWatcher:
+    """
+    Watches the model file and hot-swaps the inference engine when it changes.
+
+    The file is polled every poll_interval seconds (size, mtime and inode). Once a change
+    has been stable for settle_time seconds, a new engine is built and warmed up on this
+    background thread by load(), and handed to on_ready() to be swapped in between
+    inferences. If loading fails, the current engine keeps running.
+    """
+
+    def __init__(self, model_path, load, on_ready, poll_interval=5.0, settle_time=1.0):
+        self.model_path = model_path
+        self.load = load
+        self.on_ready = on_ready
+        self.poll_interval = float(poll_interval)
+        self.settle_time = float(settle_time)
+        self.reloads = 0
+
+        self._signature = self._stat()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _stat(self):
+        try:
+            st = os.stat(self.model_path)
+            return (st.st_size, st.st_mtime_ns, st.st_ino)
+        except OSError:
+            return None
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            signature = self._stat()
+            if signature is None or signature == self._signature:
+                continue
+
+            # Wait until the file stops changing (e.g. a non-atomic copy in progress)
+            while not self._stop.wait(self.settle_time):
+                latest = self._stat()
+                if latest == signature:
+                    break
+                signature = latest
+            if self._stop.is_set() or signature is None:
+                continue
+
+            logging.info(f"Model file {self.model_path} changed. Loading new model in background...")
+            started = time.monotonic()
+            try:
+                engine = self.load()
+            except Exception as e:
+                logging.error(f"Failed to load updated model, keeping the current one: {e}")
+                self._signature = signature
+                continue
+
+            self._signature = signature
+            self.reloads += 1
+            self.on_ready(engine)
+            logging.info(f"Model reloaded in {time.monotonic() - started:.2f}s")
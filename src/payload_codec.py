@@ -0,0 +1,200 @@
+import json
+import struct
+import numpy as np
+
+# Optional binary codecs
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import cbor2
+    CBOR_AVAILABLE = True
+except ImportError:
+    CBOR_AVAILABLE = False
+
+# Marker key of encoded numpy arrays in binary payloads
+NDARRAY_KEY = "__ndarray__"
+
+
+def _encode_array(array, float16=False):
+    """
+    Packs an array as raw little-endian bytes plus dtype and shape.
+    """
+    if float16 and array.dtype.kind == "f" and array.dtype.itemsize > 2:
+        array = array.astype(np.float16)
+    array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+    return {
+        NDARRAY_KEY: True,
+        "dtype": array.dtype.str,
+        "shape": list(array.shape),
+        "data": array.tobytes()
+    }
+
+
+def _decode_array(obj, as_lists):
+    array = np.frombuffer(obj["data"], dtype=np.dtype(obj["dtype"])).reshape(obj["shape"])
+    return array.tolist() if as_lists else array
+
+
+class JsonCodec:
+    """
+    UTF-8 JSON; arrays become nested lists (the original wire format).
+    """
+    name = "json"
+    content_type = "application/json"
+
+    def __init__(self, float16=False):
+        self.float16 = float16
+
+    def encode(self, payload):
+        return json.dumps(payload, default=self._default).encode("utf-8")
+
+    def encode_batch(self, bodies):
+        """
+        Joins already-encoded messages into one JSON array without re-encoding them.
+        """
+        return b"[" + b",".join(bodies) + b"]"
+
+    def decode(self, body, as_lists=True):
+        return json.loads(body)
+
+    def _default(self, value):
+        if isinstance(value, np.ndarray):
+            if self.float16 and value.dtype.kind == "f":
+                value = value.astype(np.float16)
+            return value.tolist()
+        if isinstance(value, np.generic):
+            return value.item()
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class MsgpackCodec:
+    """
+    MessagePack; arrays are sent as raw little-endian bytes with dtype and shape.
+    """
+    name = "msgpack"
+    content_type = "application/msgpack"
+
+    def __init__(self, float16=False):
+        if not MSGPACK_AVAILABLE:
+            raise ValueError("The msgpack codec requires the 'msgpack' package.")
+        self.float16 = float16
+
+    def encode(self, payload):
+        return msgpack.packb(payload, default=self._default, use_bin_type=True)
+
+    def encode_batch(self, bodies):
+        """
+        Prefixes already-encoded messages with a MessagePack array header.
+        """
+        count = len(bodies)
+        if count < 16:
+            header = bytes([0x90 | count])
+        elif count < 2 ** 16:
+            header = b"\xdc" + struct.pack(">H", count)
+        else:
+            header = b"\xdd" + struct.pack(">I", count)
+        return header + b"".join(bodies)
+
+    def decode(self, body, as_lists=True):
+        def hook(obj):
+            return _decode_array(obj, as_lists) if obj.get(NDARRAY_KEY) else obj
+        return msgpack.unpackb(body, object_hook=hook, raw=False)
+
+    def _default(self, value):
+        if isinstance(value, np.ndarray):
+            return _encode_array(value, self.float16)
+        if isinstance(value, np.generic):
+            return value.item()
+        raise TypeError(f"Object of type {type(value).__name__} is not MessagePack serializable")
+
+
+class CborCodec:
+    """
+    CBOR (RFC 8949); arrays are sent as raw little-endian bytes with dtype and shape.
+    """
+    name = "cbor"
+    content_type = "application/cbor"
+
+    def __init__(self, float16=False):
+        if not CBOR_AVAILABLE:
+            raise ValueError("The cbor codec requires the 'cbor2' package.")
+        self.float16 = float16
+
+    def encode(self, payload):
+        return cbor2.dumps(payload, default=self._default)
+
+    def encode_batch(self, bodies):
+        """
+        Prefixes already-encoded messages with a CBOR array header.
+        """
+        count = len(bodies)
+        if count < 24:
+            header = bytes([0x80 | count])
+        elif count < 2 ** 8:
+            header = b"\x98" + struct.pack(">B", count)
+        elif count < 2 ** 16:
+            header = b"\x99" + struct.pack(">H", count)
+        else:
+            header = b"\x9a" + struct.pack(">I", count)
+        return header + b"".join(bodies)
+
+    def decode(self, body, as_lists=True):
+        def hook(*args):
+            # cbor2 < 6 calls hook(decoder, obj); cbor2 >= 6 calls hook(obj, immutable)
+            obj = next(arg for arg in args if isinstance(arg, dict))
+            return _decode_array(obj, as_lists) if obj.get(NDARRAY_KEY) else obj
+        return cbor2.loads(body, object_hook=hook)
+
+    def _default(self, encoder, value):
+        if isinstance(value, np.ndarray):
+            encoder.encode(_encode_array(value, self.float16))
+        elif isinstance(value, np.generic):
+            encoder.encode(value.item())
+        else:
+            raise TypeError(f"Object of type {type(value).__name__} is not CBOR serializable")
+
+
+CODECS = {codec.name: codec for codec in (JsonCodec, MsgpackCodec, CborCodec)}
+CONTENT_TYPES = {codec.content_type: codec for codec in (JsonCodec, MsgpackCodec, CborCodec)}
+
+
+def get_codec(name="json", float16=False):
+    """
+    Returns a codec instance by name ("json", "msgpack" or "cbor").
+    """
+    if name not in CODECS:
+        raise ValueError(f"Unknown payload codec '{name}'. Use one of {list(CODECS)}.")
+    return CODECS[name](float16=float16)
+
+
+def detect_content_type(body):
+    """
+    Guesses the content type of a single encoded message (a map) from its first byte.
+    Used for transports without content-type metadata, such as MQTT 3.1.1.
+    """
+    if not body:
+        return JsonCodec.content_type
+    first = body[0]
+    if first in (0x7b, 0x5b, 0x20, 0x0a, 0x0d, 0x09):  # '{', '[' or whitespace
+        return JsonCodec.content_type
+    if 0x80 <= first <= 0x8f or first in (0xde, 0xdf):
+        return MsgpackCodec.content_type
+    if 0xa0 <= first <= 0xbb or first == 0xbf:
+        return CborCodec.content_type
+    return JsonCodec.content_type
+
+
+def decode_payload(body, content_type=None, as_lists=True):
+    """
+    Decodes a message or batch. The codec is chosen from content_type, or detected from
+    the body when it is missing. Arrays are returned as lists unless as_lists is False.
+    """
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    codec_cls = CONTENT_TYPES.get(content_type)
+    if codec_cls is None:
+        codec_cls = CONTENT_TYPES[detect_content_type(body)]
+    return codec_cls().decode(body, as_lists=as_lists)
@@ -0,0 +1,672 @@
+import logging
+import threading
+import time
+from collections import deque
+from metrics import REGISTRY
+
+FRAME_LATENCY_SECONDS = REGISTRY.histogram(
+    "edge_frame_latency_seconds", "Time from frame capture until its result is handed to the publisher"
+)
+
+OVERFLOW_POLICIES = ("drop_oldest", "block")
+
+
+class QueueClosed(Exception):
+    """Raised when reading from a closed and drained BoundedQueue."""
+
+
+class BoundedQueue:
+    """
+    Thread-safe bounded FIFO placed between two pipeline stages.
+    When full, either discards the oldest item ("drop_oldest") so producers never
+    wait on slow consumers, or blocks the producer until space is available ("block").
+    """
+
+    def __init__(self, maxsize=2, overflow="drop_oldest"):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}'. Use one of {OVERFLOW_POLICIES}.")
+        self.maxsize = max(1, int(maxsize))
+        self.overflow = overflow
+        self.dropped = 0
+        self._items = deque()
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        """
+        Adds an item to the queue, applying the overflow policy when full.
+        Returns False if the queue was closed before the item could be added.
+        """
+        with self._cond:
+            if self.overflow == "block":
+                while len(self._items) >= self.maxsize and not self._closed:
+                    self._cond.wait()
+            elif len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            if self._closed:
+                return False
+            self._items.append(item)
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """
+        Removes and returns the oldest item.
+        Returns None on timeout and raises QueueClosed once closed and empty.
+        """
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            if self._items:
+                item = self._items.popleft()
+                self._cond.notify_all()
+                return item
+            if self._closed:
+                raise QueueClosed()
+            return None
+
+    def close(self):
+        """
+        Wakes up all waiting producers and consumers; pending items can still be read.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+
+class FairQueue:
+    """
+    Bounded queue with one FIFO per source, read round-robin across sources.
+    Each source gets at most maxsize pending items and the overflow policy is applied
+    per source, so a fast or bursty camera cannot crowd out the others. A consumer can
+    read only a subset of the sources, so each source can be pinned to one consumer.
+    """
+
+    def __init__(self, sources, maxsize=2, overflow="drop_oldest"):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}'. Use one of {OVERFLOW_POLICIES}.")
+        self.maxsize = max(1, int(maxsize))
+        self.overflow = overflow
+        self.dropped = 0
+        self._sources = list(sources)
+        self._items = {source: deque() for source in self._sources}
+        self._next = {}  # next position of each consumer's round-robin over its sources
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, source, item):
+        """
+        Adds an item for the given source, applying the overflow policy when its FIFO is full.
+        Returns False if the queue was closed before the item could be added.
+        """
+        with self._cond:
+            items = self._items[source]
+            if self.overflow == "block":
+                while len(items) >= self.maxsize and not self._closed:
+                    self._cond.wait()
+            elif len(items) >= self.maxsize:
+                items.popleft()
+                self.dropped += 1
+            if self._closed:
+                return False
+            items.append(item)
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout=None, sources=None):
+        """
+        Removes and returns the oldest item of the next source with pending items, among
+        the given sources (default: all). Returns None on timeout and raises QueueClosed
+        once closed and those sources are empty.
+        """
+        sources = tuple(sources) if sources is not None else tuple(self._sources)
+        with self._cond:
+            if not self._pending(sources) and not self._closed:
+                self._cond.wait(timeout)
+            start = self._next.get(sources, 0)
+            for offset in range(len(sources)):
+                index = (start + offset) % len(sources)
+                items = self._items[sources[index]]
+                if items:
+                    self._next[sources] = index + 1
+                    item = items.popleft()
+                    self._cond.notify_all()
+                    return item
+            if self._closed:
+                raise QueueClosed()
+            return None
+
+    def close(self):
+        """
+        Wakes up all waiting producers and consumers; pending items can still be read.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _pending(self, sources):
+        return any(self._items[source] for source in sources)
+
+    def __len__(self):
+        with self._cond:
+            return sum(len(items) for items in self._items.values())
+
+
+class DeadlineScheduler:
+    """
+    Fires at fixed absolute deadlines (start + n * interval) instead of sleeping a
+    fixed time after each cycle, so work time does not stretch the sampling period.
+    If a cycle overruns by more than one interval, missed ticks are skipped.
+    An interval of 0 never waits (replays played as fast as possible).
+    """
+
+    def __init__(self, interval):
+        self.interval = float(interval)
+        self.missed = 0
+        self._next = time.monotonic()
+
+    def wait(self, stop_event=None):
+        """
+        Blocks until the next deadline. Returns False if stop_event was set meanwhile.
+        """
+        if self.interval <= 0:
+            return stop_event is None or not stop_event.is_set()
+        delay = self._next - time.monotonic()
+        if delay > 0:
+            if stop_event is not None:
+                if stop_event.wait(delay):
+                    return False
+            else:
+                time.sleep(delay)
+        elif stop_event is not None and stop_event.is_set():
+            return False
+
+        self._next += self.interval
+        now = time.monotonic()
+        if self._next <= now:
+            skipped = int((now - self._next) // self.interval) + 1
+            self.missed += skipped
+            self._next += skipped * self.interval
+        return True
+
+
+class Pipeline:
+    """
+    Runs the capture -> inference -> publish loop of the edge node.
+
+    In "sequential" mode the three steps run one after another on the calling thread.
+    In "pipelined" mode each step runs on its own thread, connected by bounded queues,
+    so camera, interpreter and network can be busy at the same time. When a
+    MicroBatcher is given, pipelined inference is dispatched through it in batches.
+    When a ChangeGate is given, frames without significant change reuse the last result.
+    When a TiledInference is given, each full-resolution frame is inferred as a batch of
+    tiles and the merged result is published (tiling replaces the batcher).
+    When an AdaptiveRate is given, the sampling interval follows thermal, battery and load
+    signals and is reported in every payload as "sampling_interval".
+    The pipeline stops on its own once the sensor returns None (end of a replay), after
+    the frames already captured have been published.
+    """
+
+    def __init__(self, sensor, engine, comm, interval, mode="sequential",
+                 queue_size=2, overflow="drop_oldest", batcher=None, gate=None, adaptive=None, tiler=None):
+        if mode not in ("sequential", "pipelined"):
+            raise ValueError(f"Unknown runtime mode '{mode}'. Use 'sequential' or 'pipelined'.")
+        self.sensor = sensor
+        self.engine = engine
+        self.comm = comm
+        self.interval = interval
+        self.mode = mode
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.batcher = batcher if mode == "pipelined" and tiler is None else None
+        self.gate = gate
+        self.tiler = tiler
+        self.adaptive = adaptive
+
+        self.scheduler = DeadlineScheduler(adaptive.interval if adaptive else interval)
+        self.stop_event = threading.Event()
+        self.frames_queue = BoundedQueue(queue_size, overflow)
+        self.results_queue = BoundedQueue(queue_size, overflow)
+        self.failed_results = 0
+        self._threads = []
+        self._failed = threading.Event()
+
+        REGISTRY.callback(
+            "edge_dropped_total", "Items dropped between pipeline stages due to backpressure",
+            lambda: {"frames": self.frames_queue.dropped, "results": self.results_queue.dropped},
+            type="counter", label="queue"
+        )
+        REGISTRY.callback(
+            "edge_failed_results_total", "Frames whose batched inference failed, so no result was published",
+            lambda: self.failed_results, type="counter"
+        )
+        REGISTRY.callback(
+            "edge_missed_ticks_total", "Sampling ticks skipped because a cycle overran",
+            self._missed_ticks, type="counter"
+        )
+        REGISTRY.callback(
+            "edge_gated_frames_total", "Frames that reused a cached result instead of running inference",
+            lambda: sum(g.skipped for g in self._gates()), type="counter"
+        )
+        REGISTRY.callback(
+            "edge_tiles_total", "Frame tiles inferred or reused from their per-tile gate",
+            lambda: {"inferred": sum(t.tiles_inferred for t in self._tilers()),
+                     "skipped": sum(t.tiles_skipped for t in self._tilers())},
+            type="counter", label="outcome"
+        )
+        if adaptive:
+            REGISTRY.callback(
+                "edge_sampling_interval_seconds", "Current sampling interval chosen by the adaptive scheduler",
+                lambda: adaptive.interval
+            )
+            REGISTRY.callback(
+                "edge_soc_temperature_celsius", "SoC temperature",
+                lambda: adaptive.monitor.read().get("soc_temperature")
+            )
+            REGISTRY.callback(
+                "edge_battery_percent", "Battery level",
+                lambda: adaptive.monitor.read().get("battery")
+            )
+
+    def run(self):
+        """
+        Runs the pipeline until stop() is called or the process is interrupted.
+        """
+        logging.info(f"Starting {self.mode} inference loop every {self.interval} seconds...")
+        if self.mode == "sequential":
+            self._run_sequential()
+        else:
+            self.start()
+            try:
+                while not self.stop_event.wait(1.0):
+                    if self._failed.is_set():
+                        logging.error("A pipeline stage stopped unexpectedly. Shutting down.")
+                        break
+                    if not any(t.is_alive() for t in self._threads):
+                        logging.info("Input exhausted and all results published. Shutting down.")
+                        break
+            finally:
+                self.stop()
+
+    def start(self):
+        """
+        Starts the capture, inference and publish stage threads (pipelined mode).
+        """
+        if self.batcher:
+            self.batcher.start()
+        stages = [
+            ("capture", self._capture_stage),
+            ("inference", self._inference_stage),
+            ("publish", self._publish_stage),
+        ]
+        for name, target in stages:
+            thread = threading.Thread(target=target, name=f"pipeline-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5.0):
+        """
+        Signals all stages to stop and waits for the stage threads to finish.
+        """
+        self.stop_event.set()
+        self.frames_queue.close()
+        self.results_queue.close()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        if self.batcher:
+            self.batcher.stop(timeout)
+        if self.frames_queue.dropped or self.results_queue.dropped:
+            logging.info(
+                f"Pipeline dropped {self.frames_queue.dropped} frames and "
+                f"{self.results_queue.dropped} results due to backpressure."
+            )
+        if self.failed_results:
+            logging.info(f"Pipeline dropped {self.failed_results} frames whose inference failed.")
+        for gate in self._gates():
+            stats = gate.stats()
+            logging.info(f"Gating executed {stats['executed']} inferences and skipped {stats['skipped']}.")
+        for tiler in self._tilers():
+            logging.info(f"Tiling inferred {tiler.tiles_inferred} tiles and reused {tiler.tiles_skipped}.")
+
+    def swap_engine(self, engine):
+        """
+        Replaces the inference engine between inferences (used for hot model reloads).
+        Frames already being inferred finish on the previous engine.
+        """
+        self.engine = engine
+        if self.batcher:
+            self.batcher.engine = engine
+        for gate in self._gates():
+            gate.reset()
+        for tiler in self._tilers():
+            tiler.reset()
+        logging.info(f"Inference engine swapped (model {engine.model_path})")
+
+    def _run_sequential(self):
+        while self.scheduler.wait(self.stop_event):
+            data = self._capture()
+            if data is None:
+                logging.info("Input exhausted. Shutting down.")
+                break
+            item = self._infer(data)
+            self._publish(item)
+            self._adapt()
+
+    def _capture_stage(self):
+        try:
+            while self.scheduler.wait(self.stop_event):
+                data = self._capture()
+                if data is None or not self.frames_queue.put(data):
+                    break
+                self._adapt()
+        except Exception as e:
+            self._failed.set()
+            logging.exception(f"Capture stage failed: {e}")
+        finally:
+            self.frames_queue.close()
+
+    def _inference_stage(self):
+        try:
+            while True:
+                data = self.frames_queue.get(timeout=1.0)
+                if data is None:
+                    continue
+                if not self.results_queue.put(self._infer(data)):
+                    break
+        except QueueClosed:
+            pass
+        except Exception as e:
+            self._failed.set()
+            logging.exception(f"Inference stage failed: {e}")
+        finally:
+            self.results_queue.close()
+
+    def _publish_stage(self):
+        try:
+            while True:
+                item = self.results_queue.get(timeout=1.0)
+                if item is not None:
+                    self._publish(item)
+        except QueueClosed:
+            pass
+        except Exception as e:
+            self._failed.set()
+            logging.exception(f"Publish stage failed: {e}")
+
+    def _capture(self):
+        """
+        Acquires inputs from all active sensors.
+        """
+        return self.sensor.get_input()
+
+    def _missed_ticks(self):
+        return self.scheduler.missed
+
+    def _schedulers(self):
+        return [self.scheduler]
+
+    def _adapt(self):
+        """
+        Lets the adaptive scheduler re-evaluate the sampling interval (rate-limited internally).
+        """
+        if self.adaptive:
+            backlog = len(self.frames_queue) + len(self.results_queue)
+            interval = self.adaptive.update(backlog=backlog)
+            for scheduler in self._schedulers():
+                scheduler.interval = interval
+
+    def _run_engine(self, engine, image, tiler=None):
+        started = time.perf_counter()
+        if tiler:
+            result = tiler.run(engine, image)
+        elif engine.fused_preprocessing:
+            result = engine.predict_frame(image)
+        else:
+            result = engine.predict(image)
+        if self.adaptive:
+            self.adaptive.observe_latency(time.perf_counter() - started)
+        return result
+
+    def _gates(self):
+        return [self.gate] if self.gate else []
+
+    def _gate_for(self, data):
+        return self.gate
+
+    def _tilers(self):
+        return [self.tiler] if self.tiler else []
+
+    def _tiler_for(self, data):
+        return self.tiler
+
+    def _infer(self, data, engine=None):
+        """
+        Runs inference on the image input and returns the result with the sensor data.
+        With a batcher, the frame is only submitted and the result is resolved when publishing.
+        """
+        item = {"temperature": data.get("temperature"), "frame_timestamp": data.get("frame_timestamp")}
+        if data.get("source") is not None:
+            item["source"] = data["source"]
+        image = data["image"]
+        # Use one engine for the whole frame, even if a hot reload swaps it meanwhile,
+        # and keep it with the item so the output is postprocessed by the same model
+        engine = engine or self.engine
+        item["engine"] = engine
+        gate = self._gate_for(data)
+
+        signature = None
+        if gate:
+            cached, signature = gate.check(image)
+            item["cached"] = cached is not None
+            if cached is not None:
+                item["result"] = cached
+                return item
+
+        if self.batcher:
+            future = self.batcher.submit(image)
+            if self.adaptive:
+                submitted = time.perf_counter()
+                future.add_done_callback(
+                    lambda done: self.adaptive.observe_latency(time.perf_counter() - submitted)
+                )
+            if gate:
+                def update_gate(done):
+                    if done.exception() is None:
+                        gate.update(signature, done.result())
+                future.add_done_callback(update_gate)
+            item["future"] = future
+            return item
+
+        result = self._run_engine(engine, image, self._tiler_for(data))
+        logging.info(f"Inference result: {result}")
+        if gate:
+            gate.update(signature, result)
+        item["result"] = result
+        return item
+
+    def _publish(self, item):
+        """
+        Builds the payload and publishes it through communication channels (MQTT/REST).
+        """
+        engine = item.get("engine", self.engine)
+        if "future" in item:
+            future = item.pop("future")
+            try:
+                item["result"] = future.result()
+            except Exception as e:
+                # The publish stage is the only writer of failed_results
+                self.failed_results += 1
+                logging.error(f"Dropping frame captured at {item.get('frame_timestamp')} "
+                              f"from {item.get('source', 'camera')}: batched inference failed: {e}")
+                return
+            engine = getattr(future, "engine", engine)
+            logging.info(f"Inference result: {item['result']}")
+
+        temperature = item.get("temperature")
+        if temperature is not None:
+            logging.info(f"Temperature reading: {temperature} °C")
+
+        result = item["result"]
+        top1 = None
+        # Tiled results are merged from already postprocessed tiles
+        if engine.postprocess_enabled and not isinstance(result, dict):
+            result = engine.postprocess(result)
+        elif not isinstance(result, dict):
+            # Raw outputs may be quantized; change detection compares dequantized scores
+            top1 = engine.top1(result)
+
+        payload = {
+            "result": result,
+            "temperature": temperature
+        }
+        if "cached" in item:
+            payload["cached"] = item["cached"]
+        if "source" in item:
+            payload["source"] = item["source"]
+        if self.adaptive:
+            payload["sampling_interval"] = round(self.adaptive.interval, 3)
+        self.comm.publish_result(payload, top1=top1)
+
+        if item.get("frame_timestamp"):
+            FRAME_LATENCY_SECONDS.observe(time.time() - item["frame_timestamp"])
+
+
+class MultiSourcePipeline(Pipeline):
+    """
+    Pipelined runtime for several cameras served by a pool of inference engines.
+
+    Each sensor is captured on its own thread with its own deadline scheduler, and frames
+    are queued per source in a FairQueue. Every source is pinned to one inference worker
+    thread (one per engine, at most one per camera), which takes the frames of its sources
+    round-robin. So every interpreter is only used by one thread, a busy camera cannot
+    starve the others, and the frames of a camera are inferred one at a time, in capture
+    order, with its gate and tiler only touched by that worker. TFLite and ONNX Runtime
+    release the GIL while invoking, so the workers run on separate cores. Every payload
+    carries the source id of its camera. With gating, each source has its own ChangeGate,
+    and with tiling its own TiledInference. intervals optionally gives each sensor its own
+    capture interval (e.g. its replay rate); the others are read every interval seconds.
+    """
+
+    def __init__(self, sensors, engines, comm, interval, queue_size=2, overflow="drop_oldest", gates=None,
+                 adaptive=None, tilers=None, intervals=None):
+        if not sensors or not engines:
+            raise ValueError("MultiSourcePipeline requires at least one sensor and one engine.")
+        super().__init__(sensors[0], engines[0], comm, interval, mode="pipelined",
+                         queue_size=queue_size, overflow=overflow, adaptive=adaptive)
+        self.sensors = list(sensors)
+        self.engines = list(engines)
+        self.gates = gates or {}
+        self.tilers = tilers or {}
+        intervals = list(intervals or [])
+        intervals += [None] * (len(self.sensors) - len(intervals))
+        self.schedulers = [
+            DeadlineScheduler(self.scheduler.interval if own is None else own) for own in intervals
+        ]
+        self.frames_queue = FairQueue([sensor.source_id for sensor in self.sensors], queue_size, overflow)
+        # Source i is served by worker i % workers; engines beyond the number of cameras stay idle
+        workers = min(len(self.engines), len(self.sensors))
+        if workers < len(self.engines):
+            logging.warning(f"{len(self.engines)} inference engines for {len(self.sensors)} cameras; "
+                            f"only {workers} are used")
+        self.worker_sources = [
+            tuple(sensor.source_id for sensor in self.sensors[index::workers]) for index in range(workers)
+        ]
+        self._running = {"capture": len(self.sensors), "inference": workers}
+        self._running_lock = threading.Lock()
+
+    def start(self):
+        """
+        Starts one capture thread per sensor, one inference worker per engine and the publisher.
+        """
+        threads = []
+        for sensor, scheduler in zip(self.sensors, self.schedulers):
+            threads.append((f"capture-{sensor.source_id}", self._source_capture_stage, (sensor, scheduler)))
+        for index in range(len(self.worker_sources)):
+            threads.append((f"inference-{index}", self._worker_stage, (index,)))
+        threads.append(("publish", self._publish_stage, ()))
+        for name, target, args in threads:
+            thread = threading.Thread(target=target, args=args, name=f"pipeline-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logging.info(f"Serving {len(self.sensors)} cameras with {len(self.worker_sources)} inference workers")
+
+    def swap_engine(self, engines):
+        """
+        Replaces the engine pool (one engine per worker) between inferences.
+        """
+        if not isinstance(engines, (list, tuple)):
+            engines = [engines]
+        if len(engines) != len(self.engines):
+            logging.error(f"Expected {len(self.engines)} engines for the pool, got {len(engines)}. Keeping the current model.")
+            return
+        self.engines = list(engines)
+        self.engine = self.engines[0]
+        for gate in self._gates():
+            gate.reset()
+        for tiler in self._tilers():
+            tiler.reset()
+        logging.info(f"Inference engine pool swapped (model {self.engine.model_path})")
+
+    def _missed_ticks(self):
+        return sum(scheduler.missed for scheduler in self.schedulers)
+
+    def _schedulers(self):
+        return self.schedulers
+
+    def _gates(self):
+        return list(self.gates.values())
+
+    def _gate_for(self, data):
+        return self.gates.get(data.get("source"))
+
+    def _tilers(self):
+        return list(self.tilers.values())
+
+    def _tiler_for(self, data):
+        return self.tilers.get(data.get("source"))
+
+    def _source_capture_stage(self, sensor, scheduler):
+        try:
+            while scheduler.wait(self.stop_event):
+                data = sensor.get_input()
+                if data is None or not self.frames_queue.put(sensor.source_id, data):
+                    break
+                self._adapt()
+        except Exception as e:
+            self._failed.set()
+            logging.exception(f"Capture of {sensor.source_id} failed: {e}")
+        finally:
+            # The inference workers stop once every camera has stopped
+            if self._stage_finished("capture"):
+                self.frames_queue.close()
+
+    def _worker_stage(self, index):
+        try:
+            while True:
+                data = self.frames_queue.get(timeout=1.0, sources=self.worker_sources[index])
+                if data is None:
+                    continue
+                if not self.results_queue.put(self._infer(data, engine=self.engines[index])):
+                    break
+        except QueueClosed:
+            pass
+        except Exception as e:
+            self._failed.set()
+            logging.exception(f"Inference worker {index} failed: {e}")
+        finally:
+            if self._stage_finished("inference"):
+                self.results_queue.close()
+
+    def _stage_finished(self, stage):
+        """
+        Records that one thread of a stage has exited. Returns True for the last one.
+        """
+        with self._running_lock:
+            self._running[stage] -= 1
+            return self._running[stage] == 0
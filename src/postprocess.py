@@ -0,0 +1,93 @@
+import logging
+import os
+import numpy as np
+
+
+class Postprocessor:
+    """
+    Turns raw model outputs into compact classification results.
+    Dequantizes the output with its scale and zero point, optionally applies softmax,
+    selects the top-k classes with argpartition (no full sort) and drops classes whose
+    score is below the threshold. Class indices can be mapped to names from a labels file.
+    """
+
+    def __init__(self, quantization=(0.0, 0), top_k=5, threshold=0.5, softmax=False, labels_path=None):
+        scale, zero_point = quantization if quantization else (0.0, 0)
+        self.scale = float(scale)
+        self.zero_point = int(zero_point)
+        self.top_k = max(1, int(top_k))
+        self.threshold = threshold
+        self.softmax = softmax
+        self.labels = self._load_labels(labels_path)
+
+    def dequantize(self, output):
+        """
+        Converts a quantized output tensor to float32 real values.
+        """
+        output = np.asarray(output)
+        if self.scale and np.issubdtype(output.dtype, np.integer):
+            return (output.astype(np.float32) - self.zero_point) * self.scale
+        return output.astype(np.float32, copy=False)
+
+    def scores(self, output):
+        """
+        Returns the real-valued class scores of an output, shaped (batch, num_classes):
+        dequantized, and softmaxed when configured.
+        """
+        scores = self.dequantize(output)
+        if scores.ndim == 1:
+            scores = scores[np.newaxis]
+        scores = scores.reshape(scores.shape[0], -1)
+
+        if self.softmax:
+            scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+            scores /= scores.sum(axis=1, keepdims=True)
+        return scores
+
+    def top1(self, output):
+        """
+        Returns (class, score) of the best class of the first output row, on the same
+        scale as the scores of run() but without the threshold.
+        """
+        row = self.scores(output)[0]
+        index = int(row.argmax())
+        return index, float(row[index])
+
+    def run(self, output):
+        """
+        Postprocesses a model output.
+
+        Parameters:
+            output (np.ndarray): Raw output shaped (num_classes,) or (batch, num_classes)
+
+        Returns:
+            dict or list[dict]: {"classes", "scores"[, "labels"]} with the top-k classes above
+                                the threshold, ordered by score; a list for batches > 1
+        """
+        scores = self.scores(output)
+        k = min(self.top_k, scores.shape[1])
+        top = np.argpartition(scores, -k, axis=1)[:, -k:]
+
+        results = []
+        for row, indices in zip(scores, top):
+            indices = indices[np.argsort(row[indices])[::-1]]
+            if self.threshold is not None:
+                indices = indices[row[indices] >= self.threshold]
+            result = {
+                "classes": indices.tolist(),
+                "scores": [round(float(s), 4) for s in row[indices]]
+            }
+            if self.labels:
+                result["labels"] = [self.labels[i] if i < len(self.labels) else str(i) for i in indices]
+            results.append(result)
+
+        return results[0] if len(results) == 1 else results
+
+    def _load_labels(self, labels_path):
+        if not labels_path:
+            return None
+        if not os.path.exists(labels_path):
+            logging.warning(f"Labels file not found: {labels_path}. Publishing class indices only.")
+            return None
+        with open(labels_path, "r") as f:
+            return [line.strip() for line in f]
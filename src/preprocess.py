@@ -0,0 +1,84 @@
+import numpy as np
+import cv2
+
+
+class Preprocessor:
+    """
+    Converts raw BGR camera frames into model input samples without intermediate copies.
+    Resizing and color conversion are written into a caller-provided buffer (e.g. the
+    interpreter input tensor view) using preallocated scratch arrays that are reused
+    across calls.
+
+    Pixels are mapped to real values as (pixel - mean) / std and then to the model's
+    input dtype using its quantization parameters (scale, zero_point). For uint8 models
+    whose quantization matches that mapping, RGB pixels are written directly.
+    """
+
+    def __init__(self, input_shape, dtype=np.uint8, quantization=(0.0, 0), mean=127.5, std=127.5):
+        self.height, self.width, self.channels = (int(d) for d in input_shape[-3:])
+        self.dtype = np.dtype(dtype)
+        scale, zero_point = quantization if quantization else (0.0, 0)
+
+        if np.issubdtype(self.dtype, np.floating):
+            # Float models take the real value directly
+            self._alpha, self._beta = 1.0 / std, -mean / std
+        elif scale:
+            # q = real / scale + zero_point
+            self._alpha = 1.0 / (std * scale)
+            self._beta = zero_point - mean / (std * scale)
+        else:
+            # Integer input without quantization: raw pixel values
+            self._alpha, self._beta = 1.0, 0.0
+
+        self._passthrough = (
+            self.dtype == np.uint8
+            and abs(self._alpha - 1.0) < 0.01
+            and abs(self._beta) < 0.5
+        )
+
+        self._resized = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        if not self._passthrough:
+            self._rgb = np.empty((self.height, self.width, 3), dtype=np.uint8)
+            self._scratch = np.empty((self.height, self.width, 3), dtype=np.float32)
+            if np.issubdtype(self.dtype, np.integer):
+                info = np.iinfo(self.dtype)
+                self._bounds = (info.min, info.max)
+            else:
+                self._bounds = None
+
+    def run(self, frame, out=None):
+        """
+        Preprocesses one frame into out.
+
+        Parameters:
+            frame (np.ndarray): BGR frame of any resolution, shaped (H, W, 3) or (1, H, W, 3)
+            out (np.ndarray): Destination shaped (height, width, 3) with the model dtype.
+                              A new array is allocated if omitted.
+
+        Returns:
+            np.ndarray: The filled destination buffer
+        """
+        if out is None:
+            out = np.empty((self.height, self.width, self.channels), dtype=self.dtype)
+        if frame.ndim == 4:
+            frame = frame[0]
+
+        if frame.shape[0] == self.height and frame.shape[1] == self.width:
+            resized = frame
+        else:
+            resized = cv2.resize(frame, (self.width, self.height), dst=self._resized)
+
+        if self._passthrough:
+            converted = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB, dst=out)
+            if converted is not out:
+                out[...] = converted
+            return out
+
+        rgb = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB, dst=self._rgb)
+        np.multiply(rgb, self._alpha, out=self._scratch)
+        self._scratch += self._beta
+        if self._bounds is not None:
+            np.rint(self._scratch, out=self._scratch)
+            np.clip(self._scratch, self._bounds[0], self._bounds[1], out=self._scratch)
+        out[...] = self._scratch
+        return out
@@ -0,0 +1,141 @@
+import csv
+import logging
+import os
+
+import numpy as np
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class ReplayReader:
+    """
+    Plays back recorded frames through the read()/isOpened()/release() interface of
+    cv2.VideoCapture, so SensorInput can use it in place of a camera.
+
+    path is a video file, a directory of images (played in file name order) or a .npy
+    stack of BGR frames shaped (N, H, W, 3). The .npy file is memory-mapped, so frames
+    are paged in from disk as they are read instead of loading the whole stack.
+    Every frame has a position in seconds within the recording (frame number divided by
+    recorded_fps, which defaults to the video frame rate or 1 frame per second), used to
+    look up recorded temperatures. With loop, playback restarts at the end; otherwise
+    read() returns (False, None) and exhausted is set.
+    """
+
+    def __init__(self, path, loop=True, recorded_fps=None):
+        self.path = path
+        self.loop = loop
+        self.frames_read = 0
+        self.exhausted = False
+        self.position = 0.0
+        self._index = 0
+        self._cap = None
+        self._files = None
+        self._frames = None
+
+        if os.path.isdir(path):
+            self.kind = "images"
+            self._files = sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            if not self._files:
+                raise ValueError(f"No images found in replay directory {path}")
+            frame_count = len(self._files)
+        elif path.endswith(".npy"):
+            self.kind = "npy"
+            self._frames = np.load(path, mmap_mode="r")
+            if self._frames.ndim != 4 or self._frames.shape[-1] != 3:
+                raise ValueError(f"{path} must hold BGR frames shaped (N, H, W, 3), got {self._frames.shape}")
+            frame_count = len(self._frames)
+        else:
+            import cv2
+            self.kind = "video"
+            self._cap = cv2.VideoCapture(path)
+            if not self._cap.isOpened():
+                raise ValueError(f"Replay video {path} could not be opened")
+            frame_count = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            recorded_fps = recorded_fps or self._cap.get(cv2.CAP_PROP_FPS)
+
+        self.frame_count = frame_count
+        self.recorded_fps = float(recorded_fps or 1.0)
+        logging.info(f"Replaying {frame_count} frames from {path} ({self.kind}, {self.recorded_fps:g} fps recorded)")
+
+    def isOpened(self):
+        return not self.exhausted
+
+    def read(self):
+        """
+        Returns (True, frame) for the next frame, or (False, None) once the recording ended.
+        """
+        if self.exhausted:
+            return False, None
+        frame = self._next_frame()
+        if frame is None and self.loop and self._index > 0:
+            self._rewind()
+            frame = self._next_frame()
+        if frame is None:
+            self.exhausted = True
+            return False, None
+        self.position = self._index / self.recorded_fps
+        self._index += 1
+        self.frames_read += 1
+        return True, frame
+
+    def _next_frame(self):
+        if self.kind == "video":
+            ret, frame = self._cap.read()
+            return frame if ret else None
+        if self.kind == "npy":
+            if self._index >= len(self._frames):
+                return None
+            # A view into the memory map; pages are read on first access
+            return np.asarray(self._frames[self._index])
+
+        import cv2
+        while self._index < len(self._files):
+            frame = cv2.imread(self._files[self._index])
+            if frame is not None:
+                return frame
+            logging.warning(f"Skipping unreadable replay image {self._files[self._index]}")
+            self._index += 1
+        return None
+
+    def _rewind(self):
+        if self.kind == "video":
+            import cv2
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        self._index = 0
+
+    def release(self):
+        if self._cap is not None:
+            self._cap.release()
+        self._frames = None
+        self.exhausted = True
+
+
+class TemperatureTrace:
+    """
+    Recorded temperatures from a CSV file with "timestamp,temperature" rows (seconds,
+    either relative or Unix time; a header row is allowed). at() returns the linearly
+    interpolated temperature at a position in seconds from the first sample, clamped to
+    the first and last readings.
+    """
+
+    def __init__(self, path):
+        samples = []
+        with open(path, newline="") as f:
+            for row in csv.reader(f):
+                try:
+                    samples.append((float(row[0]), float(row[1])))
+                except (IndexError, ValueError):
+                    continue  # header or malformed row
+        if not samples:
+            raise ValueError(f"No timestamp,temperature rows found in {path}")
+        samples.sort()
+        timestamps, temperatures = zip(*samples)
+        self.timestamps = np.asarray(timestamps) - timestamps[0]
+        self.temperatures = np.asarray(temperatures)
+        self.duration = float(self.timestamps[-1])
+
+    def at(self, seconds):
+        return round(float(np.interp(seconds, self.timestamps, self.temperatures)), 2)
@@ -1,80 +1,247 @@
 import numpy as np
-import cv2
 import logging
 import random
+import threading
+import time
+from collections import deque
 from config import Config
+from metrics import REGISTRY, STAGE_SECONDS
+
+CAPTURE_SECONDS = STAGE_SECONDS.labels("capture")
+CAMERA_FAILURES = REGISTRY.counter(
+    "edge_camera_failures_total", "Frames replaced by a dummy image because the camera read failed"
+)
+# Active frame grabbers by source id ("" in single-camera mode)
+_GRABBERS = {}
+REGISTRY.callback(
+    "edge_camera_frames_total", "Frames read by the background grabbers",
+    lambda: {source: grabber.frames_read for source, grabber in _GRABBERS.items()},
+    type="counter", label="source"
+)
+
+class FrameGrabber:
+    """
+    Continuously drains a cv2.VideoCapture on a background thread so that OpenCV's
+    internal buffer never holds stale frames. The newest frames are kept in a small
+    ring buffer together with their capture timestamps.
+    """
+
+    def __init__(self, cap, buffer_size=1):
+        self.cap = cap
+        self.frames = deque(maxlen=max(1, int(buffer_size)))
+        self.frames_read = 0
+        self.read_failures = 0
+        self._lock = threading.Lock()
+        self._new_frame = threading.Condition(self._lock)
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """
+        Starts the background capture thread.
+        """
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="camera-grabber", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        """
+        Stops the background capture thread.
+        """
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def latest(self, timeout=1.0):
+        """
+        Returns the newest (frame, timestamp) pair without waiting for a new capture.
+        Only blocks (up to timeout seconds) until the very first frame arrives.
+        Returns (None, None) if no frame is available.
+        """
+        with self._new_frame:
+            if not self.frames:
+                self._new_frame.wait(timeout)
+            if not self.frames:
+                return None, None
+            return self.frames[-1]
+
+    def _run(self):
+        while self._running:
+            ret, frame = self.cap.read()
+            if not ret or frame is None:
+                self.read_failures += 1
+                time.sleep(0.05)
+                continue
+            with self._new_frame:
+                self.frames.append((frame, time.time()))
+                self.frames_read += 1
+                self._new_frame.notify_all()
+
 
 class SensorInput:
     """
     Handles sensor input abstraction for the system, including camera and temperature.
     Allows switching between real hardware and simulated values.
+
+    In multi-camera mode, camera is one entry of sensors.cameras (id, index and optional
+    width/height/fourcc/fps overrides) and every input is tagged with its source id.
+
+    When sensors.replay (or the camera entry's replay) is enabled, frames come from a
+    recording instead of the camera, and temperatures from an optional recorded trace.
+    get_input() returns None once a non-looping replay has played every frame.
     """
 
-    def __init__(self, config_path="config/settings.yaml"):
-        # Load settings from configuration file
-        self.cfg = Config(config_path)
+    def __init__(self, config_path="config/settings.yaml", camera=None, config=None):
+        # Load settings from configuration file (or use the Config shared by main())
+        self.cfg = config or Config.load(config_path)
 
         # Camera-related settings
         self.camera_enabled = self.cfg.get("sensors", "camera_enabled", default=True)
         self.camera_index = self.cfg.get("sensors", "camera_index", default=0)
+        self.camera_grabber = self.cfg.get("sensors", "camera_grabber", default=False)
+        self.camera_buffer_size = self.cfg.get("sensors", "camera_buffer_size", default=1)
+        self.camera_width = self.cfg.get("sensors", "camera_width")
+        self.camera_height = self.cfg.get("sensors", "camera_height")
+        self.camera_fourcc = self.cfg.get("sensors", "camera_fourcc")
+        self.camera_fps = self.cfg.get("sensors", "camera_fps")
+        self.source_id = None
+        if camera:
+            self.camera_index = camera.get("index", self.camera_index)
+            self.camera_width = camera.get("width", self.camera_width)
+            self.camera_height = camera.get("height", self.camera_height)
+            self.camera_fourcc = camera.get("fourcc", self.camera_fourcc)
+            self.camera_fps = camera.get("fps", self.camera_fps)
+            self.source_id = str(camera.get("id", f"camera{self.camera_index}"))
+        replay_cfg = (camera or {}).get("replay") or self.cfg.get("sensors", "replay", default={})
         self.input_shape = self.cfg.get("model", "input_shape", default=[1, 224, 224, 3])
+        # With fused preprocessing the engine resizes raw frames into its input tensor,
+        # and tiling crops the full-resolution frame itself
+        self.raw_frames = (self.cfg.get("model", "fused_preprocessing", default=False)
+                           or self.cfg.get("tiling", "enabled", default=False))
 
         # Temperature sensor settings
         self.temperature_enabled = self.cfg.get("sensors", "temperature_enabled", default=False)
         self.temperature_simulated = self.cfg.get("sensors", "temperature_simulated", default=True)
 
-        # Initialize camera if enabled
-        if self.camera_enabled:
+        # Initialize the replay source or the camera if enabled
+        self.grabber = None
+        self.replay = None
+        self.temperature_trace = None
+        if replay_cfg.get("enabled", False):
+            from replay import ReplayReader, TemperatureTrace
+            self.replay = ReplayReader(
+                replay_cfg["path"],
+                loop=replay_cfg.get("loop", True),
+                recorded_fps=replay_cfg.get("recorded_fps")
+            )
+            if replay_cfg.get("temperature_trace"):
+                self.temperature_trace = TemperatureTrace(replay_cfg["temperature_trace"])
+            self.cap = self.replay
+            self.camera_enabled = True
+        elif self.camera_enabled:
+            # OpenCV is only imported when a camera is actually used
+            import cv2
             self.cap = cv2.VideoCapture(self.camera_index)
             if not self.cap.isOpened():
                 logging.warning(f"Camera index {self.camera_index} could not be opened. Falling back to dummy image.")
                 self.camera_enabled = False
+            else:
+                self._configure_camera()
+                if self.camera_grabber:
+                    self.grabber = FrameGrabber(self.cap, self.camera_buffer_size)
+                    self.grabber.start()
+                    _GRABBERS[self.source_id or ""] = self.grabber
         else:
             self.cap = None
 
     def get_input(self):
         """
         Collects all active sensor inputs and returns them as a dictionary.
-        Keys: "image", "temperature"
+        Keys: "image", "frame_timestamp", "temperature" and "source" (multi-camera mode)
+        "image" is the raw BGR frame when fused preprocessing is enabled.
         """
+        started = time.perf_counter()
         result = {}
+        timestamp = time.time()
 
         # Capture image from camera or generate dummy input
         if self.camera_enabled and self.cap:
-            ret, frame = self.cap.read()
+            if self.grabber:
+                frame, timestamp = self.grabber.latest()
+                ret = frame is not None
+                timestamp = timestamp or time.time()
+            else:
+                ret, frame = self.cap.read()
+                if not ret and self.replay is not None and self.replay.exhausted:
+                    logging.info(f"Replay of {self.replay.path} finished after {self.replay.frames_read} frames.")
+                    return None
             if not ret or frame is None:
                 logging.warning("Unable to read frame from camera. Using dummy image.")
+                CAMERA_FAILURES.inc()
                 img = self._dummy_input()
+            elif self.raw_frames:
+                img = frame
             else:
                 try:
-                    # Resize and convert frame to RGB
+                    import cv2
+                    # Resize and convert frame to RGB in place, then add the batch axis as a view
                     img = cv2.resize(frame, (self.input_shape[2], self.input_shape[1]))
-                    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                    img = img.reshape(self.input_shape).astype(np.uint8)
+                    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=img)
+                    img = img[np.newaxis]
                 except Exception as e:
                     logging.warning(f"Error processing camera frame: {e}. Using dummy image.")
+                    CAMERA_FAILURES.inc()
                     img = self._dummy_input()
         else:
             logging.warning("Camera not enabled or unavailable. Using dummy image.")
             img = self._dummy_input()
 
         result["image"] = img
+        result["frame_timestamp"] = timestamp
+        if self.source_id is not None:
+            result["source"] = self.source_id
 
-        # Read or simulate temperature if enabled
-        if self.temperature_enabled:
+        # Read, replay or simulate temperature if enabled
+        if self.temperature_trace is not None:
+            result["temperature"] = self.temperature_trace.at(self.replay.position)
+        elif self.temperature_enabled:
             if self.temperature_simulated:
                 temp = self._simulate_temperature()
             else:
                 temp = self._read_real_temperature()  # Placeholder for hardware integration
             result["temperature"] = temp
 
+        CAPTURE_SECONDS.observe(time.perf_counter() - started)
         return result
 
+    def _configure_camera(self):
+        """
+        Requests resolution, pixel format and frame rate from the camera so it delivers
+        frames close to the model input instead of full-resolution frames that are
+        decoded only to be downscaled. Drivers may ignore or round these values.
+        """
+        import cv2
+        if self.camera_fourcc:
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*self.camera_fourcc))
+        if self.camera_width and self.camera_height:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.camera_width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.camera_height)
+        if self.camera_fps:
+            self.cap.set(cv2.CAP_PROP_FPS, self.camera_fps)
+        # Keep the driver queue short so reads return recent frames
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        logging.info(f"Camera {self.camera_index} negotiated {width}x{height} @ {fps:.1f} fps")
+
     def _dummy_input(self):
         """
         Generates a dummy image with random noise (used when camera is not available).
         """
-        return (np.random.rand(*self.input_shape) * 255).astype(np.uint8)
+        return np.random.randint(0, 256, size=self.input_shape, dtype=np.uint8)
 
     def _simulate_temperature(self):
         """
@@ -94,6 +261,9 @@ class SensorInput:
         """
         Releases the camera resource properly.
         """
+        if self.grabber:
+            self.grabber.stop()
+            _GRABBERS.pop(self.source_id or "", None)
         if self.cap:
             self.cap.release()
 
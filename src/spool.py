@@ -0,0 +1,130 @@
+import logging
+import os
+import sqlite3
+import threading
+
+
+class DiskSpool:
+    """
+    Append-only on-disk outbox for messages that could not be delivered yet.
+    Backed by SQLite in WAL mode; messages are kept per channel and ordered by a
+    sequence number assigned when they were published. When the spool grows past
+    max_bytes, the oldest messages are discarded.
+    """
+
+    def __init__(self, path="logs/outbox.db", max_bytes=50 * 1024 * 1024):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        self.discarded = 0
+        self._lock = threading.Lock()
+
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " channel TEXT NOT NULL,"
+            " seq INTEGER NOT NULL,"
+            " body BLOB NOT NULL,"
+            " PRIMARY KEY (channel, seq))"
+        )
+        row = self._db.execute("SELECT COALESCE(SUM(LENGTH(body)), 0) FROM outbox").fetchone()
+        self._bytes = row[0]
+
+    def append(self, channel, seq, body):
+        """
+        Stores a message for later delivery.
+        """
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO outbox VALUES (?, ?, ?)", (channel, seq, body))
+            self._bytes += len(body)
+            if self._bytes > self.max_bytes:
+                self._trim()
+
+    def append_many(self, channel, items):
+        """
+        Stores several (seq, body) messages in a single transaction.
+        """
+        items = list(items)
+        if not items:
+            return
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT OR REPLACE INTO outbox VALUES (?, ?, ?)",
+                [(channel, seq, body) for seq, body in items]
+            )
+            self._db.execute("COMMIT")
+            self._bytes += sum(len(body) for _, body in items)
+            if self._bytes > self.max_bytes:
+                self._trim()
+
+    def peek(self, channel, limit=1):
+        """
+        Returns up to limit oldest (seq, body) messages of a channel without removing them.
+        """
+        with self._lock:
+            return self._db.execute(
+                "SELECT seq, body FROM outbox WHERE channel = ? ORDER BY seq LIMIT ?",
+                (channel, limit)
+            ).fetchall()
+
+    def delete(self, channel, seqs):
+        """
+        Removes delivered messages.
+        """
+        seqs = list(seqs)
+        if not seqs:
+            return
+        with self._lock:
+            placeholders = ",".join("?" * len(seqs))
+            row = self._db.execute(
+                f"SELECT COALESCE(SUM(LENGTH(body)), 0) FROM outbox WHERE channel = ? AND seq IN ({placeholders})",
+                [channel] + seqs
+            ).fetchone()
+            self._db.execute(
+                f"DELETE FROM outbox WHERE channel = ? AND seq IN ({placeholders})",
+                [channel] + seqs
+            )
+            self._bytes -= row[0]
+
+    def count(self, channel):
+        """
+        Returns the number of pending messages of a channel.
+        """
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox WHERE channel = ?", (channel,)).fetchone()[0]
+
+    def last_seq(self, channel):
+        """
+        Returns the highest sequence number stored for a channel, or -1 if none.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT MAX(seq) FROM outbox WHERE channel = ?", (channel,)).fetchone()
+            return -1 if row[0] is None else row[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _trim(self):
+        # Discard the oldest messages (across all channels) until back under the size cap
+        while self._bytes > self.max_bytes:
+            rows = self._db.execute(
+                "SELECT channel, seq, LENGTH(body) FROM outbox ORDER BY seq LIMIT 100"
+            ).fetchall()
+            if not rows:
+                self._bytes = 0
+                return
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "DELETE FROM outbox WHERE channel = ? AND seq = ?",
+                [(channel, seq) for channel, seq, _ in rows]
+            )
+            self._db.execute("COMMIT")
+            self._bytes -= sum(size for _, _, size in rows)
+            self.discarded += len(rows)
+        logging.warning(f"Outbox spool exceeded {self.max_bytes} bytes; {self.discarded} oldest messages discarded so far.")
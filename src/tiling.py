@@ -0,0 +1,157 @@
+import logging
+import threading
+import numpy as np
+
+
+def grid_boxes(width, height, rows, cols, overlap=0.0):
+    """
+    Splits a width x height frame into rows x cols tiles that cover it completely, with
+    neighbouring tiles sharing the given fraction (0..1) of their size.
+    Returns a list of (x, y, w, h) boxes in pixels, row by row.
+    """
+    def spans(length, count):
+        size = length / (count - (count - 1) * overlap)
+        step = size * (1.0 - overlap)
+        return [(int(round(i * step)), int(round(size))) for i in range(count)]
+
+    boxes = []
+    for y, h in spans(height, rows):
+        for x, w in spans(width, cols):
+            boxes.append((x, y, min(w, width - x), min(h, height - y)))
+    return boxes
+
+
+def roi_boxes(width, height, rois):
+    """
+    Converts ROIs given as [x, y, w, h] into pixel boxes clipped to the frame. ROIs whose
+    values are all <= 1 are fractions of the frame size.
+    """
+    boxes = []
+    for roi in rois:
+        x, y, w, h = roi
+        if all(v <= 1 for v in roi):
+            x, y, w, h = x * width, y * height, w * width, h * height
+        x, y = int(max(0, min(x, width - 1))), int(max(0, min(y, height - 1)))
+        boxes.append((x, y, int(max(1, min(w, width - x))), int(max(1, min(h, height - y)))))
+    return boxes
+
+
+class TiledInference:
+    """
+    Runs inference on overlapping tiles (or configured regions of interest) of a
+    full-resolution frame instead of the whole frame downscaled to the model input, so
+    small objects keep enough pixels to be recognized.
+
+    All tiles of a frame go through InferenceEngine.predict_batch as one batch, so the
+    cost per frame is bounded by the number of tiles. With gate_factory, every tile has
+    its own ChangeGate and tiles that did not change reuse their previous output; only
+    changed tiles are inferred. Per-tile outputs are merged by taking, for every class,
+    its highest score in any tile.
+    """
+
+    def __init__(self, grid=(2, 2), overlap=0.2, rois=None, gate_factory=None, include_tiles=True):
+        self.rows, self.cols = (int(v) for v in grid)
+        self.overlap = float(overlap)
+        self.rois = [tuple(roi) for roi in rois] if rois else None
+        self.gate_factory = gate_factory
+        self.include_tiles = include_tiles
+
+        self.tiles_inferred = 0
+        self.tiles_skipped = 0
+
+        self._boxes = {}
+        self._gates = []
+        self._lock = threading.Lock()
+
+    def boxes(self, width, height):
+        """
+        Returns the tile boxes for a frame size (computed once per size).
+        """
+        key = (width, height)
+        if key not in self._boxes:
+            if self.rois:
+                boxes = roi_boxes(width, height, self.rois)
+            else:
+                boxes = grid_boxes(width, height, self.rows, self.cols, self.overlap)
+            self._boxes[key] = boxes
+            logging.info(f"Tiling {width}x{height} frames into {len(boxes)} tiles: {boxes}")
+        return self._boxes[key]
+
+    def gates(self):
+        return list(self._gates)
+
+    def reset(self):
+        """
+        Forgets the per-tile outputs (e.g. after a model swap).
+        """
+        for gate in self._gates:
+            gate.reset()
+
+    def run(self, engine, frame):
+        """
+        Infers every (changed) tile of a BGR frame and returns the merged result: a dict
+        {"classes", "scores"[, "labels"][, "tiles"]} when the engine postprocesses results,
+        otherwise the per-class maximum of the raw tile outputs, shaped (1, classes).
+        """
+        if frame.ndim == 4:
+            frame = frame[0]
+        boxes = self.boxes(frame.shape[1], frame.shape[0])
+        crops = [frame[y:y + h, x:x + w] for x, y, w, h in boxes]
+
+        outputs = [None] * len(crops)
+        signatures = [None] * len(crops)
+        if self.gate_factory:
+            with self._lock:
+                while len(self._gates) < len(crops):
+                    self._gates.append(self.gate_factory())
+            for i, crop in enumerate(crops):
+                outputs[i], signatures[i] = self._gates[i].check(crop)
+
+        pending = [i for i, output in enumerate(outputs) if output is None]
+        if pending:
+            batch = engine.predict_batch([self._prepare(engine, crops[i]) for i in pending])
+            for row, i in enumerate(pending):
+                outputs[i] = batch[row:row + 1]
+                if self.gate_factory:
+                    self._gates[i].update(signatures[i], outputs[i])
+        self.tiles_inferred += len(pending)
+        self.tiles_skipped += len(crops) - len(pending)
+
+        if not engine.postprocess_enabled:
+            return np.max(np.concatenate(outputs), axis=0, keepdims=True)
+        return self._merge(engine, outputs, boxes)
+
+    def _prepare(self, engine, crop):
+        if engine.fused_preprocessing:
+            return crop
+        # Same conversion SensorInput applies to whole frames without fused preprocessing
+        import cv2
+        height, width = engine.input_shape[1], engine.input_shape[2]
+        sample = cv2.resize(crop, (width, height))
+        return cv2.cvtColor(sample, cv2.COLOR_BGR2RGB, dst=sample)[np.newaxis]
+
+    def _merge(self, engine, outputs, boxes):
+        tiles = engine.postprocess(np.concatenate(outputs))
+        if isinstance(tiles, dict):
+            tiles = [tiles]
+
+        best = {}
+        for index, tile in enumerate(tiles):
+            labels = tile.get("labels") or [None] * len(tile["classes"])
+            for cls, score, label in zip(tile["classes"], tile["scores"], labels):
+                if cls not in best or score > best[cls][0]:
+                    best[cls] = (score, label, index)
+        ranked = sorted(best.items(), key=lambda item: item[1][0], reverse=True)
+        ranked = ranked[:engine.postprocessor.top_k]
+
+        merged = {
+            "classes": [cls for cls, _ in ranked],
+            "scores": [score for _, (score, _, _) in ranked]
+        }
+        if engine.postprocessor.labels:
+            merged["labels"] = [label for _, (_, label, _) in ranked]
+        if self.include_tiles:
+            merged["tiles"] = [
+                dict(tile, box=list(box)) for tile, box in zip(tiles, boxes)
+            ]
+        return merged
@@ -1,9 +1,22 @@
 import os
+import sys
+import json
+import time
+import argparse
 import numpy as np
 import logging
 from config import Config
 import tflite_runtime.interpreter as tflite
 
+# Default limits for accepting a candidate model over the current one (see compare_models)
+DEFAULT_TOLERANCES = {
+    "min_top1_match": 0.90,       # fraction of golden inputs with the same top-1 class
+    "max_abs_diff": None,         # max |current - candidate| of dequantized outputs (None: report only)
+    "max_latency_ratio": 1.20,    # candidate median latency / current median latency
+    "max_memory_ratio": 1.50,     # candidate memory / current memory
+    "max_accuracy_drop": 0.02,    # top-1 accuracy loss when the golden set has labels
+}
+
 def validate_tflite_model(model_path, input_shape):
     logging.basicConfig(level=logging.INFO)
 
@@ -44,13 +57,212 @@ def validate_tflite_model(model_path, input_shape):
         logging.exception(f"Error durante validación del modelo: {e}")
         return False
 
+def load_golden_set(path):
+    """
+    Loads golden inputs from an .npz file or a directory of image frames.
+
+    The .npz file holds "inputs", uint8 RGB images shaped (N, H, W, 3), and optionally
+    "labels" with the expected class of each image. A directory is read with OpenCV
+    (sorted by file name); a "labels.txt" with one class index per line is optional.
+
+    Returns:
+        tuple: (images (np.ndarray), labels (np.ndarray or None))
+    """
+    if os.path.isdir(path):
+        import cv2
+        names = sorted(n for n in os.listdir(path) if n.lower().endswith((".jpg", ".jpeg", ".png", ".bmp")))
+        images = []
+        for name in names:
+            frame = cv2.imread(os.path.join(path, name), cv2.IMREAD_COLOR)
+            if frame is not None:
+                images.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if not images:
+            raise ValueError(f"No images found in golden set directory {path}")
+        labels_path = os.path.join(path, "labels.txt")
+        labels = np.loadtxt(labels_path, dtype=np.int64, ndmin=1) if os.path.exists(labels_path) else None
+        return images, labels
+
+    with np.load(path) as data:
+        images = data["inputs"]
+        labels = data["labels"] if "labels" in data else None
+    if images.ndim == 3:
+        images = images[np.newaxis]
+    return list(images), labels
+
+
+class _GoldenRunner:
+    """
+    One interpreter plus the conversion of golden RGB images into its input tensor.
+    """
+
+    def __init__(self, model_path, warmup_image, num_threads=None, mean=127.5, std=127.5):
+        self.interpreter = tflite.Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self.mean = mean
+        self.std = std
+        self.latencies = []
+        # Warm-up so one-time allocations are not timed
+        self.run(warmup_image)
+        self.latencies.clear()
+        # Deterministic memory estimate: weights plus all tensors (an upper bound of the arena).
+        # RSS deltas are too noisy inside a long-running process to compare two models.
+        self.memory_bytes = sum(
+            int(np.prod(t["shape"])) * np.dtype(t["dtype"]).itemsize
+            for t in self.interpreter.get_tensor_details()
+        )
+
+    def _to_input(self, image):
+        height, width = (int(d) for d in self.input["shape"][1:3])
+        if image.shape[:2] != (height, width):
+            import cv2
+            image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+        dtype = np.dtype(self.input["dtype"])
+        scale, zero_point = self.input.get("quantization", (0.0, 0))
+        if dtype == np.uint8 and (not scale or abs(scale * self.std - 1.0) < 0.01):
+            return image[np.newaxis].astype(np.uint8, copy=False)
+        real = (image.astype(np.float32) - self.mean) / self.std
+        if np.issubdtype(dtype, np.floating):
+            return real[np.newaxis].astype(dtype)
+        info = np.iinfo(dtype)
+        quantized = np.rint(real / scale + zero_point) if scale else image.astype(np.float32)
+        return np.clip(quantized, info.min, info.max)[np.newaxis].astype(dtype)
+
+    def run(self, image):
+        """
+        Runs one golden image and returns the dequantized output row.
+        """
+        self.interpreter.set_tensor(self.input["index"], self._to_input(image))
+        started = time.perf_counter()
+        self.interpreter.invoke()
+        self.latencies.append(time.perf_counter() - started)
+        output = self.interpreter.get_tensor(self.output["index"]).reshape(-1)
+        scale, zero_point = self.output.get("quantization", (0.0, 0))
+        if scale and np.issubdtype(output.dtype, np.integer):
+            return (output.astype(np.float32) - zero_point) * scale
+        return output.astype(np.float32)
+
+
+def compare_models(current_path, candidate_path, golden_path, tolerances=None, num_threads=None, min_runs=10,
+                   mean=127.5, std=127.5):
+    """
+    Runs the current and the candidate model over a golden set and decides whether the
+    candidate may replace the current model.
+
+    Both models see the same inputs, interleaved, so thermal or load changes affect
+    them equally. The report contains the top-1 match rate, the max absolute difference
+    of the dequantized outputs, top-1 accuracy when the golden set has labels, median
+    latencies, tensor memory, and "passed" plus the reasons for a rejection.
+
+    Parameters:
+        current_path (str): Model currently deployed
+        candidate_path (str): Model to evaluate
+        golden_path (str): .npz file or frame directory (see load_golden_set)
+        tolerances (dict): Overrides of DEFAULT_TOLERANCES (other keys are ignored)
+        num_threads (int): Interpreter threads for both models
+        min_runs (int): Minimum timed invocations per model (the golden set is repeated)
+        mean, std (float): Pixel normalization of float/int8 inputs, as in settings.yaml
+
+    Returns:
+        dict: Comparison report
+    """
+    limits = dict(DEFAULT_TOLERANCES)
+    limits.update({key: value for key, value in (tolerances or {}).items() if key in DEFAULT_TOLERANCES})
+    images, labels = load_golden_set(golden_path)
+
+    current = _GoldenRunner(current_path, images[0], num_threads, mean, std)
+    candidate = _GoldenRunner(candidate_path, images[0], num_threads, mean, std)
+
+    matches = 0
+    correct = {"current": 0, "candidate": 0}
+    max_abs_diff = 0.0
+    comparable = True
+    runs = max(len(images), min_runs)
+    for i in range(runs):
+        image = images[i % len(images)]
+        out_current = current.run(image)
+        out_candidate = candidate.run(image)
+        if i >= len(images):
+            continue  # extra runs only collect latencies
+        top_current, top_candidate = int(np.argmax(out_current)), int(np.argmax(out_candidate))
+        matches += top_current == top_candidate
+        if labels is not None:
+            correct["current"] += top_current == int(labels[i])
+            correct["candidate"] += top_candidate == int(labels[i])
+        if out_current.shape == out_candidate.shape:
+            max_abs_diff = max(max_abs_diff, float(np.max(np.abs(out_current - out_candidate))))
+        else:
+            comparable = False
+
+    latency_current = float(np.median(current.latencies)) * 1000.0
+    latency_candidate = float(np.median(candidate.latencies)) * 1000.0
+    report = {
+        "golden_set": golden_path,
+        "samples": len(images),
+        "top1_match_rate": matches / len(images),
+        "max_abs_diff": max_abs_diff if comparable else None,
+        "latency_ms": {"current": latency_current, "candidate": latency_candidate,
+                       "ratio": latency_candidate / latency_current if latency_current else None},
+        "memory_mb": {"current": current.memory_bytes / 2 ** 20, "candidate": candidate.memory_bytes / 2 ** 20,
+                      "ratio": candidate.memory_bytes / current.memory_bytes if current.memory_bytes else None},
+        "size_bytes": {"current": os.path.getsize(current_path), "candidate": os.path.getsize(candidate_path)},
+        "tolerances": limits,
+    }
+    if labels is not None:
+        report["accuracy"] = {name: count / len(images) for name, count in correct.items()}
+
+    reasons = []
+    if report["top1_match_rate"] < limits["min_top1_match"]:
+        reasons.append(f"top-1 match rate {report['top1_match_rate']:.2%} < {limits['min_top1_match']:.2%}")
+    if limits["max_abs_diff"] is not None:
+        if report["max_abs_diff"] is None:
+            reasons.append("output shapes differ, outputs cannot be compared")
+        elif report["max_abs_diff"] > limits["max_abs_diff"]:
+            reasons.append(f"max abs diff {report['max_abs_diff']:.4f} > {limits['max_abs_diff']}")
+    ratio = report["latency_ms"]["ratio"]
+    if ratio is not None and limits["max_latency_ratio"] is not None and ratio > limits["max_latency_ratio"]:
+        reasons.append(f"{ratio:.2f}x slower than the current model (limit {limits['max_latency_ratio']}x)")
+    ratio = report["memory_mb"]["ratio"]
+    if ratio is not None and limits["max_memory_ratio"] is not None and ratio > limits["max_memory_ratio"]:
+        reasons.append(f"uses {ratio:.2f}x the memory of the current model (limit {limits['max_memory_ratio']}x)")
+    if "accuracy" in report and limits["max_accuracy_drop"] is not None:
+        drop = report["accuracy"]["current"] - report["accuracy"]["candidate"]
+        if drop > limits["max_accuracy_drop"]:
+            reasons.append(f"top-1 accuracy drops by {drop:.2%} (limit {limits['max_accuracy_drop']:.2%})")
+
+    report["passed"] = not reasons
+    report["reasons"] = reasons
+    return report
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate the configured model, or gate a candidate against it.")
+    parser.add_argument("--candidate", help="Candidate .tflite model to compare against the current model")
+    parser.add_argument("--golden", help="Golden set (.npz or frame directory). Default: model.regression_gate.golden_set")
+    parser.add_argument("--current", help="Current model (default: model.path from settings.yaml)")
+    args = parser.parse_args()
+
     cfg = Config()
-    model_path = cfg.get("model", "path")
+    model_path = args.current or cfg.get("model", "path")
     input_shape = cfg.get("model", "input_shape")
 
+    if args.candidate:
+        if not validate_tflite_model(args.candidate, input_shape):
+            print("Validación fallida.")
+            sys.exit(1)
+        gate_cfg = cfg.get("model", "regression_gate", default={})
+        result = compare_models(model_path, args.candidate,
+                                args.golden or gate_cfg.get("golden_set", "models/golden_set.npz"),
+                                tolerances=gate_cfg,
+                                num_threads=cfg.get("model", "num_threads"),
+                                mean=cfg.get("model", "input_mean", default=127.5),
+                                std=cfg.get("model", "input_std", default=127.5))
+        print(json.dumps(result, indent=2))
+        print("Candidate accepted." if result["passed"] else "Candidate rejected: " + "; ".join(result["reasons"]))
+        sys.exit(0 if result["passed"] else 1)
+
     valid = validate_tflite_model(model_path, input_shape)
     if not valid:
         print("Validación fallida.")
     else:
-        print("Validación exitosa.")
\ No newline at end of file
+        print("Validación exitosa.")
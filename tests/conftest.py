@@ -0,0 +1,39 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+# The edge node modules and the receiver tools are plain scripts, imported by module name
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in ("src", "tools", os.path.join("tools", "rest_api")):
+    sys.path.insert(0, os.path.join(ROOT, path))
+
+
+@pytest.fixture
+def config():
+    """
+    Returns a builder of validated Configs: the shipped settings.yaml with overrides merged in.
+    Both channels are disabled unless an override enables them.
+    """
+    from config import Config
+    base = Config(os.path.join(ROOT, "config", "settings.yaml")).with_overrides(
+        {"communication": {"mqtt": {"enabled": False}, "rest": {"enabled": False}}}
+    )
+    return lambda overrides=None: base.with_overrides(overrides or {})
+
+
+@pytest.fixture
+def receiver(tmp_path, monkeypatch):
+    """
+    Imports a fresh REST receiver whose data, model and config directories live in tmp_path.
+    """
+    monkeypatch.chdir(tmp_path)
+    if not os.path.exists("config/settings.yaml"):
+        os.makedirs("config", exist_ok=True)
+        shutil.copyfile(os.path.join(ROOT, "config", "settings.yaml"), "config/settings.yaml")
+    sys.modules.pop("rest_receiver", None)
+    import rest_receiver
+    yield rest_receiver
+    rest_receiver.store.close()
+    sys.modules.pop("rest_receiver", None)
@@ -0,0 +1,86 @@
+import pytest
+
+from adaptive import AdaptiveRate, SystemMonitor
+
+
+class FakeMonitor:
+    def __init__(self, **readings):
+        self.readings = {"soc_temperature": 50.0, "throttled": False, "battery": None}
+        self.readings.update(readings)
+
+    def read(self):
+        return self.readings
+
+
+def adaptive(monitor, interval=4.0, **kwargs):
+    return AdaptiveRate(interval, min_interval=1.0, max_interval=30.0, monitor=monitor, adjust_every=0,
+                        **kwargs)
+
+
+@pytest.mark.parametrize("readings, backlog", [
+    ({"soc_temperature": 80.0}, 0),
+    ({"throttled": True}, 0),
+    ({"battery": 25.0}, 0),
+    ({}, 3),
+])
+def test_pressure_slows_down(readings, backlog):
+    rate = adaptive(FakeMonitor(**readings))
+    assert rate.update(backlog=backlog) == pytest.approx(6.0)
+
+
+def test_cool_idle_node_speeds_up_down_to_min_interval():
+    rate = adaptive(FakeMonitor(soc_temperature=50.0), interval=1.1)
+    assert rate.update() == pytest.approx(1.0)
+    assert rate.reason == "headroom"
+
+
+def test_between_thresholds_keeps_interval():
+    rate = adaptive(FakeMonitor(soc_temperature=70.0))
+    assert rate.update() == 4.0
+    assert rate.reason == "steady"
+
+
+def test_critical_battery_runs_at_max_interval():
+    rate = adaptive(FakeMonitor(battery=5.0))
+    assert rate.update() == 30.0
+
+
+def test_interval_stays_above_latency_headroom():
+    rate = adaptive(FakeMonitor(), interval=2.0, latency_headroom=1.5)
+    rate.observe_latency(2.0)
+    assert rate.update() == pytest.approx(3.0)
+    assert rate.reason.startswith("inference latency")
+
+
+def test_interval_changes_at_most_once_per_adjust_period():
+    rate = AdaptiveRate(4.0, monitor=FakeMonitor(soc_temperature=80.0), adjust_every=3600)
+    assert rate.update() == 4.0
+
+
+def test_latency_is_smoothed():
+    rate = adaptive(FakeMonitor())
+    rate.observe_latency(1.0)
+    rate.observe_latency(2.0, alpha=0.5)
+    assert rate.latency == pytest.approx(1.5)
+
+
+def test_system_monitor_reads_sysfs_and_caches(tmp_path, monkeypatch):
+    thermal = tmp_path / "temp"
+    battery = tmp_path / "capacity"
+    thermal.write_text("61500\n")
+    battery.write_text("42\n")
+    monkeypatch.setattr(SystemMonitor, "THROTTLED_PATH", str(tmp_path / "missing"))
+    monitor = SystemMonitor(str(thermal), str(battery), poll_interval=3600)
+    monitor._vcgencmd = None
+
+    assert monitor.read() == {"soc_temperature": 61.5, "throttled": None, "battery": 42.0}
+    thermal.write_text("90000\n")
+    assert monitor.read()["soc_temperature"] == 61.5
+
+
+def test_system_monitor_reports_throttling(tmp_path, monkeypatch):
+    throttled = tmp_path / "get_throttled"
+    throttled.write_text("0x50005\n")
+    monkeypatch.setattr(SystemMonitor, "THROTTLED_PATH", str(throttled))
+    monitor = SystemMonitor(str(tmp_path / "temp"), str(tmp_path / "capacity"))
+    assert monitor.read() == {"soc_temperature": None, "throttled": True, "battery": None}
@@ -0,0 +1,127 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from batching import MicroBatcher
+from pipeline import Pipeline
+
+
+class BatchEngine:
+    fused_preprocessing = False
+    postprocess_enabled = False
+    model_path = "fake.tflite"
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.batch_sizes = []
+
+    def predict_batch(self, frames):
+        if self.fail:
+            raise RuntimeError("interpreter error")
+        self.batch_sizes.append(len(frames))
+        return np.stack([np.asarray(frame).reshape(-1)[:1] for frame in frames]).astype(np.float32)
+
+    def top1(self, output):
+        return int(np.argmax(output)), float(np.max(output))
+
+
+@pytest.fixture
+def batcher_factory():
+    batchers = []
+
+    def build(engine, **kwargs):
+        batcher = MicroBatcher(engine, **kwargs)
+        batcher.start()
+        batchers.append(batcher)
+        return batcher
+
+    yield build
+    for batcher in batchers:
+        batcher.stop()
+
+
+def test_full_batch_is_dispatched_in_one_call(batcher_factory):
+    engine = BatchEngine()
+    batcher = batcher_factory(engine, max_batch_size=4, max_wait_ms=1000)
+    futures = [batcher.submit(np.full((1, 2), i)) for i in range(4)]
+
+    outputs = [future.result(timeout=1.0) for future in futures]
+    assert engine.batch_sizes == [4]
+    assert [output.tolist() for output in outputs] == [[[0.0]], [[1.0]], [[2.0]], [[3.0]]]
+    # Publishing postprocesses each output with the engine that produced it
+    assert all(future.engine is engine for future in futures)
+
+
+def test_partial_batch_is_dispatched_after_max_wait(batcher_factory):
+    engine = BatchEngine()
+    batcher = batcher_factory(engine, max_batch_size=8, max_wait_ms=20)
+    started = time.monotonic()
+    future = batcher.submit(np.ones((1, 2)))
+
+    assert future.result(timeout=1.0).shape == (1, 1)
+    assert time.monotonic() - started >= 0.015
+    assert engine.batch_sizes == [1]
+
+
+def test_failed_batch_sets_exception_on_every_future(batcher_factory):
+    batcher = batcher_factory(BatchEngine(fail=True), max_batch_size=2, max_wait_ms=1000)
+    futures = [batcher.submit(np.ones((1, 2))) for _ in range(2)]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=1.0)
+
+
+def test_submit_requires_running_batcher():
+    with pytest.raises(RuntimeError):
+        MicroBatcher(BatchEngine()).submit(np.ones((1, 2)))
+
+
+def test_concurrent_submitters_are_grouped(batcher_factory):
+    engine = BatchEngine()
+    batcher = batcher_factory(engine, max_batch_size=4, max_wait_ms=50)
+    results = []
+
+    def submit(value):
+        results.append(batcher.submit(np.full((1, 2), value)).result(timeout=1.0))
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 8
+    assert sum(engine.batch_sizes) == 8
+    assert max(engine.batch_sizes) <= 4
+
+
+class FrameSensor:
+    def __init__(self, frames):
+        self.frames = frames
+
+    def get_input(self):
+        if not self.frames:
+            return None
+        self.frames -= 1
+        return {"image": np.ones((1, 2)), "temperature": None, "frame_timestamp": time.time()}
+
+
+class Comm:
+    def __init__(self):
+        self.payloads = []
+
+    def publish_result(self, payload, top1=None):
+        self.payloads.append(payload)
+
+
+def test_pipeline_counts_and_logs_failed_batches(caplog):
+    engine = BatchEngine(fail=True)
+    comm = Comm()
+    pipeline = Pipeline(FrameSensor(2), engine, comm, interval=0.01, mode="pipelined", queue_size=4,
+                        overflow="block", batcher=MicroBatcher(engine, max_batch_size=1))
+    pipeline.run()
+
+    assert comm.payloads == []
+    assert pipeline.failed_results == 2
+    assert "batched inference failed: interpreter error" in caplog.text
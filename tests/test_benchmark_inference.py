@@ -0,0 +1,59 @@
+import json
+import os
+import queue
+
+import numpy as np
+import pytest
+
+import benchmark_inference
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class RecordingEngine:
+    instances = []
+
+    def __init__(self, config=None, model_path=None, num_threads=None):
+        self.config = config
+        self.input_shape = (1, 4, 4, 3)
+        self.input_dtype = np.uint8
+        self.backend = "tflite"
+        self._batch_supported = True
+        self.calls = []
+        RecordingEngine.instances.append(self)
+
+    def predict(self, frame):
+        self.calls.append(("predict", 1))
+
+    def predict_batch(self, frames):
+        self.calls.append(("predict_batch", len(frames)))
+
+
+@pytest.mark.parametrize("batch_size", [1, 4])
+def test_every_batch_size_uses_predict_batch_without_fused_preprocessing(monkeypatch, tmp_path, batch_size):
+    model = tmp_path / "model.tflite"
+    model.write_bytes(b"model")
+    monkeypatch.setattr(benchmark_inference, "InferenceEngine", RecordingEngine)
+    results = queue.Queue()
+
+    benchmark_inference.run_case(os.path.join(ROOT, "config", "settings.yaml"), str(model), 1, batch_size,
+                                 warmup=1, iterations=3, queue=results)
+
+    result = results.get_nowait()
+    engine = RecordingEngine.instances[-1]
+    assert engine.config.get("model", "fused_preprocessing") is False
+    assert engine.calls == [("predict_batch", batch_size)] * 4
+    assert result["iterations"] == 3
+    assert len(result["model_sha256"]) == 64
+
+
+def test_compare_flags_p50_regressions(tmp_path, capsys):
+    case = {"model": "m.tflite", "backend": "tflite", "num_threads": 4, "batch_size": 1}
+    baseline = tmp_path / "previous.json"
+    baseline.write_text(json.dumps({"results": [dict(case, latency_ms={"p50": 10.0}, throughput_fps=100.0)]}))
+
+    assert benchmark_inference.compare([dict(case, latency_ms={"p50": 10.5}, throughput_fps=95.0)],
+                                       str(baseline), tolerance=0.10)
+    assert not benchmark_inference.compare([dict(case, latency_ms={"p50": 12.0}, throughput_fps=80.0)],
+                                           str(baseline), tolerance=0.10)
+    assert "REGRESSION" in capsys.readouterr().out
@@ -0,0 +1,277 @@
+import gzip
+import json
+import socket
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from communication import Communicator, DeliveryWorker, DeltaPolicy
+from spool import DiskSpool
+
+
+class FlakySend:
+    """Records delivered bodies; fails while self.down is set."""
+
+    def __init__(self, down=False):
+        self.down = down
+        self.delivered = []
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, bodies):
+        with self.lock:
+            self.calls += 1
+            if self.down:
+                return False
+            self.delivered.extend(bodies)
+            return True
+
+
+def wait_until(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_worker_delivers_in_publish_order():
+    send = FlakySend()
+    worker = DeliveryWorker("rest", send)
+    worker.start()
+    try:
+        for i in range(20):
+            worker.submit(b"%d" % i)
+        assert wait_until(lambda: len(send.delivered) == 20)
+        assert send.delivered == [b"%d" % i for i in range(20)]
+        assert worker.pending() == 0
+    finally:
+        worker.stop()
+
+
+def test_worker_spools_during_outage_and_replays_in_order(tmp_path):
+    spool = DiskSpool(str(tmp_path / "outbox.db"))
+    send = FlakySend(down=True)
+    worker = DeliveryWorker("mqtt", send, spool=spool, queue_size=2, backoff_initial=0.05, backoff_max=0.05)
+    worker.start()
+    try:
+        for i in range(6):
+            worker.submit(b"%d" % i)
+        assert wait_until(lambda: send.calls >= 2)
+        assert spool.count("mqtt") > 0
+
+        send.down = False
+        assert wait_until(lambda: len(send.delivered) == 6)
+        assert send.delivered == [b"%d" % i for i in range(6)]
+        assert wait_until(lambda: worker.pending() == 0)
+        assert spool.count("mqtt") == 0
+    finally:
+        worker.stop()
+
+
+def test_worker_without_spool_drops_oldest_when_full():
+    worker = DeliveryWorker("rest", FlakySend(), queue_size=2)
+    for i in range(5):
+        worker.submit(b"%d" % i)
+    assert worker.dropped == 3
+    assert worker.pending() == 2
+
+
+def test_undelivered_messages_are_spooled_on_stop_and_resumed(tmp_path):
+    path = str(tmp_path / "outbox.db")
+    spool = DiskSpool(path)
+    worker = DeliveryWorker("rest", FlakySend(down=True), spool=spool, backoff_initial=10)
+    worker.submit(b"a")
+    worker.submit(b"b")
+    worker.stop()
+    spool.close()
+
+    spool = DiskSpool(path)
+    send = FlakySend()
+    resumed = DeliveryWorker("rest", send, spool=spool)
+    resumed.start()
+    try:
+        resumed.submit(b"c")
+        assert wait_until(lambda: len(send.delivered) == 3)
+        assert send.delivered == [b"a", b"b", b"c"]
+    finally:
+        resumed.stop()
+
+
+def test_async_communicator_queues_instead_of_sending(config):
+    comm = Communicator(config=config({
+        "communication": {"rest": {"enabled": True, "batch_endpoint": None},
+                          "publisher": {"async": True, "spool_path": None}}
+    }))
+    sent = FlakySend()
+    comm.workers["rest"].send = sent
+    try:
+        comm.publish_result({"result": [1, 2], "temperature": 21.5})
+        assert wait_until(lambda: len(sent.delivered) == 1)
+    finally:
+        comm.stop()
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FakeSession:
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+        self.posts = []
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        self.posts.append((url, data, headers))
+        return FakeResponse(self.status_code)
+
+    def close(self):
+        pass
+
+
+def rest_communicator(config, **rest):
+    comm = Communicator(config=config({"communication": {"rest": dict({"enabled": True}, **rest)}}))
+    comm.session = FakeSession()
+    return comm
+
+
+@pytest.mark.parametrize("status, delivered", [
+    (200, True), (400, True), (413, True), (408, False), (429, False), (500, False), (503, False)
+])
+def test_send_rest_retries_only_transient_statuses(config, status, delivered):
+    comm = rest_communicator(config)
+    comm.session.status_code = status
+    assert comm._send_rest([b'{"seq":0}']) is delivered
+
+
+def test_send_rest_batches_to_the_batch_endpoint_with_gzip(config):
+    comm = rest_communicator(config, gzip=True, batch_endpoint="http://receiver/api/results/batch")
+    assert comm._send_rest([b'{"seq":0}', b'{"seq":1}'])
+
+    url, data, headers = comm.session.posts[0]
+    assert url == "http://receiver/api/results/batch"
+    assert headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(data)) == [{"seq": 0}, {"seq": 1}]
+
+
+def test_receiver_batch_endpoint_accepts_gzip_arrays(receiver):
+    body = gzip.compress(json.dumps([{"temperature": 20.5}, {"temperature": 21.0}]).encode())
+    response = receiver.app.test_client().post(
+        "/api/results/batch", data=body,
+        headers={"Content-Type": "application/json", "Content-Encoding": "gzip"}
+    )
+
+    assert response.status_code == 200
+    assert response.get_json()["received"] == 2
+    receiver.store.flush()
+    assert receiver.store.written == 2
+
+
+def test_receiver_batch_endpoint_rejects_non_arrays(receiver):
+    response = receiver.app.test_client().post("/api/results/batch", json={"temperature": 20.5})
+    assert response.status_code == 400
+
+
+def test_payloads_carry_node_sequence_and_send_time(config):
+    comm = rest_communicator(config)
+    comm.node_id = "node-7"
+    comm.publish_result({"result": [1], "temperature": 20.0})
+    comm.publish_result({"result": [2], "temperature": 20.0, "node": "explicit"})
+
+    first, second = (json.loads(data) for _, data, _ in comm.session.posts)
+    assert (first["node"], first["seq"], second["node"], second["seq"]) == ("node-7", 0, "explicit", 1)
+    assert abs(first["sent_at"] - time.time()) < 5
+
+
+def test_node_id_defaults_to_the_hostname(config):
+    assert Communicator(config=config()).node_id == socket.gethostname()
+    assert Communicator(config=config({"communication": {"node_id": "node-7"}})).node_id == "node-7"
+
+
+def result(scores, temperature=20.0, source=None):
+    data = {"result": scores, "temperature": temperature}
+    if source:
+        data["source"] = source
+    return data
+
+
+def test_delta_policy_publishes_only_news():
+    policy = DeltaPolicy(confidence_band=0.1, temperature_deadband=0.5, heartbeat_interval=3600)
+    assert policy.filter(result([0.9, 0.1]))["event"] == "initial"
+    assert policy.filter(result([0.85, 0.15])) is None
+    assert policy.filter(result([0.1, 0.9]))["event"] == "class_change"
+    assert policy.filter(result([0.1, 0.7]))["event"] == "confidence"
+    published = policy.filter(result([0.1, 0.7], temperature=21.0))
+    assert (published["event"], published["suppressed"]) == ("temperature", 0)
+
+
+def test_delta_policy_reports_slow_drifts_once_they_add_up():
+    policy = DeltaPolicy(temperature_deadband=0.5, heartbeat_interval=3600)
+    policy.filter(result([1.0], temperature=20.0))
+    assert policy.filter(result([1.0], temperature=20.3)) is None
+    published = policy.filter(result([1.0], temperature=20.6))
+    assert (published["event"], published["suppressed"]) == ("temperature", 1)
+
+
+def test_delta_policy_sends_heartbeats_when_nothing_changes():
+    policy = DeltaPolicy(heartbeat_interval=0.05)
+    policy.filter(result([1.0]))
+    assert policy.filter(result([1.0])) is None
+    time.sleep(0.06)
+    published = policy.filter(result([1.0]))
+    assert (published["event"], published["suppressed"]) == ("heartbeat", 1)
+
+
+def test_delta_policy_tracks_each_source_separately():
+    policy = DeltaPolicy(heartbeat_interval=3600)
+    assert policy.filter(result([1.0], source="front"))["event"] == "initial"
+    assert policy.filter(result([1.0], source="back"))["event"] == "initial"
+    assert policy.filter(result([1.0], source="front")) is None
+    policy.reset()
+    assert policy.filter(result([1.0], source="front"))["event"] == "initial"
+
+
+def test_communicator_drops_suppressed_results_before_sending(config):
+    comm = Communicator(config=config({"communication": {"rest": {"enabled": True},
+                                                         "policy": {"mode": "delta"}}}))
+    comm.session = FakeSession()
+    for _ in range(3):
+        comm.publish_result(result([0.9, 0.1]))
+
+    assert len(comm.session.posts) == 1
+    assert json.loads(comm.session.posts[0][1])["event"] == "initial"
+
+
+class QuantizedEngine:
+    """Returns raw uint8 outputs, as a quantized model without postprocessing does."""
+
+    fused_preprocessing = False
+    postprocess_enabled = False
+    model_path = "quantized.tflite"
+
+    def __init__(self):
+        from postprocess import Postprocessor
+        self.postprocessor = Postprocessor(quantization=(1 / 256, 0))
+
+    def predict(self, image):
+        return np.array([[int(image.flat[0]), 10]], dtype=np.uint8)
+
+    def top1(self, output):
+        return self.postprocessor.top1(output)
+
+
+def test_delta_policy_compares_dequantized_scores_of_raw_outputs(config):
+    from pipeline import Pipeline
+    comm = Communicator(config=config({"communication": {"rest": {"enabled": True},
+                                                         "policy": {"mode": "delta", "confidence_band": 0.1}}}))
+    comm.session = FakeSession()
+    pipeline = Pipeline(None, QuantizedEngine(), comm, interval=1)
+    for value in (200, 201, 205, 240):
+        image = np.full((1, 2, 2, 3), value, dtype=np.uint8)
+        pipeline._publish(pipeline._infer({"image": image, "temperature": 20.0}))
+
+    # One quantization step (1/256) is far inside the band; 200 -> 240 is not
+    events = [json.loads(data)["event"] for _, data, _ in comm.session.posts]
+    assert events == ["initial", "confidence"]
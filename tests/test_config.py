@@ -0,0 +1,71 @@
+import os
+import re
+
+import pytest
+
+from config import Config
+
+SETTINGS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "settings.yaml")
+
+
+def test_bundled_settings_are_valid(config):
+    assert config().validate() is not None
+
+
+def test_get_keeps_explicit_false_and_zero(config):
+    cfg = config({"runtime": {"queue_size": 0}, "model": {"update": {"enabled": False}}})
+    assert cfg.get("runtime", "queue_size", default=2) == 0
+    assert cfg.get("model", "update", "enabled", default=True) is False
+    assert cfg.get("model", "missing", default="fallback") == "fallback"
+    assert cfg.get("model", "path", "too", "deep", default=None) is None
+
+
+def test_with_overrides_merges_nested_sections(config):
+    base = config()
+    cfg = base.with_overrides({"model": {"num_threads": 2}})
+    assert cfg.get("model", "num_threads") == 2
+    # Untouched keys of the same section survive the merge
+    assert cfg.get("model", "path") == base.get("model", "path")
+    assert cfg is not base
+
+
+def test_sections_are_read_only(config):
+    cfg = config({"sensors": {"cameras": [{"id": "front", "index": 0}]}})
+    cameras = cfg.get("sensors", "cameras")
+    assert isinstance(cameras, tuple)
+    with pytest.raises(TypeError):
+        cfg.get("model")["path"] = "other.tflite"
+    with pytest.raises(TypeError):
+        cameras[0]["index"] = 1
+
+
+@pytest.mark.parametrize("overrides, message", [
+    ({"model": {"path": "model.bin"}}, "model.path"),
+    ({"model": {"input_shape": [1, 224, 224]}}, "model.input_shape"),
+    ({"model": {"num_threads": 0}}, "model.num_threads"),
+    ({"sensors": {"read_interval": 0}}, "sensors.read_interval"),
+    ({"sensors": {"cameras": [{"id": "front"}]}}, "sensors.cameras[0]"),
+    ({"runtime": {"mode": "parallel"}}, "runtime.mode"),
+    ({"runtime": {"overflow_policy": "drop_newest"}}, "runtime.overflow_policy"),
+    ({"communication": {"mqtt": {"codec": "xml"}}}, "communication.mqtt.codec"),
+    ({"communication": {"mqtt": {"enabled": True, "broker": ""}}}, "communication.mqtt.broker"),
+    ({"tiling": {"enabled": True, "overlap": 1.5}}, "tiling.overlap"),
+])
+def test_validate_rejects_invalid_settings(config, overrides, message):
+    with pytest.raises(ValueError, match=re.escape(message)):
+        config(overrides)
+
+
+def test_validate_lists_every_problem(config):
+    with pytest.raises(ValueError) as error:
+        config({"model": {"num_threads": -1}, "runtime": {"mode": "parallel"}})
+    assert "model.num_threads" in str(error.value)
+    assert "runtime.mode" in str(error.value)
+
+
+def test_load_parses_each_file_once(monkeypatch):
+    monkeypatch.setattr(Config, "_cache", {})
+    first = Config.load(SETTINGS)
+    assert Config.load(SETTINGS) is first
+    assert first.with_overrides({"model": {"num_threads": 1}}) is not first
+    assert Config.load(SETTINGS) is first
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from gating import ChangeGate
+
+
+def gradient_frame(offset=0):
+    row = np.linspace(0, 200, 64, dtype=np.float32)
+    frame = np.repeat(row[np.newaxis], 48, axis=0) + offset
+    return np.repeat(frame[..., np.newaxis], 3, axis=2).clip(0, 255).astype(np.uint8)
+
+
+def infer(gate, frame, result):
+    cached, signature = gate.check(frame)
+    if cached is None:
+        gate.update(signature, result)
+        return result
+    return cached
+
+
+@pytest.mark.parametrize("method", ["diff", "phash"])
+def test_unchanged_frame_reuses_cached_result(method):
+    gate = ChangeGate(method=method)
+    assert infer(gate, gradient_frame(), "first") == "first"
+    assert infer(gate, gradient_frame(), "second") == "first"
+    assert gate.stats() == {"executed": 1, "skipped": 1}
+
+
+def test_diff_threshold_separates_noise_from_change():
+    gate = ChangeGate(method="diff", diff_threshold=0.03)
+    infer(gate, gradient_frame(), "first")
+    assert infer(gate, gradient_frame(offset=3), "noise") == "first"
+    assert infer(gate, gradient_frame(offset=40), "changed") == "changed"
+
+
+def test_phash_detects_structural_change():
+    gate = ChangeGate(method="phash", hash_threshold=6)
+    infer(gate, gradient_frame(), "first")
+    assert infer(gate, gradient_frame()[:, ::-1].copy(), "mirrored") == "mirrored"
+
+
+def test_cached_result_expires_after_max_reuse_age():
+    gate = ChangeGate(max_reuse_age=0)
+    infer(gate, gradient_frame(), "first")
+    assert infer(gate, gradient_frame(), "second") == "second"
+
+
+def test_reset_forces_inference():
+    gate = ChangeGate()
+    infer(gate, gradient_frame()[np.newaxis], "first")
+    gate.reset()
+    assert infer(gate, gradient_frame()[np.newaxis], "after reset") == "after reset"
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        ChangeGate(method="ssim")
@@ -0,0 +1,75 @@
+import logging
+import os
+import queue
+import time
+
+import numpy as np
+import pytest
+
+from load_test_fleet import StorageWatcher, percentiles, run_nodes, synthetic_payload
+from storage import ResultStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_percentiles_are_reported_in_milliseconds():
+    report = percentiles([0.001 * i for i in range(1, 101)])
+    assert report["count"] == 100
+    assert report["max"] == 100.0
+    assert report["p50"] == pytest.approx(50.5)
+    assert report["p99"] == pytest.approx(99.01)
+    assert percentiles([]) is None
+
+
+def test_synthetic_payload_looks_like_a_postprocessed_result():
+    payload = synthetic_payload(np.random.default_rng(0), num_classes=10, top_k=3)
+    result = payload["result"]
+    assert len(set(result["classes"])) == 3
+    assert all(0 <= cls < 10 for cls in result["classes"])
+    assert result["scores"] == sorted(result["scores"], reverse=True)
+    assert sum(result["scores"]) == pytest.approx(1.0, abs=1e-3)
+    assert 18.0 <= payload["temperature"] <= 30.0
+
+
+def test_storage_watcher_measures_new_records_of_the_fleet(tmp_path):
+    store = ResultStore(str(tmp_path / "results.db"))
+    store.add([{"seq": 0, "sent_at": time.time()}], node="load-old-0000")
+    store.flush()
+
+    watcher = StorageWatcher(store.path, "load-new", poll_interval=0.01)
+    watcher.start()
+    try:
+        sent_at = time.time()
+        store.add([{"seq": 0, "sent_at": sent_at}, {"seq": 1, "sent_at": sent_at}], node="load-new-0000")
+        store.add([{"seq": 1, "sent_at": sent_at}], node="load-new-0000")  # stored twice
+        store.add([{"seq": 0, "sent_at": sent_at}], node="other-node")
+        store.flush()
+        watcher.wait_for(2, timeout=2.0)
+        time.sleep(0.05)
+    finally:
+        watcher.stop()
+        store.close()
+
+    assert watcher.seen == {("load-new-0000", 0), ("load-new-0000", 1)}
+    assert watcher.duplicates == 1
+    assert len(watcher.end_to_end) == len(watcher.ingest) == 2
+    assert all(latency >= 0 for latency in watcher.end_to_end)
+
+
+def test_run_nodes_reports_totals_of_its_virtual_nodes():
+    results = queue.Queue()
+    overrides = {"communication": {"mqtt": {"enabled": False}, "rest": {"enabled": False},
+                                   "publisher": {"async": False}}}
+    level = logging.getLogger().level
+    try:
+        run_nodes(os.path.join(ROOT, "config", "settings.yaml"), overrides, ["load-0000", "load-0001"], None,
+                  rate=50, duration=0.1, drain_timeout=1.0, seed=0, queue=results)
+    finally:
+        # run_nodes quiets the root logger of its (normally child) process
+        logging.getLogger().setLevel(level)
+
+    report = results.get(timeout=1.0)
+    assert "error" not in report
+    assert report["sent"] >= 2
+    assert len(report["publish_call_seconds"]) == report["sent"]
+    assert report["pending"] == report["dropped"] == 0
@@ -0,0 +1,129 @@
+import json
+import threading
+import urllib.request
+
+import pytest
+
+from metrics import MetricsPublisher, MetricsRegistry, MetricsServer
+
+
+def test_counter_labels_and_exposition():
+    registry = MetricsRegistry()
+    sent = registry.counter("edge_sent_total", "Results sent", labels=("channel",))
+    sent.labels("mqtt").inc()
+    sent.labels("mqtt").inc(2)
+    sent.labels("re\"st").inc()
+
+    text = registry.expose()
+    assert "# HELP edge_sent_total Results sent" in text
+    assert "# TYPE edge_sent_total counter" in text
+    assert 'edge_sent_total{channel="mqtt"} 3' in text
+    assert 'edge_sent_total{channel="re\\"st"} 1' in text
+    assert registry.collect() == {"edge_sent_total": {"mqtt": 3, "re\"st": 1}}
+
+
+def test_counter_rejects_wrong_label_count():
+    registry = MetricsRegistry()
+    sent = registry.counter("edge_sent_total", "Results sent", labels=("channel",))
+    with pytest.raises(ValueError):
+        sent.labels("mqtt", "extra")
+
+
+def test_registering_twice_returns_the_same_metric():
+    registry = MetricsRegistry()
+    first = registry.counter("edge_frames_total", "Frames")
+    assert registry.counter("edge_frames_total", "Frames") is first
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram("edge_latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        latency.observe(value)
+
+    text = registry.expose()
+    assert 'edge_latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'edge_latency_seconds_bucket{le="1.0"} 3' in text
+    assert 'edge_latency_seconds_bucket{le="+Inf"} 4' in text
+    assert "edge_latency_seconds_count 4" in text
+    assert "edge_latency_seconds_sum 6.05" in text
+
+
+def test_histogram_quantiles_interpolate_inside_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram("edge_latency_seconds", "Latency", buckets=(1.0, 2.0))
+    for _ in range(10):
+        latency.observe(1.5)
+
+    summary = registry.collect()["edge_latency_seconds"][""]
+    assert summary["count"] == 10
+    assert summary["p50"] == pytest.approx(1.5)
+    assert summary["p90"] == pytest.approx(1.9)
+
+
+def test_histogram_quantile_of_empty_histogram_is_none():
+    registry = MetricsRegistry()
+    latency = registry.histogram("edge_latency_seconds", "Latency", labels=("stage",))
+    assert latency.labels("invoke").quantile(0.5) is None
+
+
+def test_histogram_timer_observes_elapsed_time():
+    registry = MetricsRegistry()
+    latency = registry.histogram("edge_latency_seconds", "Latency")
+    with latency.time():
+        pass
+    assert registry.collect()["edge_latency_seconds"][""]["count"] == 1
+
+
+def test_callback_metric_reads_value_at_scrape_time():
+    registry = MetricsRegistry()
+    depth = {"camera": 1}
+    registry.callback("edge_queue_depth", "Queued frames", lambda: dict(depth), label="source")
+    depth["camera"] = 4
+
+    assert 'edge_queue_depth{source="camera"} 4' in registry.expose()
+    assert registry.collect() == {"edge_queue_depth": {"camera": 4}}
+
+
+def test_callback_metric_is_replaced_and_tolerates_errors():
+    registry = MetricsRegistry()
+    registry.callback("edge_dropped_total", "Dropped", lambda: 1, type="counter")
+    registry.callback("edge_dropped_total", "Dropped", lambda: 1 / 0, type="counter")
+
+    text = registry.expose()
+    assert "# TYPE edge_dropped_total counter" in text
+    assert text.count("# HELP edge_dropped_total") == 1
+    assert registry.collect() == {"edge_dropped_total": {}}
+
+
+def test_metrics_server_serves_prometheus_text():
+    registry = MetricsRegistry()
+    registry.counter("edge_frames_total", "Frames").inc()
+    server = MetricsServer(registry, host="127.0.0.1", port=0)
+    server.start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert "edge_frames_total 1" in response.read().decode("utf-8")
+    finally:
+        server.stop()
+
+
+def test_metrics_publisher_sends_json_snapshots():
+    registry = MetricsRegistry()
+    registry.counter("edge_frames_total", "Frames").inc(5)
+    published = threading.Event()
+    bodies = []
+
+    def publish(body):
+        bodies.append(json.loads(body))
+        published.set()
+
+    publisher = MetricsPublisher(publish, interval=0.01, registry=registry, node_id="node-1")
+    publisher.start()
+    try:
+        assert published.wait(2.0)
+    finally:
+        publisher.stop()
+    assert bodies[0]["node"] == "node-1"
+    assert bodies[0]["metrics"] == {"edge_frames_total": {"": 5}}
@@ -0,0 +1,138 @@
+import hashlib
+import os
+
+import pytest
+import requests
+
+from model_fetcher import ModelFetcher, file_sha256
+
+MODEL = bytes(range(256)) * 64
+SHA256 = hashlib.sha256(MODEL).hexdigest()
+INFO_URL = "http://receiver/api/model/info"
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=b"", info=None, fail_after=None):
+        self.status_code = status_code
+        self.body = body
+        self.info = info
+        self.fail_after = fail_after
+
+    def json(self):
+        return self.info
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code}")
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            if self.fail_after is not None and start >= self.fail_after:
+                raise requests.ConnectionError("connection reset")
+            yield self.body[start:start + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    """Serves the model info and the model file, honouring Range requests."""
+
+    def __init__(self, data=MODEL, sha256=SHA256, ranges=True, fail_after=None):
+        self.data = data
+        self.sha256 = sha256
+        self.ranges = ranges
+        self.fail_after = fail_after
+        self.requests = []
+
+    def get(self, url, headers=None, stream=False, timeout=None):
+        self.requests.append((url, dict(headers or {})))
+        if url == INFO_URL:
+            return FakeResponse(200, info={"model": {"sha256": self.sha256, "size_bytes": len(self.data),
+                                                     "url": f"/api/model/versions/{self.sha256}"}})
+        fail_after, self.fail_after = self.fail_after, None
+        range_header = (headers or {}).get("Range")
+        if range_header and self.ranges:
+            offset = int(range_header[len("bytes="):-1])
+            if offset >= len(self.data):
+                return FakeResponse(416)
+            return FakeResponse(206, self.data[offset:], fail_after=fail_after)
+        return FakeResponse(200, self.data, fail_after=fail_after)
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    path = tmp_path / "model.tflite"
+    path.write_bytes(b"old model")
+    return str(path)
+
+
+def fetcher(model_path, session):
+    return ModelFetcher(model_path, INFO_URL, chunk_size=1024, session=session)
+
+
+def test_check_installs_a_new_model(model_path):
+    session = FakeSession()
+    model_fetcher = fetcher(model_path, session)
+    assert model_fetcher.check()
+    assert file_sha256(model_path) == SHA256
+    assert session.requests[1][0] == f"http://receiver/api/model/versions/{SHA256}"
+    assert model_fetcher.updates == 1
+
+    # Same hash: only the info endpoint is read
+    assert not model_fetcher.check()
+    assert len(session.requests) == 3
+
+
+def test_interrupted_download_resumes_with_a_range_request(model_path):
+    session = FakeSession(fail_after=4096)
+    model_fetcher = fetcher(model_path, session)
+    with pytest.raises(requests.ConnectionError):
+        model_fetcher.check()
+    with open(model_path, "rb") as f:
+        assert f.read() == b"old model"
+
+    assert model_fetcher.check()
+    assert session.requests[-1][1] == {"Range": "bytes=4096-"}
+    assert file_sha256(model_path) == SHA256
+
+
+def test_download_restarts_when_the_server_ignores_ranges(model_path):
+    session = FakeSession(ranges=False, fail_after=4096)
+    model_fetcher = fetcher(model_path, session)
+    with pytest.raises(requests.ConnectionError):
+        model_fetcher.check()
+    assert model_fetcher.check()
+    assert file_sha256(model_path) == SHA256
+
+
+def test_complete_part_file_is_installed_on_416(model_path):
+    session = FakeSession()
+    model_fetcher = fetcher(model_path, session)
+    part_path = model_fetcher._download("http://receiver/model", SHA256)
+    assert model_fetcher.check()
+    assert session.requests[-1][1] == {"Range": f"bytes={len(MODEL)}-"}
+    assert file_sha256(model_path) == SHA256
+    assert not os.path.exists(part_path)
+
+
+def test_hash_mismatch_discards_the_download(model_path):
+    session = FakeSession(sha256="0" * 64)
+    model_fetcher = fetcher(model_path, session)
+    with pytest.raises(ValueError):
+        model_fetcher.check()
+    with open(model_path, "rb") as f:
+        assert f.read() == b"old model"
+    # A corrupt download is not resumed on the next attempt
+    assert not any(name.endswith(".part") for name in os.listdir(os.path.dirname(model_path)))
+
+
+def test_local_sha256_is_recomputed_when_the_file_changes(model_path):
+    model_fetcher = fetcher(model_path, FakeSession())
+    assert model_fetcher.local_sha256() == hashlib.sha256(b"old model").hexdigest()
+    with open(model_path, "wb") as f:
+        f.write(b"newer model")
+    assert model_fetcher.local_sha256() == hashlib.sha256(b"newer model").hexdigest()
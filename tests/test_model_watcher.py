@@ -0,0 +1,67 @@
+import os
+import threading
+
+from model_watcher import ModelWatcher
+
+
+def replace_file(path, data):
+    staged = f"{path}.tmp"
+    with open(staged, "wb") as f:
+        f.write(data)
+    os.replace(staged, path)
+
+
+def watch(path, load):
+    swapped = []
+    ready = threading.Event()
+
+    def on_ready(engine):
+        swapped.append(engine)
+        ready.set()
+
+    watcher = ModelWatcher(str(path), load, on_ready, poll_interval=0.01, settle_time=0.01)
+    watcher.start()
+    return watcher, swapped, ready
+
+
+def test_replaced_model_is_loaded_and_swapped_in(tmp_path):
+    model = tmp_path / "model.tflite"
+    model.write_bytes(b"v1")
+    watcher, swapped, ready = watch(model, load=lambda: model.read_bytes())
+    try:
+        replace_file(str(model), b"version 2")
+        assert ready.wait(2.0)
+        assert swapped == [b"version 2"]
+        assert watcher.reloads == 1
+    finally:
+        watcher.stop()
+
+
+def test_failed_load_keeps_the_current_engine(tmp_path):
+    model = tmp_path / "model.tflite"
+    model.write_bytes(b"v1")
+    attempts = threading.Event()
+
+    def load():
+        attempts.set()
+        raise ValueError("corrupt model")
+
+    watcher, swapped, _ = watch(model, load)
+    try:
+        replace_file(str(model), b"broken")
+        assert attempts.wait(2.0)
+        watcher.stop()
+        assert swapped == []
+        assert watcher.reloads == 0
+    finally:
+        watcher.stop()
+
+
+def test_unchanged_model_is_not_reloaded(tmp_path):
+    model = tmp_path / "model.tflite"
+    model.write_bytes(b"v1")
+    watcher, swapped, ready = watch(model, load=lambda: "engine")
+    try:
+        assert not ready.wait(0.1)
+    finally:
+        watcher.stop()
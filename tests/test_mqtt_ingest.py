@@ -0,0 +1,139 @@
+import json
+import sqlite3
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from mqtt_ingest import MqttIngestor, SequenceTracker, parse_topic
+from payload_codec import get_codec
+from storage import ResultStore
+
+
+class FakeClient:
+    """In-process stand-in for a paho client: connects immediately and delivers on demand."""
+
+    def __init__(self):
+        self.subscriptions = None
+        self.on_connect = None
+        self.on_message = None
+        self.running = False
+
+    def connect_async(self, host, port):
+        self.address = (host, port)
+
+    def loop_start(self):
+        self.running = True
+        self.on_connect(self, None, {}, 0)
+
+    def loop_stop(self):
+        self.running = False
+
+    def disconnect(self):
+        pass
+
+    def subscribe(self, topics):
+        self.subscriptions = topics
+
+    def deliver(self, topic, payload):
+        self.on_message(self, None, SimpleNamespace(topic=topic, payload=payload))
+
+
+@pytest.fixture
+def ingest(tmp_path):
+    store = ResultStore(str(tmp_path / "results.db"), batch_size=10, flush_interval=0.05)
+    client = FakeClient()
+    ingestor = MqttIngestor(store, [("rpi/ai/results/#", 1)], client=client, decoders=2)
+    ingestor.start()
+    yield ingestor, client
+    store.close()
+
+
+def message(seq, node="node-1", codec="json", **fields):
+    return get_codec(codec).encode(dict({"node": node, "seq": seq, "sent_at": time.time(), "temperature": 20.0},
+                                        **fields))
+
+
+def test_ingestor_stores_messages_and_tracks_sequences(ingest):
+    ingestor, client = ingest
+    assert client.subscriptions == [("rpi/ai/results/#", 1)]
+
+    topic = "rpi/ai/results/node-1"
+    for seq in (0, 1, 3, 3, 0):  # seq 2 lost, 3 redelivered, then a node restart
+        client.deliver(topic, message(seq))
+    client.deliver(topic, message(1, codec="msgpack"))
+    client.deliver("rpi/ai/results/node-2", message(0, node="node-2", codec="cbor"))
+    ingestor.stop()
+
+    stats = ingestor.stats()
+    assert (stats["received"], stats["stored"], stats["written"]) == (7, 7, 7)
+    assert stats["nodes"] == 2
+    assert stats["sequence"] == {"records": 7, "missing": 1, "duplicates": 1, "restarts": 1}
+    assert set(stats["latency"]) == {"p50", "p99", "max"}
+    with sqlite3.connect(ingestor.store.path) as db:
+        nodes = [row[0] for row in db.execute("SELECT node FROM results ORDER BY id")]
+    assert sorted(nodes) == ["node-1"] * 6 + ["node-2"]
+
+
+def test_nodes_sharing_a_node_id_are_tracked_per_topic(ingest):
+    ingestor, client = ingest
+    for seq in range(3):
+        client.deliver("rpi/ai/results/a", message(seq, node="rpi-node-01"))
+        client.deliver("rpi/ai/results/b", message(seq, node="rpi-node-01"))
+    ingestor.stop()
+
+    stats = ingestor.stats()
+    assert stats["nodes"] == 2
+    assert stats["sequence"] == {"records": 6, "missing": 0, "duplicates": 0, "restarts": 0}
+
+
+def test_ingestor_counts_decode_errors_and_keeps_going(ingest):
+    ingestor, client = ingest
+    topic = "rpi/ai/results/node-1"
+    client.deliver(topic, b"{not json")
+    client.deliver(topic, b"[1, 2]")
+    client.deliver(topic, message(0))
+    ingestor.stop()
+
+    stats = ingestor.stats()
+    assert stats["received"] == 3
+    assert stats["decode_errors"] == 3  # the broken message and both non-record array items
+    assert stats["stored"] == stats["written"] == 1
+
+
+def test_ingestor_stores_batch_messages_record_by_record(ingest):
+    ingestor, client = ingest
+    batch = json.dumps([{"node": "node-1", "seq": seq, "temperature": 20.0} for seq in range(3)]).encode()
+    client.deliver("rpi/ai/results/node-1", batch)
+    ingestor.stop()
+
+    stats = ingestor.stats()
+    assert stats["received"] == 1
+    assert stats["sequence"]["records"] == stats["written"] == 3
+    assert stats["sequence"]["missing"] == 0
+
+
+def test_ingestor_drops_messages_when_the_queue_is_full(tmp_path):
+    store = ResultStore(str(tmp_path / "results.db"))
+    ingestor = MqttIngestor(store, client=FakeClient(), queue_size=1, put_timeout=0.01)
+    try:
+        assert ingestor.handle_message("rpi/ai/results/node-1", message(0))
+        assert not ingestor.handle_message("rpi/ai/results/node-1", message(1))
+        assert (ingestor.received, ingestor.dropped) == (1, 1)
+    finally:
+        store.close()
+
+
+def test_sequence_tracker_hands_out_latencies_once():
+    tracker = SequenceTracker()
+    tracker.observe("node-1", 0, 100.0, 100.25)
+    assert tracker.take_latencies() == [0.25]
+    assert tracker.take_latencies() == []
+
+
+@pytest.mark.parametrize("value, topic", [
+    ("rpi/ai/results/#:2", ("rpi/ai/results/#", 2)),
+    ("rpi/ai/results/#", ("rpi/ai/results/#", 1)),
+])
+def test_parse_topic(value, topic):
+    assert parse_topic(value, 1) == topic
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from payload_codec import decode_payload, detect_content_type, get_codec
+
+PAYLOAD = {"result": {"classes": [3, 1], "scores": [0.9, 0.05]}, "temperature": 21.5, "seq": 7, "node": "n1"}
+
+
+@pytest.mark.parametrize("name", ["json", "msgpack", "cbor"])
+def test_round_trip(name):
+    codec = get_codec(name)
+    assert codec.decode(codec.encode(PAYLOAD)) == PAYLOAD
+
+
+@pytest.mark.parametrize("name", ["json", "msgpack", "cbor"])
+def test_arrays_round_trip(name):
+    codec = get_codec(name)
+    array = np.arange(6, dtype=np.float32).reshape(2, 3)
+    decoded = codec.decode(codec.encode({"result": array, "score": np.float32(0.5)}))
+    assert decoded == {"result": array.tolist(), "score": 0.5}
+
+
+@pytest.mark.parametrize("name", ["msgpack", "cbor"])
+def test_binary_codecs_keep_dtype_and_shape(name):
+    codec = get_codec(name)
+    array = np.arange(6, dtype=np.int16).reshape(3, 2)
+    decoded = codec.decode(codec.encode({"result": array}), as_lists=False)["result"]
+    assert decoded.dtype == np.int16
+    np.testing.assert_array_equal(decoded, array)
+
+
+@pytest.mark.parametrize("name", ["json", "msgpack", "cbor"])
+def test_float16_downcast(name):
+    codec = get_codec(name, float16=True)
+    decoded = codec.decode(codec.encode({"result": np.array([0.1], dtype=np.float32)}), as_lists=False)
+    assert np.allclose(decoded["result"], 0.1, atol=1e-3)
+
+
+@pytest.mark.parametrize("name", ["json", "msgpack", "cbor"])
+def test_batches_decode_by_content_type_and_by_detection(name):
+    codec = get_codec(name)
+    bodies = [codec.encode(dict(PAYLOAD, seq=i)) for i in range(20)]
+    batch = codec.encode_batch(bodies)
+
+    assert [r["seq"] for r in decode_payload(batch, codec.content_type)] == list(range(20))
+    assert detect_content_type(bodies[0]) == codec.content_type
+    assert decode_payload(bodies[0]) == dict(PAYLOAD, seq=0)
+
+
+def test_unknown_codec_is_rejected():
+    with pytest.raises(ValueError):
+        get_codec("protobuf")
@@ -0,0 +1,219 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from pipeline import BoundedQueue, DeadlineScheduler, FairQueue, MultiSourcePipeline, Pipeline, QueueClosed
+
+
+class FakeSensor:
+    def __init__(self, frames, source_id=None):
+        self.frames = frames
+        self.source_id = source_id
+        self.reads = 0
+
+    def get_input(self):
+        if self.reads >= self.frames:
+            return None
+        self.reads += 1
+        image = np.full((1, 4, 4, 3), self.reads, dtype=np.uint8)
+        data = {"image": image, "temperature": 20.0 + self.reads, "frame_timestamp": time.time()}
+        if self.source_id is not None:
+            data["source"] = self.source_id
+        return data
+
+
+class FakeEngine:
+    fused_preprocessing = False
+    postprocess_enabled = False
+    model_path = "fake.tflite"
+
+    def __init__(self):
+        self.threads = set()
+
+    def predict(self, image):
+        self.threads.add(threading.current_thread().name)
+        return np.array([[float(image.flat[0])]])
+
+    def top1(self, output):
+        return int(np.argmax(output)), float(np.max(output))
+
+
+class FakeComm:
+    def __init__(self):
+        self.payloads = []
+
+    def publish_result(self, payload, top1=None):
+        self.payloads.append(payload)
+
+
+def test_bounded_queue_drop_oldest_discards_and_counts():
+    queue = BoundedQueue(maxsize=2, overflow="drop_oldest")
+    for item in range(4):
+        assert queue.put(item)
+    assert queue.dropped == 2
+    assert [queue.get(), queue.get()] == [2, 3]
+    assert queue.get(timeout=0.01) is None
+
+
+def test_bounded_queue_block_waits_for_consumer():
+    queue = BoundedQueue(maxsize=1, overflow="block")
+    queue.put("first")
+    done = threading.Event()
+
+    def producer():
+        queue.put("second")
+        done.set()
+
+    threading.Thread(target=producer, daemon=True).start()
+    assert not done.wait(0.05)
+    assert queue.get() == "first"
+    assert done.wait(1.0)
+    assert queue.get() == "second"
+    assert queue.dropped == 0
+
+
+def test_bounded_queue_close_drains_then_raises():
+    queue = BoundedQueue(maxsize=2)
+    queue.put("pending")
+    queue.close()
+    assert not queue.put("late")
+    assert queue.get() == "pending"
+    with pytest.raises(QueueClosed):
+        queue.get()
+
+
+def test_bounded_queue_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        BoundedQueue(overflow="drop_newest")
+
+
+def test_deadline_scheduler_keeps_absolute_period():
+    scheduler = DeadlineScheduler(0.02)
+    started = time.monotonic()
+    for _ in range(5):
+        assert scheduler.wait()
+        time.sleep(0.01)  # work shorter than the interval must not stretch the period
+    assert time.monotonic() - started < 0.02 * 5 + 0.05
+    assert scheduler.missed == 0
+
+
+def test_deadline_scheduler_skips_missed_ticks():
+    scheduler = DeadlineScheduler(0.01)
+    scheduler.wait()
+    time.sleep(0.035)
+    scheduler.wait()
+    assert scheduler.missed >= 2
+
+
+def test_deadline_scheduler_stops_on_event():
+    stop = threading.Event()
+    stop.set()
+    scheduler = DeadlineScheduler(10)
+    scheduler.wait(stop)  # first deadline is immediate
+    assert scheduler.wait(stop) is False
+
+
+@pytest.mark.parametrize("mode", ["sequential", "pipelined"])
+def test_pipeline_publishes_every_frame_in_order(mode):
+    comm = FakeComm()
+    pipeline = Pipeline(FakeSensor(3), FakeEngine(), comm, interval=0.01, mode=mode,
+                        queue_size=4, overflow="block")
+    pipeline.run()
+
+    assert [p["result"].tolist() for p in comm.payloads] == [[[1.0]], [[2.0]], [[3.0]]]
+    assert [p["temperature"] for p in comm.payloads] == [21.0, 22.0, 23.0]
+
+
+def test_pipeline_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        Pipeline(FakeSensor(1), FakeEngine(), FakeComm(), interval=1, mode="parallel")
+
+
+def test_fair_queue_serves_sources_round_robin():
+    queue = FairQueue(["front", "back"], maxsize=4)
+    for item in ("f1", "f2", "f3"):
+        queue.put("front", item)
+    queue.put("back", "b1")
+    assert [queue.get() for _ in range(4)] == ["f1", "b1", "f2", "f3"]
+    assert queue.get(timeout=0.01) is None
+
+
+def test_fair_queue_drops_per_source():
+    queue = FairQueue(["front", "back"], maxsize=1)
+    queue.put("back", "b1")
+    for item in ("f1", "f2", "f3"):
+        queue.put("front", item)
+    # A bursty source only loses its own frames
+    assert queue.dropped == 2
+    assert len(queue) == 2
+    assert sorted([queue.get(), queue.get()]) == ["b1", "f3"]
+
+
+def test_fair_queue_close_drains_then_raises():
+    queue = FairQueue(["front"], maxsize=2, overflow="block")
+    queue.put("front", "pending")
+    queue.close()
+    assert not queue.put("front", "late")
+    assert queue.get() == "pending"
+    with pytest.raises(QueueClosed):
+        queue.get()
+
+
+def test_multi_source_pipeline_publishes_every_source_through_the_pool():
+    comm = FakeComm()
+    sensors = [FakeSensor(3, "front"), FakeSensor(2, "back")]
+    engines = [FakeEngine(), FakeEngine()]
+    pipeline = MultiSourcePipeline(sensors, engines, comm, interval=0.01, queue_size=4, overflow="block")
+    pipeline.run()
+
+    by_source = {}
+    for payload in comm.payloads:
+        by_source.setdefault(payload["source"], []).append(payload["temperature"])
+    assert sorted(by_source["front"]) == [21.0, 22.0, 23.0]
+    assert sorted(by_source["back"]) == [21.0, 22.0]
+    # Every engine is only ever used by its own worker thread
+    for index, engine in enumerate(engines):
+        assert engine.threads <= {f"pipeline-inference-{index}"}
+
+
+def test_multi_source_pipeline_requires_sensors_and_engines():
+    with pytest.raises(ValueError):
+        MultiSourcePipeline([], [FakeEngine()], FakeComm(), interval=1)
+
+
+def test_fair_queue_consumer_reads_only_its_sources():
+    queue = FairQueue(["front", "back"], maxsize=4)
+    queue.put("front", "f1")
+    queue.put("back", "b1")
+    assert queue.get(sources=("back",)) == "b1"
+    assert queue.get(timeout=0.01, sources=("back",)) is None
+    assert queue.get(sources=("front",)) == "f1"
+
+
+class SlowFirstEngine(FakeEngine):
+    """Takes longer on the first frame, so an unpinned second worker would overtake it."""
+
+    def predict(self, image):
+        if image.flat[0] == 1:
+            time.sleep(0.05)
+        return super().predict(image)
+
+
+def test_multi_source_pipeline_keeps_each_camera_in_capture_order():
+    comm = FakeComm()
+    engines = [SlowFirstEngine(), SlowFirstEngine()]
+    pipeline = MultiSourcePipeline([FakeSensor(6, "front")], engines, comm, interval=0.001,
+                                   queue_size=8, overflow="block")
+    pipeline.run()
+
+    assert [p["temperature"] for p in comm.payloads] == [21.0, 22.0, 23.0, 24.0, 25.0, 26.0]
+    # The second engine has no camera to serve
+    assert engines[1].threads == set()
+
+
+def test_multi_source_pipeline_applies_per_sensor_intervals():
+    pipeline = MultiSourcePipeline([FakeSensor(1, "front"), FakeSensor(1, "back")], [FakeEngine()], FakeComm(),
+                                   interval=5, intervals=[0.1])
+    assert [scheduler.interval for scheduler in pipeline.schedulers] == [0.1, 5.0]
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from postprocess import Postprocessor
+
+
+def test_top_k_is_ordered_and_thresholded():
+    output = np.array([[0.05, 0.6, 0.1, 0.9, 0.3]], dtype=np.float32)
+    result = Postprocessor(top_k=3, threshold=0.5).run(output)
+
+    assert result == {"classes": [3, 1], "scores": [0.9, 0.6]}
+
+
+def test_quantized_output_is_dequantized():
+    processor = Postprocessor(quantization=(0.5, 10), top_k=2, threshold=None)
+    np.testing.assert_allclose(processor.dequantize(np.array([10, 12, 30], dtype=np.uint8)), [0.0, 1.0, 10.0])
+    assert processor.run(np.array([[10, 30, 12]], dtype=np.uint8)) == {"classes": [1, 2], "scores": [10.0, 1.0]}
+
+
+def test_float_output_is_not_rescaled():
+    processor = Postprocessor(quantization=(0.5, 10))
+    np.testing.assert_array_equal(processor.dequantize(np.array([0.25], dtype=np.float32)), [0.25])
+
+
+def test_softmax_turns_logits_into_probabilities():
+    result = Postprocessor(top_k=3, threshold=None, softmax=True).run(np.array([2.0, 1.0, 0.0]))
+
+    assert result["classes"] == [0, 1, 2]
+    assert sum(result["scores"]) == pytest.approx(1.0, abs=1e-3)
+    assert result["scores"][0] == pytest.approx(0.6652, abs=1e-4)
+
+
+def test_batches_return_one_result_per_row():
+    output = np.array([[0.9, 0.1], [0.2, 0.8]], dtype=np.float32)
+    results = Postprocessor(top_k=1, threshold=None).run(output)
+    assert [r["classes"] for r in results] == [[0], [1]]
+
+
+def test_labels_are_mapped_with_index_fallback(tmp_path):
+    labels = tmp_path / "labels.txt"
+    labels.write_text("cat\ndog\n")
+    result = Postprocessor(top_k=3, threshold=None, labels_path=str(labels)).run(np.array([0.1, 0.7, 0.2]))
+
+    assert result["labels"] == ["dog", "2", "cat"]
+
+
+def test_missing_labels_file_publishes_indices_only(tmp_path):
+    processor = Postprocessor(labels_path=str(tmp_path / "missing.txt"))
+    assert processor.labels is None
+    assert "labels" not in processor.run(np.array([0.9, 0.1]))
+
+
+class LabelledEngine:
+    fused_preprocessing = False
+    postprocess_enabled = True
+    model_path = "fake.tflite"
+
+    def __init__(self, label):
+        self.label = label
+
+    def predict(self, image):
+        return np.array([[0.9, 0.1]])
+
+    def postprocess(self, output):
+        return {"classes": [0], "scores": [0.9], "labels": [self.label]}
+
+
+class Comm:
+    def __init__(self):
+        self.payloads = []
+
+    def publish_result(self, payload, top1=None):
+        self.payloads.append(payload)
+
+
+def test_results_are_postprocessed_by_the_engine_that_produced_them():
+    from pipeline import Pipeline
+    comm = Comm()
+    pipeline = Pipeline(None, LabelledEngine("old"), comm, interval=1)
+    item = pipeline._infer({"image": np.zeros((1, 2, 2, 3), dtype=np.uint8), "temperature": 20.0})
+    # A hot reload lands between inference and publishing
+    pipeline.swap_engine(LabelledEngine("new"))
+    pipeline._publish(item)
+
+    assert comm.payloads[0]["result"]["labels"] == ["old"]
+
+
+def test_top1_is_dequantized_without_threshold():
+    post = Postprocessor(quantization=(1 / 256, 0), threshold=0.99)
+    assert post.top1(np.array([[10, 200, 30]], dtype=np.uint8)) == (1, 200 / 256)
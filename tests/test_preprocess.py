@@ -0,0 +1,53 @@
+import cv2
+import numpy as np
+import pytest
+
+from preprocess import Preprocessor
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, (48, 64, 3), dtype=np.uint8)
+
+
+def reference_rgb(frame, size=(8, 8)):
+    return cv2.cvtColor(cv2.resize(frame, size), cv2.COLOR_BGR2RGB)
+
+
+def test_uint8_model_receives_resized_rgb_pixels(frame):
+    out = np.empty((8, 8, 3), dtype=np.uint8)
+    result = Preprocessor((1, 8, 8, 3)).run(frame, out=out)
+
+    assert result is out
+    np.testing.assert_array_equal(out, reference_rgb(frame))
+
+
+def test_batched_frame_and_model_sized_frame(frame):
+    preprocessor = Preprocessor((1, 48, 64, 3))
+    np.testing.assert_array_equal(preprocessor.run(frame[np.newaxis]), cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+
+def test_float_model_is_normalized(frame):
+    out = Preprocessor((1, 8, 8, 3), dtype=np.float32, mean=127.5, std=127.5).run(frame)
+
+    assert out.dtype == np.float32
+    expected = (reference_rgb(frame).astype(np.float32) - 127.5) / 127.5
+    np.testing.assert_allclose(out, expected, atol=1e-6)
+
+
+def test_int8_model_is_quantized_and_clipped(frame):
+    scale, zero_point = 1.0 / 128, -1
+    out = Preprocessor((1, 8, 8, 3), dtype=np.int8, quantization=(scale, zero_point)).run(frame)
+
+    real = (reference_rgb(frame).astype(np.float32) - 127.5) / 127.5
+    expected = np.clip(np.rint(real / scale + zero_point), -128, 127).astype(np.int8)
+    np.testing.assert_array_equal(out, expected)
+
+
+def test_scratch_buffers_are_reused(frame):
+    preprocessor = Preprocessor((1, 8, 8, 3), dtype=np.float32)
+    first = preprocessor.run(frame).copy()
+    second = preprocessor.run(255 - frame)
+    assert not np.allclose(first, second)
+    np.testing.assert_allclose(preprocessor.run(frame), first)
@@ -0,0 +1,99 @@
+import cv2
+import numpy as np
+import pytest
+
+from replay import ReplayReader, TemperatureTrace
+from sensors import SensorInput
+
+
+@pytest.fixture
+def frames_npy(tmp_path):
+    path = tmp_path / "frames.npy"
+    np.save(path, np.stack([np.full((8, 8, 3), i, dtype=np.uint8) for i in range(3)]))
+    return str(path)
+
+
+def read_all(reader, limit=10):
+    values = []
+    for _ in range(limit):
+        ret, frame = reader.read()
+        if not ret:
+            break
+        values.append(int(frame[0, 0, 0]))
+    return values
+
+
+def test_npy_replay_plays_once_without_loop(frames_npy):
+    reader = ReplayReader(frames_npy, loop=False, recorded_fps=2)
+    assert read_all(reader) == [0, 1, 2]
+    assert reader.exhausted and not reader.isOpened()
+    assert reader.position == 1.0
+    assert reader.read() == (False, None)
+
+
+def test_npy_replay_loops(frames_npy):
+    reader = ReplayReader(frames_npy, loop=True)
+    assert read_all(reader, limit=5) == [0, 1, 2, 0, 1]
+    assert reader.frames_read == 5
+    assert reader.position == 1.0
+
+
+def test_npy_replay_rejects_non_frame_arrays(tmp_path):
+    path = tmp_path / "bad.npy"
+    np.save(path, np.zeros((3, 8, 8)))
+    with pytest.raises(ValueError):
+        ReplayReader(str(path))
+
+
+def test_image_directory_replays_in_name_order_and_skips_unreadable(tmp_path):
+    for name, value in (("b.png", 2), ("a.png", 1)):
+        cv2.imwrite(str(tmp_path / name), np.full((4, 4, 3), value, dtype=np.uint8))
+    (tmp_path / "c.jpg").write_bytes(b"not an image")
+    (tmp_path / "notes.txt").write_text("ignored")
+
+    reader = ReplayReader(str(tmp_path), loop=False)
+    assert reader.frame_count == 3
+    assert read_all(reader) == [1, 2]
+
+
+def test_empty_image_directory_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ReplayReader(str(tmp_path))
+
+
+def test_temperature_trace_interpolates_and_clamps(tmp_path):
+    path = tmp_path / "trace.csv"
+    path.write_text("timestamp,temperature\n1700000010,22.0\n1700000000,20.0\nbroken\n")
+    trace = TemperatureTrace(str(path))
+    assert trace.duration == 10.0
+    assert trace.at(5) == 21.0
+    assert trace.at(-1) == 20.0
+    assert trace.at(60) == 22.0
+
+
+def test_temperature_trace_requires_samples(tmp_path):
+    path = tmp_path / "trace.csv"
+    path.write_text("timestamp,temperature\n")
+    with pytest.raises(ValueError):
+        TemperatureTrace(str(path))
+
+
+def test_sensor_input_replays_frames_and_temperatures(config, frames_npy, tmp_path):
+    trace = tmp_path / "trace.csv"
+    trace.write_text("0,20.0\n2,24.0\n")
+    cfg = config({"sensors": {"replay": {"enabled": True, "path": frames_npy, "loop": False,
+                                         "recorded_fps": 1, "temperature_trace": str(trace)}}})
+    sensor = SensorInput(config=cfg)
+
+    inputs = [sensor.get_input() for _ in range(4)]
+    assert inputs[3] is None
+    assert [data["temperature"] for data in inputs[:3]] == [20.0, 22.0, 24.0]
+    assert inputs[0]["image"].shape == tuple(cfg.get("model", "input_shape"))
+
+
+def test_replay_rate_sets_the_capture_interval():
+    from main import replay_interval
+    assert replay_interval({"enabled": True, "rate": 4}, 5) == 0.25
+    assert replay_interval({"enabled": True, "rate": 0}, 5) == 0
+    assert replay_interval({"enabled": True}, 5) == 5
+    assert replay_interval({"enabled": False, "rate": 4}, 5) == 5
@@ -0,0 +1,223 @@
+import hashlib
+import io
+import os
+from urllib.parse import urlparse
+
+import pytest
+import requests
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUNDLED_MODEL = os.path.join(ROOT, "models", "model.tflite")
+
+
+@pytest.fixture
+def gate_settings(tmp_path):
+    """
+    Writes a settings.yaml with a non-default model contract where the receiver will load it.
+    """
+    with open(os.path.join(ROOT, "config", "settings.yaml")) as f:
+        settings = yaml.safe_load(f)
+    settings["model"]["input_shape"] = [1, 96, 96, 3]
+    settings["model"]["regression_gate"].update({"golden_set": "models/golden.npz", "min_top1_match": 0.5})
+    os.makedirs(tmp_path / "config")
+    with open(tmp_path / "config" / "settings.yaml", "w") as f:
+        yaml.safe_dump(settings, f)
+    return settings
+
+
+@pytest.fixture
+def current_model(receiver):
+    os.makedirs("models", exist_ok=True)
+    with open(receiver.MODEL_PATH, "wb") as f:
+        f.write(b"current model")
+    return receiver.MODEL_PATH
+
+
+def test_invalid_upload_is_rejected_and_keeps_the_current_model(receiver, current_model):
+    if not receiver.VALIDATION_AVAILABLE:
+        pytest.skip("model validation needs the TFLite runtime")
+    response = receiver.app.test_client().post(
+        "/api/model/upload", data={"file": (io.BytesIO(b"not a model"), "broken.tflite")},
+        content_type="multipart/form-data"
+    )
+
+    assert response.status_code == 422
+    with open(current_model, "rb") as f:
+        assert f.read() == b"current model"
+
+
+def test_valid_upload_is_stored_by_hash_and_activated(receiver, current_model):
+    if not os.path.exists(BUNDLED_MODEL):
+        pytest.skip("bundled model not available")
+    with open(BUNDLED_MODEL, "rb") as f:
+        data = f.read()
+    response = receiver.app.test_client().post(
+        "/api/model/upload", data={"file": (io.BytesIO(data), "model.tflite")}, content_type="multipart/form-data"
+    )
+
+    assert response.status_code == 200
+    sha256 = response.get_json()["sha256"]
+    assert os.path.exists(receiver.version_path(sha256))
+    with open(current_model, "rb") as f:
+        assert f.read() == data
+
+
+def test_upload_requires_a_tflite_file(receiver):
+    response = receiver.app.test_client().post(
+        "/api/model/upload", data={"file": (io.BytesIO(b"x"), "model.onnx")}, content_type="multipart/form-data"
+    )
+    assert response.status_code == 400
+
+
+def test_upload_gate_uses_the_configured_model_contract(gate_settings, receiver, current_model, monkeypatch):
+    calls = {}
+
+    def validate(path, input_shape):
+        calls["input_shape"] = input_shape
+        return True
+
+    def compare(current_path, candidate_path, golden_path, tolerances=None, **kwargs):
+        calls.update(golden_path=golden_path, tolerances=tolerances)
+        return {"passed": False, "reasons": ["top-1 match 0.40 < 0.50"]}
+
+    monkeypatch.setattr(receiver, "VALIDATION_AVAILABLE", True)
+    monkeypatch.setattr(receiver, "validate_tflite_model", validate, raising=False)
+    monkeypatch.setattr(receiver, "compare_models", compare, raising=False)
+    with open("models/golden.npz", "wb") as f:
+        f.write(b"golden")
+
+    response = receiver.app.test_client().post(
+        "/api/model/upload", data={"file": (io.BytesIO(b"candidate"), "model.tflite")},
+        content_type="multipart/form-data"
+    )
+
+    assert response.status_code == 422
+    assert calls["input_shape"] == [1, 96, 96, 3]
+    assert calls["golden_path"] == "models/golden.npz"
+    assert calls["tolerances"]["min_top1_match"] == 0.5
+    assert calls["tolerances"]["max_latency_ratio"] == gate_settings["model"]["regression_gate"]["max_latency_ratio"]
+
+
+UPLOAD = b"model bytes " * 100
+UPLOAD_SHA256 = hashlib.sha256(UPLOAD).hexdigest()
+
+
+@pytest.fixture
+def uploads(receiver, current_model, monkeypatch):
+    # The protocol is under test, not the model: skip TFLite validation
+    monkeypatch.setattr(receiver, "VALIDATION_AVAILABLE", False)
+    return receiver.app.test_client()
+
+
+def start_upload(client, sha256=UPLOAD_SHA256, size=len(UPLOAD)):
+    return client.post("/api/model/uploads", json={"filename": "model.tflite", "size": size, "sha256": sha256})
+
+
+def test_chunked_upload_resumes_from_the_received_offset(receiver, uploads, current_model):
+    response = start_upload(uploads)
+    assert (response.status_code, response.get_json()["offset"]) == (201, 0)
+    url = f"/api/model/uploads/{UPLOAD_SHA256}"
+
+    response = uploads.patch(url, data=UPLOAD[:500], headers={"Upload-Offset": "0"})
+    assert response.get_json() == {"status": "ok", "complete": False, "upload_id": UPLOAD_SHA256, "offset": 500}
+
+    # A client that lost track of the offset is told where to continue
+    response = uploads.patch(url, data=UPLOAD[:500], headers={"Upload-Offset": "0"})
+    assert (response.status_code, response.get_json()["offset"]) == (409, 500)
+    assert start_upload(uploads).get_json()["offset"] == 500
+    assert uploads.get(url).get_json()["offset"] == 500
+
+    response = uploads.patch(url, data=UPLOAD[500:], headers={"Upload-Offset": "500"})
+    assert response.status_code == 200
+    assert response.get_json()["sha256"] == UPLOAD_SHA256
+    with open(current_model, "rb") as f:
+        assert f.read() == UPLOAD
+    assert uploads.get(url).status_code == 404
+
+
+def test_chunked_upload_with_wrong_hash_is_discarded(receiver, uploads, current_model):
+    claimed = "0" * 64
+    start_upload(uploads, sha256=claimed)
+    response = uploads.patch(f"/api/model/uploads/{claimed}", data=UPLOAD, headers={"Upload-Offset": "0"})
+
+    assert response.status_code == 422
+    assert response.get_json()["sha256"] == UPLOAD_SHA256
+    assert not os.path.exists(receiver.upload_path(claimed, ".part"))
+    with open(current_model, "rb") as f:
+        assert f.read() == b"current model"
+
+
+def test_chunked_upload_rejects_data_beyond_the_declared_size(receiver, uploads):
+    start_upload(uploads, size=10)
+    response = uploads.patch(f"/api/model/uploads/{UPLOAD_SHA256}", data=UPLOAD, headers={"Upload-Offset": "0"})
+    assert response.status_code == 400
+    assert os.path.getsize(receiver.upload_path(UPLOAD_SHA256, ".part")) == 0
+
+
+@pytest.mark.parametrize("meta", [
+    {"filename": "model.onnx", "size": 10, "sha256": "0" * 64},
+    {"filename": "model.tflite", "size": 10, "sha256": "not-a-hash"},
+    {"filename": "model.tflite", "size": 0, "sha256": "0" * 64},
+])
+def test_chunked_upload_validates_its_metadata(uploads, meta):
+    assert uploads.post("/api/model/uploads", json=meta).status_code == 400
+
+
+def test_stored_version_is_activated_without_upload(receiver, uploads, current_model):
+    start_upload(uploads)
+    uploads.patch(f"/api/model/uploads/{UPLOAD_SHA256}", data=UPLOAD, headers={"Upload-Offset": "0"})
+    # The active model is a hard link to the stored version, so it is replaced, not rewritten
+    with open("models/other.tflite", "wb") as f:
+        f.write(b"current model")
+    os.replace("models/other.tflite", current_model)
+
+    response = start_upload(uploads)
+    assert response.get_json()["complete"] is True
+    with open(current_model, "rb") as f:
+        assert f.read() == UPLOAD
+
+
+class FlaskResponse:
+    def __init__(self, response):
+        self.status_code = response.status_code
+        self.body = response.get_json()
+
+    def json(self):
+        return self.body
+
+
+class FlaskSession:
+    """requests.Session lookalike that sends upload_model.py's requests to the Flask test client."""
+
+    def __init__(self, client, fail_patches=0):
+        self.client = client
+        self.fail_patches = fail_patches
+
+    def post(self, url, json=None, timeout=None):
+        return FlaskResponse(self.client.post(urlparse(url).path, json=json))
+
+    def patch(self, url, data=None, headers=None, timeout=None):
+        if self.fail_patches:
+            self.fail_patches -= 1
+            # Half of the chunk arrives before the connection drops
+            self.client.patch(urlparse(url).path, data=data[:len(data) // 2], headers=headers)
+            raise requests.ConnectionError("connection reset")
+        return FlaskResponse(self.client.patch(urlparse(url).path, data=data, headers=headers))
+
+    def get(self, url, timeout=None):
+        return FlaskResponse(self.client.get(urlparse(url).path))
+
+
+def test_upload_tool_resumes_after_a_dropped_connection(receiver, uploads, current_model, tmp_path, monkeypatch):
+    import upload_model
+    model = tmp_path / "new.tflite"
+    model.write_bytes(UPLOAD)
+    monkeypatch.setattr(upload_model.requests, "Session", lambda: FlaskSession(uploads, fail_patches=1))
+    monkeypatch.setattr(upload_model.time, "sleep", lambda seconds: None)
+
+    result = upload_model.upload_model(str(model), "http://receiver", chunk_size=256)
+
+    assert result["status"] == "ok"
+    with open(current_model, "rb") as f:
+        assert f.read() == UPLOAD
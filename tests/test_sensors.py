@@ -0,0 +1,59 @@
+import threading
+import time
+
+import numpy as np
+
+from sensors import FrameGrabber
+
+
+class FakeCapture:
+    """Returns numbered frames, failing on the listed read attempts."""
+
+    def __init__(self, failures=()):
+        self.failures = set(failures)
+        self.reads = 0
+        self.lock = threading.Lock()
+
+    def read(self):
+        with self.lock:
+            self.reads += 1
+            attempt = self.reads
+        time.sleep(0.001)
+        if attempt in self.failures:
+            return False, None
+        return True, np.full((2, 2, 3), attempt % 256, dtype=np.uint8)
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def test_latest_returns_newest_frame_with_timestamp():
+    grabber = FrameGrabber(FakeCapture(), buffer_size=3)
+    grabber.start()
+    try:
+        assert wait_until(lambda: grabber.frames_read >= 5)
+        frame, timestamp = grabber.latest()
+        assert len(grabber.frames) == 3
+        assert frame[0, 0, 0] >= 5
+        assert abs(time.time() - timestamp) < 1.0
+    finally:
+        grabber.stop()
+
+
+def test_read_failures_are_counted_and_skipped():
+    grabber = FrameGrabber(FakeCapture(failures={1, 2}))
+    grabber.start()
+    try:
+        assert wait_until(lambda: grabber.frames_read >= 1)
+        assert grabber.read_failures == 2
+    finally:
+        grabber.stop()
+
+
+def test_latest_times_out_without_frames():
+    grabber = FrameGrabber(FakeCapture())
+    assert grabber.latest(timeout=0.01) == (None, None)
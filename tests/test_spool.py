@@ -0,0 +1,45 @@
+from spool import DiskSpool
+
+
+def test_messages_are_returned_in_sequence_order_per_channel(tmp_path):
+    spool = DiskSpool(str(tmp_path / "outbox.db"))
+    spool.append("rest", 2, b"c")
+    spool.append_many("rest", [(0, b"a"), (1, b"b")])
+    spool.append("mqtt", 0, b"m")
+
+    assert spool.peek("rest", limit=10) == [(0, b"a"), (1, b"b"), (2, b"c")]
+    assert spool.count("mqtt") == 1
+    assert spool.last_seq("rest") == 2
+    assert spool.last_seq("unknown") == -1
+
+
+def test_delete_removes_delivered_messages(tmp_path):
+    spool = DiskSpool(str(tmp_path / "outbox.db"))
+    spool.append_many("rest", [(0, b"a"), (1, b"b"), (2, b"c")])
+    spool.delete("rest", [0, 1])
+
+    assert spool.peek("rest", limit=10) == [(2, b"c")]
+
+
+def test_messages_survive_reopening(tmp_path):
+    path = str(tmp_path / "outbox.db")
+    spool = DiskSpool(path)
+    spool.append_many("mqtt", [(0, b"a"), (1, b"b")])
+    spool.close()
+
+    reopened = DiskSpool(path)
+    assert reopened.count("mqtt") == 2
+    assert reopened.peek("mqtt") == [(0, b"a")]
+
+
+def test_oldest_messages_are_discarded_beyond_max_bytes(tmp_path):
+    spool = DiskSpool(str(tmp_path / "outbox.db"), max_bytes=1000)
+    for seq in range(300):
+        spool.append("rest", seq, b"x" * 10)
+
+    remaining = spool.peek("rest", limit=1000)
+    assert spool.discarded > 0
+    assert sum(len(body) for _, body in remaining) <= 1000
+    # The newest messages are kept and still in order
+    assert remaining[-1][0] == 299
+    assert [seq for seq, _ in remaining] == sorted(seq for seq, _ in remaining)
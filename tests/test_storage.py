@@ -0,0 +1,156 @@
+import json
+import sqlite3
+from datetime import datetime
+
+import msgpack
+import pytest
+
+from storage import ResultStore, top_class
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultStore(str(tmp_path / "results.db"), batch_size=10, flush_interval=0.05)
+    yield store
+    store.close()
+
+
+def rows(store):
+    with sqlite3.connect(store.path) as db:
+        return db.execute("SELECT node, temperature, top_class, payload FROM results ORDER BY id").fetchall()
+
+
+def test_records_are_written_with_indexed_columns(store):
+    store.add([{"result": {"classes": [7, 2], "scores": [0.9, 0.1]}, "temperature": 21.5, "node": "n1"},
+               {"result": [[0.1, 0.8, 0.1]], "temperature": "n/a"}], node="10.0.0.2")
+    store.flush()
+
+    assert store.written == 2
+    (node1, temp1, cls1, payload1), (node2, temp2, cls2, _) = rows(store)
+    assert (node1, temp1, cls1) == ("n1", 21.5, 7)
+    assert (node2, temp2, cls2) == ("10.0.0.2", None, 1)
+    assert json.loads(payload1)["result"]["classes"] == [7, 2]
+
+
+def test_binary_and_date_values_are_stored_as_strings(store):
+    store.add([{"blob": b"\x00\x01", "at": datetime(2024, 1, 2, 3, 4, 5)}])
+    store.flush()
+
+    payload = json.loads(rows(store)[0][3])
+    assert payload == {"blob": "AAE=", "at": "2024-01-02T03:04:05"}
+
+
+def test_unstorable_record_is_skipped_and_the_flusher_keeps_running(store):
+    store.add([{"value": {1, 2}}, {"temperature": 20.0}])
+    store.flush()
+    store.add([{"temperature": 21.0}])
+    store.flush(timeout=2.0)
+
+    assert store.rejected == 1
+    assert store.written == 2
+    assert store._thread.is_alive()
+
+
+def test_flusher_survives_unexpected_errors(store, monkeypatch):
+    def broken(batch):
+        raise RuntimeError("disk on fire")
+
+    original = store._write
+    monkeypatch.setattr(store, "_write", broken)
+    store.add([{"temperature": 20.0}])
+    store.flush(timeout=2.0)
+    monkeypatch.setattr(store, "_write", original)
+    store.add([{"temperature": 21.0}])
+    store.flush(timeout=2.0)
+
+    assert store._thread.is_alive()
+    assert store.written == 1
+
+
+def test_close_writes_pending_records(tmp_path):
+    store = ResultStore(str(tmp_path / "results.db"), batch_size=1000, flush_interval=60)
+    store.add([{"temperature": 20.0}] * 5)
+    store.close()
+    assert len(rows(store)) == 5
+
+
+def test_top_class_of_raw_and_postprocessed_results():
+    assert top_class({"classes": [4, 1]}) == 4
+    assert top_class({"classes": ["cat"]}) is None
+    assert top_class([[0.1, 0.2, 0.7]]) == 2
+    assert top_class("n/a") is None
+
+
+def test_receiver_keeps_storing_after_a_binary_msgpack_record(receiver):
+    client = receiver.app.test_client()
+    headers = {"Content-Type": "application/msgpack"}
+    assert client.post("/api/results", data=msgpack.packb({"raw": b"\x00\x01"}), headers=headers).status_code == 200
+    assert client.post("/api/results", json={"temperature": 22.0}).status_code == 200
+
+    receiver.store.flush(timeout=2.0)
+    assert receiver.store.written == 2
+
+
+def insert(store, received_at, node, temperature, cls):
+    with sqlite3.connect(store.path) as db:
+        db.execute(
+            "INSERT INTO results (received_at, node, temperature, top_class, payload) VALUES (?, ?, ?, ?, ?)",
+            (received_at, node, temperature, cls, json.dumps({"temperature": temperature}))
+        )
+
+
+def test_query_filters_by_time_range_and_node(store):
+    for i, node in enumerate(["a", "b", "a", "a"]):
+        insert(store, 1000.0 + i * 10, node, 20.0 + i, i)
+
+    records = store.query(1005, 1035, node="a")
+    assert [r["received_at"] for r in records] == [1020.0, 1030.0]
+    assert records[0]["data"] == {"temperature": 22.0}
+    assert len(store.query(0, 2000, limit=2)) == 2
+
+
+def test_stats_aggregates_fixed_buckets(store):
+    insert(store, 1200.0, "a", 20.0, 1)
+    insert(store, 1210.0, "a", 24.0, 1)
+    insert(store, 1230.0, "b", 22.0, 3)
+    insert(store, 1300.0, "a", 30.0, None)
+
+    buckets = store.stats(1200, 1320, bucket_seconds=60)
+    assert [b["start"] for b in buckets] == [1200, 1260]
+    first = buckets[0]
+    assert first["count"] == 3
+    assert first["temperature"] == {"avg": 22.0, "min": 20.0, "max": 24.0}
+    assert first["classes"] == {"1": 2, "3": 1}
+    assert buckets[1]["classes"] == {}
+
+    assert store.stats(1200, 1320, bucket_seconds=60, node="b")[0]["count"] == 1
+
+
+def test_receiver_query_and_stats_endpoints(receiver):
+    client = receiver.app.test_client()
+    client.post("/api/results/batch", json=[{"temperature": 20.0, "node": "n1"}, {"temperature": 22.0, "node": "n2"}])
+
+    body = client.get("/api/results?node=n1").get_json()
+    assert body["count"] == 1
+    assert body["results"][0]["data"]["node"] == "n1"
+
+    stats = client.get("/api/results/stats?bucket=1h").get_json()
+    assert stats["bucket_seconds"] == 3600
+    assert sum(b["count"] for b in stats["buckets"]) == 2
+
+
+@pytest.mark.parametrize("query", ["bucket=0s", "bucket=abc", "from=yesterday", "bucket=nan", "bucket=inf",
+                                   "bucket=1e-300", "bucket=0.5s", "from=nan", "from=0&bucket=1s"])
+def test_receiver_rejects_invalid_queries(receiver, query):
+    assert receiver.app.test_client().get(f"/api/results/stats?{query}").status_code == 400
+
+
+@pytest.mark.parametrize("limit", ["-1", "0", "1001", "ten"])
+def test_receiver_rejects_limits_outside_the_cap(receiver, limit):
+    assert receiver.app.test_client().get(f"/api/results?limit={limit}").status_code == 400
+
+
+@pytest.mark.parametrize("bucket_seconds", [0, -60, float("nan"), float("inf")])
+def test_stats_rejects_invalid_bucket_sizes(store, bucket_seconds):
+    with pytest.raises(ValueError):
+        store.stats(0, 100, bucket_seconds=bucket_seconds)
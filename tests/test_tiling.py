@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from gating import ChangeGate
+from postprocess import Postprocessor
+from tiling import TiledInference, grid_boxes, roi_boxes
+
+
+class FakeEngine:
+    """Scores each BGR channel by its mean brightness, so a coloured patch decides the class."""
+
+    fused_preprocessing = True
+    input_shape = (1, 8, 8, 3)
+
+    def __init__(self, postprocess_enabled=False, top_k=5, labels=None):
+        self.postprocess_enabled = postprocess_enabled
+        self.postprocessor = Postprocessor(top_k=top_k, threshold=0.01)
+        self.postprocessor.labels = labels
+        self.batches = []
+
+    def predict_batch(self, frames):
+        self.batches.append([frame.shape for frame in frames])
+        return np.stack([np.asarray(frame, dtype=np.float32).reshape(-1, 3).mean(axis=0) / 255 for frame in frames])
+
+    def postprocess(self, output):
+        return self.postprocessor.run(output)
+
+
+def frame_with_patch(channel=2, x=70, y=60, size=20, width=100, height=80):
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    frame[y:y + size, x:x + size, channel] = 255
+    return frame
+
+
+def test_grid_boxes_cover_the_frame_with_overlap():
+    boxes = grid_boxes(100, 80, rows=2, cols=2, overlap=0.2)
+    assert len(boxes) == 4
+    (x0, y0, w0, h0), (x1, _, w1, _), (_, y2, _, h2), _ = boxes
+    assert (x0, y0) == (0, 0)
+    assert x1 + w1 == 100 and y2 + h2 == 80
+    # Neighbours share about a fifth of a tile
+    assert x0 + w0 - x1 == pytest.approx(0.2 * w0, abs=1)
+
+
+def test_single_tile_grid_is_the_whole_frame():
+    assert grid_boxes(100, 80, rows=1, cols=1) == [(0, 0, 100, 80)]
+
+
+def test_roi_boxes_accept_fractions_and_pixels_and_clip():
+    boxes = roi_boxes(100, 80, [(0.5, 0.5, 0.5, 0.5), (90, 70, 40, 40)])
+    assert boxes == [(50, 40, 50, 40), (90, 70, 10, 10)]
+
+
+def test_raw_outputs_are_merged_by_per_class_maximum():
+    engine = FakeEngine()
+    tiler = TiledInference(grid=(2, 2), overlap=0.0)
+    output = tiler.run(engine, frame_with_patch()[np.newaxis])
+
+    assert output.shape == (1, 3)
+    # The patch fills 400 of the 50x40 pixels of the bottom-right tile only
+    assert output[0].tolist() == pytest.approx([0.0, 0.0, 0.2])
+    assert engine.batches == [[(40, 50, 3)] * 4]
+    assert tiler.tiles_inferred == 4
+
+
+def test_postprocessed_tiles_are_merged_with_their_boxes():
+    engine = FakeEngine(postprocess_enabled=True, top_k=1, labels=["blue", "green", "red"])
+    frame = frame_with_patch(channel=2)
+    frame[0:10, 0:10, 1] = 255  # a smaller green patch in the top-left tile
+    tiler = TiledInference(grid=(2, 2), overlap=0.0)
+    result = tiler.run(engine, frame)
+
+    assert result["classes"] == [2]
+    assert result["labels"] == ["red"]
+    assert result["scores"] == [pytest.approx(0.2)]
+    assert [tile["box"] for tile in result["tiles"]] == [[0, 0, 50, 40], [50, 0, 50, 40],
+                                                         [0, 40, 50, 40], [50, 40, 50, 40]]
+    assert result["tiles"][0]["classes"] == [1]
+
+
+def test_tiles_can_be_left_out_of_the_payload():
+    engine = FakeEngine(postprocess_enabled=True)
+    result = TiledInference(include_tiles=False).run(engine, frame_with_patch())
+    assert "tiles" not in result
+
+
+def test_unchanged_tiles_reuse_their_previous_output():
+    engine = FakeEngine()
+    tiler = TiledInference(grid=(2, 2), overlap=0.0, gate_factory=lambda: ChangeGate(method="diff"))
+    first = tiler.run(engine, frame_with_patch())
+    again = tiler.run(engine, frame_with_patch())
+    assert tiler.tiles_skipped == 4
+    np.testing.assert_array_equal(first, again)
+
+    # Moving the patch within the bottom-right tile only re-infers that tile
+    tiler.run(engine, frame_with_patch(x=60, y=45))
+    assert len(engine.batches[-1]) == 1
+    assert (tiler.tiles_inferred, tiler.tiles_skipped) == (5, 7)
+
+    tiler.reset()
+    tiler.run(engine, frame_with_patch())
+    assert len(engine.batches[-1]) == 4
+
+
+def test_tiles_are_resized_without_fused_preprocessing():
+    engine = FakeEngine()
+    engine.fused_preprocessing = False
+    TiledInference(grid=(1, 2), overlap=0.0).run(engine, frame_with_patch())
+    assert engine.batches == [[(1, 8, 8, 3)] * 2]
@@ -0,0 +1,185 @@
+"""
+Offline inference benchmark for InferenceEngine.
+
+Runs warmup plus N timed iterations on synthetic inputs for every combination of model,
+num_threads and batch size, and reports latency percentiles, throughput and peak RSS.
+Each combination runs in a fresh process so memory figures are not mixed up.
+
+Example:
+    python tools/benchmark_inference.py --threads 1 2 4 --batch-sizes 1 4 --output logs/bench.json
+    python tools/benchmark_inference.py --compare logs/bench_previous.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Edge node modules live in src/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from config import Config
+from inference import InferenceEngine
+from model_fetcher import file_sha256
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run_case(config_path, model_path, num_threads, batch_size, warmup, iterations, queue):
+    """
+    Benchmarks one configuration in the current (child) process and puts the result in queue.
+    """
+    try:
+        # Synthetic inputs are already model-shaped tensors. With fused preprocessing every
+        # frame would also be resized/converted, so batch sizes would not do the same work.
+        cfg = Config.load(config_path).with_overrides({"model": {"fused_preprocessing": False}})
+        engine = InferenceEngine(config=cfg, model_path=model_path, num_threads=num_threads)
+        rng = np.random.default_rng(0)
+        sample_shape = list(engine.input_shape[1:])
+        info = np.iinfo(engine.input_dtype) if np.issubdtype(engine.input_dtype, np.integer) else None
+        if info is not None:
+            frames = [rng.integers(info.min, info.max, [1] + sample_shape, dtype=engine.input_dtype)
+                      for _ in range(batch_size)]
+        else:
+            frames = [rng.standard_normal([1] + sample_shape).astype(engine.input_dtype)
+                      for _ in range(batch_size)]
+
+        def step():
+            # One entry point for every batch size (a batch of 1 is a single predict())
+            engine.predict_batch(frames)
+
+        for _ in range(warmup):
+            step()
+
+        latencies = np.empty(iterations, dtype=np.float64)
+        started = time.perf_counter()
+        for i in range(iterations):
+            t0 = time.perf_counter()
+            step()
+            latencies[i] = time.perf_counter() - t0
+        elapsed = time.perf_counter() - started
+
+        latencies_ms = latencies * 1000.0
+        queue.put({
+            "model": model_path,
+            "model_sha256": file_sha256(model_path),
+            "backend": engine.backend,
+            "num_threads": num_threads,
+            "batch_size": batch_size,
+            "batched_invoke": bool(engine._batch_supported) if batch_size > 1 else None,
+            "iterations": iterations,
+            "latency_ms": {
+                "p50": float(np.percentile(latencies_ms, 50)),
+                "p90": float(np.percentile(latencies_ms, 90)),
+                "p99": float(np.percentile(latencies_ms, 99)),
+                "mean": float(latencies_ms.mean()),
+                "min": float(latencies_ms.min()),
+                "max": float(latencies_ms.max())
+            },
+            "throughput_fps": batch_size * iterations / elapsed,
+            "peak_rss_mb": peak_rss_mb()
+        })
+    except Exception as e:
+        queue.put({
+            "model": model_path, "num_threads": num_threads, "batch_size": batch_size,
+            "error": str(e)
+        })
+
+
+def run_isolated(*args):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run_case, args=args + (queue,))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def compare(results, baseline_path, tolerance):
+    """
+    Prints p50 latency and throughput deltas against a previous report.
+    Returns False if any matching case regressed by more than tolerance (fraction).
+    """
+    with open(baseline_path, "r") as f:
+        baseline = json.load(f)
+
+    def key(r):
+        return (os.path.basename(r["model"]), r.get("backend"), r["num_threads"], r["batch_size"])
+
+    previous = {key(r): r for r in baseline.get("results", []) if "error" not in r}
+    ok = True
+    print(f"\nComparison with {baseline_path} (tolerance {tolerance:.0%}):")
+    for r in results:
+        if "error" in r or key(r) not in previous:
+            continue
+        old = previous[key(r)]
+        p50_delta = r["latency_ms"]["p50"] / old["latency_ms"]["p50"] - 1.0
+        fps_delta = r["throughput_fps"] / old["throughput_fps"] - 1.0
+        regressed = p50_delta > tolerance
+        ok = ok and not regressed
+        print(f"  {key(r)}: p50 {p50_delta:+.1%}, throughput {fps_delta:+.1%}"
+              f"{'  <-- REGRESSION' if regressed else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark InferenceEngine latency and throughput.")
+    parser.add_argument("--config", default="config/settings.yaml")
+    parser.add_argument("--models", nargs="+", help="Model files (.tflite/.onnx). Default: model.path from config")
+    parser.add_argument("--threads", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1])
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--output", default="logs/benchmark.json")
+    parser.add_argument("--compare", help="Previous JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed p50 slowdown (fraction)")
+    args = parser.parse_args()
+
+    models = args.models or [Config(args.config).get("model", "path")]
+    results = []
+    for model_path in models:
+        for num_threads in args.threads:
+            for batch_size in args.batch_sizes:
+                result = run_isolated(args.config, model_path, num_threads, batch_size,
+                                      args.warmup, args.iterations)
+                results.append(result)
+                if "error" in result:
+                    print(f"{model_path} threads={num_threads} batch={batch_size}: ERROR {result['error']}")
+                else:
+                    lat = result["latency_ms"]
+                    print(f"{model_path} [{result['backend']}] threads={num_threads} batch={batch_size}: "
+                          f"p50={lat['p50']:.1f}ms p90={lat['p90']:.1f}ms p99={lat['p99']:.1f}ms "
+                          f"{result['throughput_fps']:.1f} fps, peak RSS {result['peak_rss_mb']:.0f} MB")
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "host": {
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count()
+        },
+        "settings": {"warmup": args.warmup, "iterations": args.iterations},
+        "results": results
+    }
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.output}")
+
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Fleet load generator for the result ingestion path.
+
+Simulates N edge nodes, each with its own Communicator (same payload shape, codecs,
+batching and delivery workers as a real node), publishing synthetic results over MQTT
+and/or REST at a fixed rate. Nodes are spread over several processes, one thread per node.
+With --db, the results database is polled while the test runs to measure the end-to-end
+latency until each record is committed, the stored throughput and the loss rate.
+
+Example:
+    python tools/load_test_fleet.py --nodes 50 --rate 2 --duration 60 --channel rest \
+        --db logs/rest_data/results.db --output logs/load_test.json
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Edge node modules live in src/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from config import Config
+from communication import Communicator, PUBLISH_FAILURES
+from pipeline import DeadlineScheduler
+
+
+def percentiles(values, scale=1000.0):
+    """
+    Returns p50/p90/p99/max of values (seconds) in milliseconds, or None if empty.
+    """
+    if not values:
+        return None
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {"p50": round(p50 * scale, 2), "p90": round(p90 * scale, 2), "p99": round(p99 * scale, 2),
+            "max": round(max(values) * scale, 2), "count": len(values)}
+
+
+def synthetic_payload(rng, num_classes=1000, top_k=5):
+    """
+    Builds a payload shaped like the ones Pipeline publishes with postprocessing enabled.
+    """
+    scores = np.sort(rng.dirichlet(np.ones(top_k)))[::-1]
+    return {
+        "result": {
+            "classes": rng.choice(num_classes, top_k, replace=False).tolist(),
+            "scores": [round(float(s), 4) for s in scores]
+        },
+        "temperature": round(float(rng.uniform(18.0, 30.0)), 2)
+    }
+
+
+def run_nodes(config_path, overrides, node_ids, topic_prefix, rate, duration, drain_timeout, seed, queue):
+    """
+    Runs a group of virtual nodes in the current (child) process and puts their totals in queue.
+    """
+    # Per-message delivery logs of hundreds of nodes would dominate the run
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        cfg = Config.load(config_path).with_overrides(overrides)
+        comms = []
+        for node_id in node_ids:
+            node_overrides = {"communication": {"node_id": node_id}}
+            if topic_prefix:
+                node_overrides["communication"]["mqtt"] = {"topic": f"{topic_prefix}/{node_id}"}
+            comms.append(Communicator(config=cfg.with_overrides(node_overrides)))
+
+        sent = [0] * len(comms)
+        call_seconds = [[] for _ in comms]
+        deadline = time.monotonic() + duration
+
+        def publish_loop(index):
+            rng = np.random.default_rng(seed + index)
+            scheduler = DeadlineScheduler(1.0 / rate if rate > 0 else 0)
+            while scheduler.wait() and time.monotonic() < deadline:
+                payload = synthetic_payload(rng)
+                started = time.perf_counter()
+                comms[index].publish_result(payload)
+                call_seconds[index].append(time.perf_counter() - started)
+                sent[index] += 1
+
+        threads = [threading.Thread(target=publish_loop, args=(i,), daemon=True) for i in range(len(comms))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Let the delivery workers empty their queues before counting
+        drain_deadline = time.monotonic() + drain_timeout
+        while time.monotonic() < drain_deadline:
+            if not any(worker.pending() for comm in comms for worker in comm.workers.values()):
+                break
+            time.sleep(0.1)
+
+        workers = [worker for comm in comms for worker in comm.workers.values()]
+        failed_attempts = sum(PUBLISH_FAILURES.labels(channel).value for channel in ("mqtt", "rest", "serialize"))
+        result = {
+            "sent": sum(sent),
+            # Synchronous sends are not retried, so every failed attempt is a lost message
+            "delivered": (sum(worker.delivered for worker in workers) if workers
+                          else sum(sent) - failed_attempts),
+            "pending": sum(worker.pending() for worker in workers),
+            "dropped": sum(worker.dropped for worker in workers),
+            "failed_attempts": failed_attempts,
+            "publish_call_seconds": [s for node in call_seconds for s in node]
+        }
+        for comm in comms:
+            comm.stop()
+        queue.put(result)
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+
+class StorageWatcher:
+    """
+    Polls the results database for records of the virtual nodes and records, for each,
+    the time from "sent_at" until it was seen committed (end to end) and until the
+    receiver accepted it ("received_at"). Only rows added after start() are read.
+    """
+
+    def __init__(self, db_path, node_prefix, poll_interval=0.2):
+        self.db_path = db_path
+        self.node_prefix = node_prefix
+        self.poll_interval = float(poll_interval)
+        self.end_to_end = []
+        self.ingest = []
+        self.seen = set()
+        self.duplicates = 0
+        self.first_seen = None
+        self.last_seen = None
+        self._last_id = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._db = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+        self._last_id = self._db.execute("SELECT COALESCE(MAX(id), 0) FROM results").fetchone()[0]
+        self._thread = threading.Thread(target=self._run, name="storage-watcher", daemon=True)
+        self._thread.start()
+
+    def wait_for(self, count, timeout):
+        """
+        Waits until count records were seen or timeout seconds passed.
+        """
+        deadline = time.monotonic() + timeout
+        while len(self.seen) < count and time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self._db.close()
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            self._poll()
+
+    def _poll(self):
+        rows = self._db.execute(
+            "SELECT id, received_at, node, payload FROM results WHERE id > ? AND node LIKE ? ORDER BY id",
+            (self._last_id, self.node_prefix + "%")
+        ).fetchall()
+        now = time.time()
+        for row_id, received_at, node, payload in rows:
+            self._last_id = row_id
+            record = json.loads(payload)
+            key = (node, record.get("seq"))
+            if key in self.seen:
+                self.duplicates += 1
+                continue
+            self.seen.add(key)
+            sent_at = record.get("sent_at")
+            if isinstance(sent_at, (int, float)):
+                self.end_to_end.append(now - sent_at)
+                self.ingest.append(received_at - sent_at)
+        if rows:
+            self.first_seen = self.first_seen or now
+            self.last_seen = now
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a fleet of edge nodes publishing results.")
+    parser.add_argument("--config", default="config/settings.yaml")
+    parser.add_argument("--nodes", type=int, default=10, help="virtual nodes")
+    parser.add_argument("--processes", type=int, default=0, help="worker processes (0 = min(nodes, CPU count))")
+    parser.add_argument("--rate", type=float, default=1.0, help="messages per second per node (0 = as fast as possible)")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of publishing")
+    parser.add_argument("--channel", choices=("mqtt", "rest", "both", "config"), default="config",
+                        help="channels to use (default: as configured)")
+    parser.add_argument("--broker", help="MQTT broker host (default: from config)")
+    parser.add_argument("--rest-url", help="REST receiver base URL, e.g. http://localhost:5000")
+    parser.add_argument("--topic-prefix", help="publish each node to <prefix>/<node id> instead of the configured topic")
+    parser.add_argument("--sync", action="store_true", help="publish synchronously instead of through delivery workers")
+    parser.add_argument("--node-prefix", help="node id prefix (default: load-<timestamp>)")
+    parser.add_argument("--db", help="results database to measure end-to-end latency and losses")
+    parser.add_argument("--drain-timeout", type=float, default=30.0, help="seconds to wait for pending messages")
+    parser.add_argument("--output", default="logs/load_test.json")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    node_prefix = args.node_prefix or f"load-{datetime.now():%Y%m%d%H%M%S}"
+    node_ids = [f"{node_prefix}-{i:04d}" for i in range(args.nodes)]
+    processes = args.processes or min(args.nodes, os.cpu_count() or 1)
+
+    # Every virtual node publishes every result through its own (spool-less) Communicator
+    communication = {"policy": {"mode": "all"}, "publisher": {"async": not args.sync, "spool_path": None}}
+    if args.channel != "config":
+        communication["mqtt"] = {"enabled": args.channel in ("mqtt", "both")}
+        communication["rest"] = {"enabled": args.channel in ("rest", "both")}
+    if args.broker:
+        communication.setdefault("mqtt", {})["broker"] = args.broker
+    if args.rest_url:
+        communication.setdefault("rest", {}).update(
+            endpoint=f"{args.rest_url}/api/results", batch_endpoint=f"{args.rest_url}/api/results/batch"
+        )
+    overrides = {"communication": communication}
+
+    watcher = None
+    if args.db:
+        watcher = StorageWatcher(args.db, node_prefix)
+        watcher.start()
+
+    logging.info(f"Starting {args.nodes} virtual nodes in {processes} processes "
+                 f"at {args.rate} msg/s each for {args.duration:.0f}s")
+    queue = multiprocessing.Queue()
+    workers = []
+    for index in range(processes):
+        group = node_ids[index::processes]
+        if not group:
+            continue
+        worker = multiprocessing.Process(
+            target=run_nodes,
+            args=(args.config, overrides, group, args.topic_prefix, args.rate, args.duration,
+                  args.drain_timeout, index * 1000, queue)
+        )
+        worker.start()
+        workers.append(worker)
+    started = time.time()
+    results = [queue.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    elapsed = time.time() - started
+
+    errors = [r["error"] for r in results if "error" in r]
+    results = [r for r in results if "error" not in r]
+    totals = {key: sum(r[key] for r in results)
+              for key in ("sent", "delivered", "pending", "dropped", "failed_attempts")}
+    call_seconds = [s for r in results for s in r["publish_call_seconds"]]
+    sent = totals["sent"]
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "settings": {
+            "nodes": args.nodes, "processes": processes, "rate": args.rate, "duration": args.duration,
+            "channel": args.channel, "async": not args.sync, "node_prefix": node_prefix
+        },
+        "publish": dict(totals, error_rate=round(totals["failed_attempts"] / sent, 4) if sent else None,
+                        throughput=round(sent / args.duration, 2)),
+        "latency_ms": {"publish_call": percentiles(call_seconds)},
+        "errors": errors
+    }
+
+    if watcher:
+        # With both channels each message is stored twice; copies count as duplicates
+        watcher.wait_for(sent, args.drain_timeout)
+        watcher.stop()
+        stored = len(watcher.seen)
+        window = (watcher.last_seen - started) if watcher.last_seen else elapsed
+        report["storage"] = {
+            "stored": stored,
+            "duplicates": watcher.duplicates,
+            "lost": max(0, sent - stored),
+            "throughput": round(stored / window, 2) if window > 0 else None
+        }
+        report["latency_ms"]["end_to_end"] = percentiles(watcher.end_to_end)
+        report["latency_ms"]["ingest"] = percentiles(watcher.ingest)
+
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    publish = report["publish"]
+    print(f"Sent {publish['sent']} ({publish['throughput']} msg/s), delivered {publish['delivered']}, "
+          f"pending {publish['pending']}, dropped {publish['dropped']}, "
+          f"failed attempts {publish['failed_attempts']} (error rate {publish['error_rate']})")
+    if "storage" in report:
+        storage = report["storage"]
+        e2e = report["latency_ms"]["end_to_end"]
+        print(f"Stored {storage['stored']} ({storage['throughput']} msg/s), lost {storage['lost']}, "
+              f"duplicates {storage['duplicates']}"
+              + (f", end-to-end p50 {e2e['p50']} ms p99 {e2e['p99']} ms" if e2e else ""))
+    for error in errors:
+        print(f"ERROR: {error}")
+    print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
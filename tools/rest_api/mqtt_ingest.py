@@ -0,0 +1,333 @@
+"""
+MQTT ingestion service: subscribes to the result topics of the fleet and stores every
+record in the same SQLite database as the REST receiver.
+
+The paho network thread only enqueues raw messages; decoder threads decode them and
+hand them to ResultStore in batches. Per-node sequence numbers ("seq" in the payload)
+reveal lost messages and "sent_at" gives the delivery latency. Throughput statistics
+are logged every --stats-interval seconds.
+
+Usage:
+    python mqtt_ingest.py --broker mqtt --topic "rpi/ai/results/#" --qos 1
+"""
+import argparse
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+import zlib
+from collections import deque
+
+import numpy as np
+from storage import ResultStore
+
+# Shared payload codecs live in src/ (copied next to this file in the container image)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+from payload_codec import decode_payload, detect_content_type
+
+
+class SequenceTracker:
+    """
+    Follows the sequence numbers and delivery latency of each node.
+    Counts are per decoded record ("records"), so a batch message counts once per record.
+    Each (node, topic) pair is followed on its own, so two nodes sharing a node id (e.g.
+    copies of the same settings) do not merge their sequences unless they also share a topic.
+
+    A sequence number that skips ahead counts the skipped messages as missing. A
+    sequence number of 0 after other messages means the node restarted; any other
+    number at or below the last one is counted as a duplicate (e.g. a QoS 1 redelivery).
+    Latencies are kept for the current statistics window only (the newest max_latencies).
+    """
+
+    def __init__(self, max_latencies=100000):
+        self.nodes = {}
+        self._latencies = deque(maxlen=max_latencies)
+        self._lock = threading.Lock()
+
+    def observe(self, node, seq, sent_at, received_at, topic=None):
+        key = (node, topic)
+        if topic is not None and node != topic:
+            node = f"{node} on '{topic}'"
+        with self._lock:
+            state = self.nodes.get(key)
+            if state is None:
+                state = self.nodes[key] = {
+                    "records": 0, "missing": 0, "duplicates": 0, "restarts": 0,
+                    "last_seq": None, "last_latency": None
+                }
+            state["records"] += 1
+            if isinstance(seq, int):
+                last = state["last_seq"]
+                if last is None or seq == last + 1:
+                    state["last_seq"] = seq
+                elif seq > last + 1:
+                    state["missing"] += seq - last - 1
+                    logging.warning(f"{node}: {seq - last - 1} messages missing (seq {last} -> {seq})")
+                    state["last_seq"] = seq
+                elif seq == 0:
+                    state["restarts"] += 1
+                    logging.info(f"{node}: sequence restarted (node restart)")
+                    state["last_seq"] = seq
+                else:
+                    state["duplicates"] += 1
+            if isinstance(sent_at, (int, float)):
+                latency = received_at - sent_at
+                state["last_latency"] = latency
+                self._latencies.append(latency)
+
+    def take_latencies(self):
+        """
+        Returns the latencies observed since the previous call.
+        """
+        with self._lock:
+            latencies = list(self._latencies)
+            self._latencies.clear()
+        return latencies
+
+    def totals(self):
+        with self._lock:
+            return {
+                key: sum(state[key] for state in self.nodes.values())
+                for key in ("records", "missing", "duplicates", "restarts")
+            }
+
+
+class MqttIngestor:
+    """
+    Subscribes to MQTT topics and writes the decoded records to a ResultStore.
+
+    topics is a list of (topic filter, qos) pairs; wildcards (+, #) are allowed. client is
+    a paho-compatible client (connect, subscribe, loop_start, loop_stop, disconnect and the
+    on_connect/on_message attributes); by default a paho Client is created, with a
+    persistent session when client_id is given, so the broker keeps QoS 1 messages while
+    the service restarts. Tests can pass a fake client, or call handle_message() directly.
+
+    handle_message() runs on the network thread and never decodes: it queues the raw
+    message, waiting at most put_timeout seconds when queue_size messages are already
+    pending, and drops it afterwards. decoders threads take up to batch_size messages at a
+    time, decode them (JSON, MessagePack or CBOR, detected per message) and add them to
+    the store in one call per sender. Each topic is always decoded by the same thread, so
+    the messages of a node are tracked in arrival order.
+    """
+
+    def __init__(self, store, topics=(("rpi/ai/results/#", 1),), broker="localhost", port=1883,
+                 client=None, client_id=None, queue_size=10000, decoders=1, batch_size=500,
+                 put_timeout=1.0, log_messages=False):
+        self.store = store
+        self.topics = [(topic, int(qos)) for topic, qos in topics]
+        self.broker = broker
+        self.port = port
+        self.batch_size = max(1, int(batch_size))
+        self.put_timeout = float(put_timeout)
+        self.log_messages = log_messages
+        self.tracker = SequenceTracker()
+
+        self.received = 0
+        self.stored = 0
+        self.decode_errors = 0
+        self.dropped = 0
+
+        decoders = max(1, int(decoders))
+        self._queues = [queue.Queue(maxsize=max(1, int(queue_size) // decoders)) for _ in range(decoders)]
+        self._threads = []
+        self._stop = threading.Event()
+        self._counter_lock = threading.Lock()
+
+        if client is None:
+            import paho.mqtt.client as mqtt
+            client = mqtt.Client(client_id=client_id or "", clean_session=not client_id)
+        self.client = client
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+
+    def start(self):
+        """
+        Starts the decoder threads and connects to the broker in the background.
+        """
+        for index, messages in enumerate(self._queues):
+            thread = threading.Thread(target=self._decode_loop, args=(messages,),
+                                      name=f"mqtt-decoder-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self.client.connect_async(self.broker, self.port)
+        self.client.loop_start()
+        logging.info(f"Connecting to MQTT broker at {self.broker}:{self.port}")
+
+    def stop(self, timeout=10.0):
+        """
+        Disconnects, decodes the messages still queued and flushes the store.
+        """
+        self.client.loop_stop()
+        self.client.disconnect()
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self.store.flush(timeout)
+
+    def handle_message(self, topic, payload, received_at=None):
+        """
+        Queues one raw message for decoding. Returns False if it was dropped.
+        """
+        messages = self._queues[zlib.crc32(topic.encode()) % len(self._queues)]
+        try:
+            messages.put((topic, payload, received_at or time.time()), timeout=self.put_timeout)
+        except queue.Full:
+            with self._counter_lock:
+                self.dropped += 1
+            return False
+        with self._counter_lock:
+            self.received += 1
+        return True
+
+    def pending(self):
+        return sum(messages.qsize() for messages in self._queues)
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc != 0:
+            logging.error(f"MQTT connection refused (rc={rc})")
+            return
+        # Subscribing on every (re)connect restores the subscriptions after a broker restart
+        client.subscribe(self.topics)
+        logging.info(f"Subscribed to {', '.join(f'{t} (QoS {q})' for t, q in self.topics)}")
+
+    def _on_message(self, client, userdata, msg):
+        self.handle_message(msg.topic, msg.payload)
+
+    def _next_batch(self, messages):
+        try:
+            batch = [messages.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(messages.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _decode_loop(self, messages):
+        while True:
+            batch = self._next_batch(messages)
+            if not batch:
+                if self._stop.is_set():
+                    return
+                continue
+
+            by_topic = {}
+            errors = 0
+            for topic, payload, received_at in batch:
+                content_type = detect_content_type(payload)
+                try:
+                    data = decode_payload(payload, content_type)
+                except Exception as e:
+                    logging.error(f"Could not decode message on '{topic}' as {content_type}: {e}")
+                    errors += 1
+                    continue
+                records = data if isinstance(data, list) else [data]
+                for record in records:
+                    if not isinstance(record, dict):
+                        errors += 1
+                        continue
+                    if self.log_messages:
+                        logging.info(f"Message on '{topic}' ({content_type}, {len(payload)} bytes): {record}")
+                    self.tracker.observe(record.get("node", topic), record.get("seq"),
+                                         record.get("sent_at"), received_at, topic=topic)
+                    by_topic.setdefault(topic, []).append(record)
+
+            for topic, records in by_topic.items():
+                self.store.add(records, node=topic)
+            with self._counter_lock:
+                self.stored += sum(len(records) for records in by_topic.values())
+                self.decode_errors += errors
+
+    def stats(self):
+        """
+        Returns cumulative counters and the latency percentiles (seconds) since the last call.
+        "received" counts raw MQTT messages; the sequence totals over decoded records are
+        under "sequence".
+        """
+        latencies = self.tracker.take_latencies()
+        with self._counter_lock:
+            result = {
+                "received": self.received,
+                "stored": self.stored,
+                "decode_errors": self.decode_errors,
+                "dropped": self.dropped,
+                "pending": self.pending(),
+                "written": self.store.written,
+                "nodes": len(self.tracker.nodes)
+            }
+        result["sequence"] = self.tracker.totals()
+        if latencies:
+            p50, p99 = np.percentile(latencies, [50, 99])
+            result["latency"] = {"p50": round(float(p50), 4), "p99": round(float(p99), 4),
+                                 "max": round(max(latencies), 4)}
+        return result
+
+
+def parse_topic(value, default_qos):
+    """
+    Parses "topic" or "topic:qos" (e.g. "rpi/ai/results/#:1").
+    """
+    topic, sep, qos = value.rpartition(":")
+    if sep and qos.isdigit():
+        return topic, int(qos)
+    return value, default_qos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Store MQTT result messages in the results database.")
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--topic", action="append", help="topic filter, optionally with :qos (repeatable)")
+    parser.add_argument("--qos", type=int, default=1, choices=(0, 1, 2), help="default QoS of the subscriptions")
+    parser.add_argument("--client-id", default="edge-ingest", help="persistent session id ('' for a clean session)")
+    parser.add_argument("--db", default="logs/rest_data/results.db")
+    parser.add_argument("--batch-size", type=int, default=500, help="records per database transaction")
+    parser.add_argument("--flush-interval", type=float, default=1.0)
+    parser.add_argument("--synchronous", default="NORMAL", choices=("OFF", "NORMAL", "FULL"))
+    parser.add_argument("--queue-size", type=int, default=10000, help="raw messages buffered before dropping")
+    parser.add_argument("--decoders", type=int, default=1)
+    parser.add_argument("--stats-interval", type=float, default=10.0)
+    parser.add_argument("--log-messages", action="store_true", help="log every decoded message (debugging)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    topics = [parse_topic(t, args.qos) for t in (args.topic or ["rpi/ai/results/#"])]
+
+    store = ResultStore(args.db, batch_size=args.batch_size, flush_interval=args.flush_interval,
+                        synchronous=args.synchronous)
+    ingestor = MqttIngestor(store, topics, broker=args.broker, port=args.port, client_id=args.client_id,
+                            queue_size=args.queue_size, decoders=args.decoders, batch_size=args.batch_size,
+                            log_messages=args.log_messages)
+    ingestor.start()
+
+    last_received, last_time = 0, time.monotonic()
+    try:
+        while True:
+            time.sleep(args.stats_interval)
+            stats = ingestor.stats()
+            sequence = stats["sequence"]
+            now = time.monotonic()
+            rate = (stats["received"] - last_received) / (now - last_time)
+            last_received, last_time = stats["received"], now
+            latency = stats.get("latency")
+            logging.info(
+                f"{rate:.1f} msg/s | received {stats['received']} stored {stats['written']} "
+                f"pending {stats['pending']} dropped {stats['dropped']} errors {stats['decode_errors']} | "
+                f"{stats['nodes']} nodes, missing {sequence['missing']} duplicates {sequence['duplicates']} "
+                f"restarts {sequence['restarts']}"
+                + (f" | latency p50 {latency['p50'] * 1000:.0f} ms p99 {latency['p99'] * 1000:.0f} ms" if latency else "")
+            )
+    except KeyboardInterrupt:
+        logging.info("Stopping...")
+    finally:
+        ingestor.stop()
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
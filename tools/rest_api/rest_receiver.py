@@ -1,9 +1,31 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, send_file
+import atexit
 import logging
 import os
+import re
+import shutil
+import sys
 import json
+import gzip
+import math
+import threading
 from datetime import datetime
-import csv
+import tempfile
+from werkzeug.utils import secure_filename
+from storage import ResultStore
+
+# Shared payload codecs live in src/ (copied next to this file in the container image)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+from payload_codec import decode_payload
+from model_fetcher import file_sha256
+from config import Config
+
+# Model validation needs the TFLite runtime (installed in the container image)
+try:
+    from validate_model import validate_tflite_model, compare_models
+    VALIDATION_AVAILABLE = True
+except ImportError:
+    VALIDATION_AVAILABLE = False
 
 # Flask app initialization
 app = Flask(__name__)
@@ -11,8 +33,30 @@ app = Flask(__name__)
 # Folder to store received data and models
 DATA_DIR = "logs/rest_data"
 MODEL_PATH = "models/model.tflite"
+# Uploads are checked against the same settings.yaml as the edge nodes and validate_model.py,
+# so the server and the CLI enforce the same input shape and regression tolerances
+CONFIG = Config.load("config/settings.yaml")
+MODEL_INPUT_SHAPE = list(CONFIG.get("model", "input_shape"))
+REGRESSION_GATE = dict(CONFIG.get("model", "regression_gate", default={}))
+# Uploads are compared with the current model on this golden set (skipped if the file is missing)
+GOLDEN_SET_PATH = REGRESSION_GATE.get("golden_set", "models/golden_set.npz")
+# Model versions are stored by SHA-256; chunked uploads are assembled in UPLOAD_DIR
+MODEL_STORE_DIR = "models/store"
+UPLOAD_DIR = os.path.join(MODEL_STORE_DIR, "uploads")
+MAX_MODEL_BYTES = 200 * 1024 * 1024
+UPLOAD_READ_SIZE = 1024 * 1024  # bytes read from the request stream per write
+SHA256_PATTERN = re.compile(r"[0-9a-f]{64}")
+_model_hashes = {}
+_upload_locks = {}
+_upload_locks_guard = threading.Lock()
 os.makedirs(DATA_DIR, exist_ok=True)
 
+# Results database (SQLite WAL) and write batching policy
+DB_PATH = os.path.join(DATA_DIR, "results.db")
+FLUSH_INTERVAL = 1.0   # seconds between background commits
+FLUSH_BATCH_SIZE = 500  # commit early once this many records are pending
+SYNCHRONOUS = "NORMAL"  # OFF | NORMAL | FULL (fsync on every commit)
+
 # Configure logging to file
 logging.basicConfig(
     filename="logs/rest_data/rest_receiver.log",
@@ -20,46 +64,137 @@ logging.basicConfig(
     format="%(asctime)s [%(levelname)s] %(message)s"
 )
 
+store = ResultStore(DB_PATH, batch_size=FLUSH_BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                    synchronous=SYNCHRONOUS)
+atexit.register(store.close)
+
+def read_body():
+    """
+    Returns the decoded body of the current request. The codec (JSON, MessagePack or CBOR)
+    is chosen from the Content-Type header; gzip-compressed bodies are accepted.
+    """
+    body = request.get_data()
+    if request.content_encoding == "gzip":
+        body = gzip.decompress(body)
+    return decode_payload(body, request.mimetype)
+
 @app.route("/api/results", methods=["POST"])
 def receive_result():
     """
     REST API endpoint that receives POST requests with AI inference and sensor data.
-    Saves each request to a JSON file and appends to a CSV log.
-    """
-    data = request.json
-    timestamp = datetime.now().isoformat(timespec="seconds")
-
-    # Log the received payload
-    logging.info(f"Received at {timestamp}: {data}")
-    print(f"\n{timestamp} → {data}")
-
-    # Save each request to an individual JSON file
-    json_path = os.path.join(DATA_DIR, f"{timestamp.replace(':', '-')}.json")
-    with open(json_path, "w") as f:
-        json.dump(data, f, indent=2)
-
-    # Append data to a CSV log for analysis
-    csv_path = os.path.join(DATA_DIR, "data_log.csv")
-    write_header = not os.path.exists(csv_path)
-
-    # Flatten result if it's a list or dict
-    result = data.get("result", None)
-    if isinstance(result, (list, dict)):
-        result = json.dumps(result)
-
-    with open(csv_path, "a", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=["timestamp", "result", "temperature"])
-        if write_header:
-            writer.writeheader()
-        writer.writerow({
-            "timestamp": timestamp,
-            "result": result,
-            "temperature": data.get("temperature", None)
-        })
+    Queues the record for the results database; writes are batched in the background.
+    """
+    try:
+        data = read_body()
+    except (OSError, ValueError) as e:
+        return jsonify({"status": "error", "message": f"Invalid payload: {e}"}), 400
+    if not isinstance(data, dict):
+        return jsonify({"status": "error", "message": "Expected a single record object."}), 400
+
+    logging.debug(f"Received from {request.remote_addr}: {data}")
+    store.add([data], node=request.remote_addr)
 
     # Return JSON response
     return jsonify({"status": "ok"}), 200
 
+@app.route("/api/results/batch", methods=["POST"])
+def receive_results_batch():
+    """
+    Receives an array of result records in a single request (optionally gzip-compressed).
+    """
+    try:
+        records = read_body()
+    except (OSError, ValueError) as e:
+        return jsonify({"status": "error", "message": f"Invalid payload: {e}"}), 400
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        return jsonify({"status": "error", "message": "Expected an array of record objects."}), 400
+
+    logging.debug(f"Received {len(records)} records from {request.remote_addr}")
+    store.add(records, node=request.remote_addr)
+    return jsonify({"status": "ok", "received": len(records)}), 200
+
+# Time bucket sizes accepted by /api/results/stats, e.g. "30s", "1m", "1h"
+BUCKET_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+MIN_BUCKET_SECONDS = 1
+MAX_BUCKETS = 10000  # buckets per /api/results/stats response
+MAX_QUERY_LIMIT = 1000
+
+def parse_time(value, default):
+    """
+    Parses a query parameter given as unix seconds or an ISO 8601 timestamp.
+    """
+    if value is None or value == "":
+        return default
+    try:
+        seconds = float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+    if not math.isfinite(seconds):
+        raise ValueError(f"{value} is not a finite time")
+    return seconds
+
+def parse_bucket(value):
+    """
+    Parses a bucket size such as "1m" into seconds (at least MIN_BUCKET_SECONDS).
+    """
+    unit = value[-1:].lower()
+    if unit in BUCKET_UNITS:
+        seconds = float(value[:-1]) * BUCKET_UNITS[unit]
+    else:
+        seconds = float(value)
+    if not math.isfinite(seconds) or seconds < MIN_BUCKET_SECONDS:
+        raise ValueError(f"bucket must be at least {MIN_BUCKET_SECONDS}s")
+    return seconds
+
+def parse_range():
+    """
+    Returns the (start, end, node) filter of the current query; defaults to the last hour.
+    """
+    now = datetime.now().timestamp()
+    end = parse_time(request.args.get("to"), now)
+    start = parse_time(request.args.get("from"), end - 3600)
+    return start, end, request.args.get("node")
+
+@app.route("/api/results", methods=["GET"])
+def query_results():
+    """
+    Returns stored records in a time range.
+    Query parameters: from, to (unix seconds or ISO 8601; default: last hour), node, limit.
+    """
+    try:
+        start, end, node = parse_range()
+        limit = int(request.args.get("limit", 100))
+        if not 1 <= limit <= MAX_QUERY_LIMIT:
+            raise ValueError(f"limit must be between 1 and {MAX_QUERY_LIMIT}")
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Invalid query: {e}"}), 400
+
+    store.flush()
+    records = store.query(start, end, node=node, limit=limit)
+    for record in records:
+        record["received_at"] = datetime.fromtimestamp(record["received_at"]).isoformat()
+    return jsonify({"status": "ok", "count": len(records), "results": records}), 200
+
+@app.route("/api/results/stats", methods=["GET"])
+def results_stats():
+    """
+    Returns per-bucket aggregates (record count, temperature min/avg/max, top-class counts).
+    Query parameters: from, to, node and bucket (e.g. "30s", "1m", "1h"; default "1m").
+    """
+    try:
+        start, end, node = parse_range()
+        bucket = parse_bucket(request.args.get("bucket", "1m"))
+        if (end - start) / bucket > MAX_BUCKETS:
+            raise ValueError(f"more than {MAX_BUCKETS} buckets; use a larger bucket or a shorter range")
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Invalid query: {e}"}), 400
+
+    store.flush()
+    buckets = store.stats(start, end, bucket_seconds=bucket, node=node)
+    for entry in buckets:
+        entry["start"] = datetime.fromtimestamp(entry["start"]).isoformat()
+    return jsonify({"status": "ok", "bucket_seconds": bucket, "buckets": buckets}), 200
+
 @app.route("/api/battery", methods=["GET"])
 def get_battery_level():
     """
@@ -88,10 +223,77 @@ def get_battery_level():
             "message": "No battery detected. System likely running on external power."
         }), 200
 
+def model_version(path):
+    """
+    Returns {"sha256", "size_bytes", "last_modified"} of a model file, hashing it only when it changed.
+    """
+    st = os.stat(path)
+    signature = (st.st_size, st.st_mtime_ns, st.st_ino)
+    cached = _model_hashes.get(path)
+    if cached is None or cached[0] != signature:
+        cached = (signature, file_sha256(path))
+        _model_hashes[path] = cached
+    return {
+        "sha256": cached[1],
+        "size_bytes": st.st_size,
+        "last_modified": datetime.fromtimestamp(st.st_mtime).isoformat()
+    }
+
+def version_path(sha256):
+    return os.path.join(MODEL_STORE_DIR, f"{sha256}.tflite")
+
+def activate_model(sha256):
+    """
+    Makes a stored version the current model with an atomic rename over MODEL_PATH.
+    """
+    model_dir = os.path.dirname(MODEL_PATH) or "."
+    staged_path = os.path.join(model_dir, f".activate-{sha256[:16]}.tflite")
+    if os.path.exists(staged_path):
+        os.remove(staged_path)
+    try:
+        os.link(version_path(sha256), staged_path)
+    except OSError:
+        shutil.copyfile(version_path(sha256), staged_path)
+    os.chmod(staged_path, 0o644)
+    os.replace(staged_path, MODEL_PATH)
+
+def install_model(staged_path, filename, sha256):
+    """
+    Validates a completely received model, stores it under its hash and makes it current.
+    Returns a Flask (response, status) pair. staged_path is consumed on success.
+    """
+    if VALIDATION_AVAILABLE:
+        if not validate_tflite_model(staged_path, MODEL_INPUT_SHAPE):
+            logging.warning(f"Rejected model upload {filename}: validation failed")
+            return jsonify({"status": "error", "message": "Model validation failed."}), 422
+        if os.path.exists(GOLDEN_SET_PATH) and os.path.exists(MODEL_PATH):
+            report = compare_models(MODEL_PATH, staged_path, GOLDEN_SET_PATH,
+                                    tolerances=REGRESSION_GATE,
+                                    num_threads=CONFIG.get("model", "num_threads"),
+                                    mean=CONFIG.get("model", "input_mean", default=127.5),
+                                    std=CONFIG.get("model", "input_std", default=127.5))
+            if not report["passed"]:
+                logging.warning(f"Rejected model upload {filename}: {'; '.join(report['reasons'])}")
+                return jsonify({
+                    "status": "error",
+                    "message": "Model regressed against the current model.",
+                    "report": report
+                }), 422
+            logging.info(f"Model {filename} passed the regression gate: {json.dumps(report)}")
+    else:
+        logging.warning("TFLite runtime not available; model uploaded without validation.")
+
+    os.chmod(staged_path, 0o644)
+    os.replace(staged_path, version_path(sha256))
+    activate_model(sha256)
+    logging.info(f"Model {filename} ({sha256}) stored and activated as {MODEL_PATH}")
+    return jsonify({"status": "ok", "message": "Model uploaded successfully.", "sha256": sha256}), 200
+
 @app.route("/api/model/info", methods=["GET"])
 def model_info():
     """
-    Returns basic information about the current model file.
+    Returns information about the current model, including its SHA-256 and download URL.
+    Edge nodes poll this to pull a new model only when the hash differs.
     """
     if not os.path.exists(MODEL_PATH):
         return jsonify({
@@ -99,20 +301,176 @@ def model_info():
             "message": "No model file found."
         }), 404
 
-    info = {
-        "filename": os.path.basename(MODEL_PATH),
-        "size_bytes": os.path.getsize(MODEL_PATH),
-        "last_modified": datetime.fromtimestamp(os.path.getmtime(MODEL_PATH)).isoformat()
-    }
+    info = dict(filename=os.path.basename(MODEL_PATH), **model_version(MODEL_PATH))
+    if os.path.exists(version_path(info["sha256"])):
+        info["url"] = f"/api/model/versions/{info['sha256']}"
     return jsonify({
         "status": "ok",
         "model": info
     }), 200
 
+@app.route("/api/model/versions", methods=["GET"])
+def model_versions():
+    """
+    Lists the stored model versions (content-addressed by SHA-256), newest first.
+    """
+    versions = []
+    if os.path.isdir(MODEL_STORE_DIR):
+        for name in os.listdir(MODEL_STORE_DIR):
+            sha256, ext = os.path.splitext(name)
+            if ext == ".tflite" and SHA256_PATTERN.fullmatch(sha256):
+                st = os.stat(os.path.join(MODEL_STORE_DIR, name))
+                versions.append({"sha256": sha256, "size_bytes": st.st_size, "stored_at": st.st_mtime})
+    versions.sort(key=lambda v: v["stored_at"], reverse=True)
+    for version in versions:
+        version["stored_at"] = datetime.fromtimestamp(version["stored_at"]).isoformat()
+    return jsonify({"status": "ok", "versions": versions}), 200
+
+@app.route("/api/model/versions/<sha256>", methods=["GET"])
+def download_model(sha256):
+    """
+    Serves a stored model version. Range requests are supported, so interrupted
+    downloads can resume; the ETag is the SHA-256.
+    """
+    if not SHA256_PATTERN.fullmatch(sha256) or not os.path.exists(version_path(sha256)):
+        return jsonify({"status": "error", "message": "Unknown model version."}), 404
+    # send_file resolves relative paths against the app directory, not the working directory
+    response = send_file(os.path.abspath(version_path(sha256)), mimetype="application/octet-stream",
+                         conditional=True, etag=sha256, download_name=f"{sha256}.tflite")
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+@app.route("/api/model/uploads", methods=["POST"])
+def create_upload():
+    """
+    Starts (or resumes) a chunked model upload.
+    JSON body: {"filename", "size", "sha256"}. The upload id is the SHA-256, so a client
+    that restarts continues from the bytes already received. If that version is already
+    stored, it is activated right away (e.g. a rollback) and no data needs to be sent.
+    """
+    meta = request.get_json(silent=True) or {}
+    filename = secure_filename(str(meta.get("filename", "")))
+    sha256 = str(meta.get("sha256", "")).lower()
+    size = meta.get("size")
+    if not filename.endswith(".tflite"):
+        return jsonify({"status": "error", "message": "Only .tflite files are accepted."}), 400
+    if not SHA256_PATTERN.fullmatch(sha256):
+        return jsonify({"status": "error", "message": "sha256 must be a hex SHA-256 digest."}), 400
+    if not isinstance(size, int) or not 0 < size <= MAX_MODEL_BYTES:
+        return jsonify({"status": "error", "message": f"size must be between 1 and {MAX_MODEL_BYTES} bytes."}), 400
+
+    if os.path.exists(version_path(sha256)):
+        with upload_lock(sha256):
+            activate_model(sha256)
+        logging.info(f"Model {filename} ({sha256}) already stored; activated without upload")
+        return jsonify({"status": "ok", "complete": True, "sha256": sha256, "offset": size}), 200
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    with upload_lock(sha256):
+        with open(upload_path(sha256, ".json"), "w") as f:
+            json.dump({"filename": filename, "size": size}, f)
+        part_path = upload_path(sha256, ".part")
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    return jsonify({"status": "ok", "complete": False, "upload_id": sha256, "offset": offset}), 201
+
+@app.route("/api/model/uploads/<upload_id>", methods=["GET"])
+def upload_status(upload_id):
+    """
+    Returns the number of bytes received so far for an upload.
+    """
+    meta = read_upload(upload_id)
+    if meta is None:
+        return jsonify({"status": "error", "message": "Unknown upload."}), 404
+    part_path = upload_path(upload_id, ".part")
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    return jsonify({"status": "ok", "upload_id": upload_id, "offset": offset, "size": meta["size"]}), 200
+
+@app.route("/api/model/uploads/<upload_id>", methods=["PATCH"])
+def upload_chunk(upload_id):
+    """
+    Appends the request body to an upload. The Upload-Offset header must match the bytes
+    received so far (409 with the current offset otherwise). The body is streamed to
+    disk. Once the declared size is reached, the SHA-256 is verified and the model is
+    validated, stored and activated.
+    """
+    meta = read_upload(upload_id)
+    if meta is None:
+        return jsonify({"status": "error", "message": "Unknown upload."}), 404
+    try:
+        client_offset = int(request.headers.get("Upload-Offset", ""))
+    except ValueError:
+        return jsonify({"status": "error", "message": "Upload-Offset header required."}), 400
+
+    with upload_lock(upload_id):
+        part_path = upload_path(upload_id, ".part")
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if client_offset != offset:
+            return jsonify({"status": "error", "message": "Offset mismatch.", "offset": offset}), 409
+
+        with open(part_path, "ab") as f:
+            try:
+                while True:
+                    chunk = request.stream.read(UPLOAD_READ_SIZE)
+                    if not chunk:
+                        break
+                    if offset + len(chunk) > meta["size"]:
+                        f.truncate(client_offset)
+                        return jsonify({"status": "error", "message": "Upload exceeds the declared size.",
+                                        "offset": client_offset}), 400
+                    f.write(chunk)
+                    offset += len(chunk)
+            finally:
+                # Keep what arrived before a disconnect, so the client can resume from there
+                f.flush()
+                os.fsync(f.fileno())
+
+        if offset < meta["size"]:
+            return jsonify({"status": "ok", "complete": False, "upload_id": upload_id, "offset": offset}), 200
+
+        sha256 = file_sha256(part_path)
+        if sha256 != upload_id:
+            logging.warning(f"Rejected model upload {meta['filename']}: SHA-256 mismatch ({sha256})")
+            discard_upload(upload_id)
+            return jsonify({"status": "error", "message": "SHA-256 mismatch; upload discarded.",
+                            "sha256": sha256}), 422
+
+        os.makedirs(MODEL_STORE_DIR, exist_ok=True)
+        try:
+            response = install_model(part_path, meta["filename"], sha256)
+        except Exception as e:
+            logging.error(f"Failed to install model: {e}")
+            response = jsonify({"status": "error", "message": str(e)}), 500
+        discard_upload(upload_id)
+        return response
+
+def upload_path(upload_id, suffix):
+    return os.path.join(UPLOAD_DIR, upload_id + suffix)
+
+def read_upload(upload_id):
+    if not SHA256_PATTERN.fullmatch(upload_id):
+        return None
+    try:
+        with open(upload_path(upload_id, ".json"), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def discard_upload(upload_id):
+    for suffix in (".part", ".json"):
+        if os.path.exists(upload_path(upload_id, suffix)):
+            os.remove(upload_path(upload_id, suffix))
+
+def upload_lock(upload_id):
+    with _upload_locks_guard:
+        return _upload_locks.setdefault(upload_id, threading.Lock())
+
 @app.route("/api/model/upload", methods=["POST"])
 def upload_model():
     """
-    Uploads a new .tflite model and replaces the existing one.
+    Uploads a new .tflite model in a single multipart request (small models and older
+    clients; tools/upload_model.py uses the resumable /api/model/uploads protocol).
+    The file is streamed to a temporary file, hashed, validated and stored like a
+    chunked upload.
     """
     if 'file' not in request.files:
         return jsonify({"status": "error", "message": "No file part in request."}), 400
@@ -122,14 +480,21 @@ def upload_model():
     if file.filename == '' or not file.filename.endswith('.tflite'):
         return jsonify({"status": "error", "message": "Only .tflite files are accepted."}), 400
 
+    filename = secure_filename(file.filename)
+    os.makedirs(MODEL_STORE_DIR, exist_ok=True)
+    fd, staged_path = tempfile.mkstemp(prefix=".upload-", suffix=".tflite", dir=MODEL_STORE_DIR)
     try:
-        filename = secure_filename(file.filename)
-        file.save(MODEL_PATH)
-        logging.info(f"Model uploaded and saved as {MODEL_PATH}")
-        return jsonify({"status": "ok", "message": "Model uploaded successfully."}), 200
+        with os.fdopen(fd, "wb") as f:
+            file.save(f)
+            f.flush()
+            os.fsync(f.fileno())
+        return install_model(staged_path, filename, file_sha256(staged_path))
     except Exception as e:
         logging.error(f"Failed to upload model: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
+    finally:
+        if os.path.exists(staged_path):
+            os.remove(staged_path)
 
 if __name__ == "__main__":
     print("REST Receiver listening at http://localhost:5000/api/results")
@@ -0,0 +1,248 @@
+import base64
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL")
+
+
+def json_default(value):
+    """
+    Encodes the values MessagePack/CBOR bodies can carry but JSON cannot: binary data as
+    base64 strings and dates as ISO 8601 strings.
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode("ascii")
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def top_class(result):
+    """
+    Returns the highest-scoring class of a result: the first class of a postprocessed
+    result, or the argmax of a raw output list. None if it cannot be determined.
+    """
+    if isinstance(result, dict):
+        classes = result.get("classes") or []
+        return classes[0] if classes and isinstance(classes[0], int) else None
+    if isinstance(result, list):
+        values = result
+        while len(values) == 1 and isinstance(values[0], list):
+            values = values[0]
+        if values and all(isinstance(v, (int, float)) for v in values):
+            return max(range(len(values)), key=values.__getitem__)
+    return None
+
+
+class ResultStore:
+    """
+    Append-only result storage backed by SQLite in WAL mode.
+
+    add() only appends records to an in-memory buffer; a background flusher writes them
+    with one transaction per batch, every flush_interval seconds or as soon as batch_size
+    records are pending. The durability/throughput trade-off is set with synchronous
+    ("OFF", "NORMAL" or "FULL", as in SQLite's PRAGMA synchronous). Producers are slowed
+    down once max_pending records are waiting, so memory stays bounded.
+    """
+
+    def __init__(self, path="logs/rest_data/results.db", batch_size=500, flush_interval=1.0,
+                 synchronous="NORMAL", max_pending=50000):
+        synchronous = synchronous.upper()
+        if synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f"Unknown synchronous mode '{synchronous}'. Use one of {SYNCHRONOUS_MODES}.")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+        self.synchronous = synchronous
+        self.max_pending = max(self.batch_size, int(max_pending))
+
+        self.written = 0
+        self.rejected = 0
+        self._readers = threading.local()
+        self._pending = []
+        self._added = 0
+        self._processed = 0
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._flushed = threading.Condition(self._lock)
+        self._running = True
+
+        self._db = self._connect()
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " received_at REAL NOT NULL,"
+            " node TEXT,"
+            " temperature REAL,"
+            " top_class INTEGER,"
+            " payload TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_results_time ON results (received_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_results_node_time ON results (node, received_at)")
+
+        self._thread = threading.Thread(target=self._run, name="result-store-flusher", daemon=True)
+        self._thread.start()
+
+    def add(self, records, node=None):
+        """
+        Queues records for storage and returns immediately (unless the buffer is full).
+
+        Parameters:
+            records (list[dict]): Decoded result records
+            node (str): Sender identifier used when a record has no "node" field
+        """
+        received_at = time.time()
+        with self._cond:
+            while len(self._pending) >= self.max_pending and self._running:
+                self._flushed.wait(1.0)
+            self._pending.extend((received_at, node, record) for record in records)
+            self._added += len(records)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+
+    def flush(self, timeout=10.0):
+        """
+        Blocks until every record added so far has been written.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            target = self._added
+            self._cond.notify_all()
+            while self._processed < target and time.monotonic() < deadline:
+                self._flushed.wait(0.1)
+
+    def close(self):
+        """
+        Writes pending records and stops the flusher.
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._thread.join()
+        self._db.close()
+
+    def query(self, start, end, node=None, limit=100):
+        """
+        Returns stored records received in [start, end) (unix seconds), oldest first.
+        Served from the (received_at) / (node, received_at) indexes.
+        """
+        sql = "SELECT id, received_at, node, payload FROM results WHERE received_at >= ? AND received_at < ?"
+        params = [start, end]
+        if node:
+            sql += " AND node = ?"
+            params.append(node)
+        sql += " ORDER BY received_at, id LIMIT ?"
+        params.append(int(limit))
+        rows = self._reader().execute(sql, params).fetchall()
+        return [
+            {"id": row[0], "received_at": row[1], "node": row[2], "data": json.loads(row[3])}
+            for row in rows
+        ]
+
+    def stats(self, start, end, bucket_seconds=60, node=None):
+        """
+        Aggregates records received in [start, end) into fixed time buckets: record count,
+        temperature min/avg/max and counts per top class. Only indexed columns are read.
+        """
+        bucket_seconds = float(bucket_seconds)
+        if not math.isfinite(bucket_seconds) or bucket_seconds <= 0:
+            raise ValueError("bucket_seconds must be a positive number")
+        where = "received_at >= ? AND received_at < ?"
+        # The bucket size is the first parameter (SELECT), then the WHERE filters
+        params = [bucket_seconds, start, end]
+        if node:
+            where += " AND node = ?"
+            params.append(node)
+        bucket = "CAST(received_at / ? AS INTEGER)"
+
+        db = self._reader()
+        buckets = {}
+        for index, count, t_avg, t_min, t_max in db.execute(
+            f"SELECT {bucket} AS b, COUNT(*), AVG(temperature), MIN(temperature), MAX(temperature)"
+            f" FROM results WHERE {where} GROUP BY b ORDER BY b", params
+        ):
+            buckets[index] = {
+                "start": index * bucket_seconds,
+                "count": count,
+                "temperature": {"avg": t_avg, "min": t_min, "max": t_max},
+                "classes": {}
+            }
+        for index, cls, count in db.execute(
+            f"SELECT {bucket} AS b, top_class, COUNT(*) FROM results"
+            f" WHERE {where} AND top_class IS NOT NULL GROUP BY b, top_class", params
+        ):
+            buckets[index]["classes"][str(cls)] = count
+        return list(buckets.values())
+
+    def _reader(self):
+        # One read connection per thread; WAL lets reads run alongside the flusher's writes
+        db = getattr(self._readers, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, isolation_level=None)
+            self._readers.db = db
+        return db
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(f"PRAGMA synchronous={self.synchronous}")
+        return db
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._running and len(self._pending) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                batch, self._pending = self._pending, []
+                running = self._running
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    # Never let one bad batch stop the flusher: producers would block forever
+                    logging.exception(f"Failed to store {len(batch)} records: {e}")
+            with self._cond:
+                self._processed += len(batch)
+                self._flushed.notify_all()
+            if not running and not batch:
+                return
+
+    def _write(self, batch):
+        rows = []
+        for received_at, node, record in batch:
+            try:
+                temperature = record.get("temperature")
+                sender = record.get("node", node)
+                rows.append((
+                    received_at,
+                    sender if sender is None or isinstance(sender, str) else str(sender),
+                    temperature if isinstance(temperature, (int, float)) else None,
+                    top_class(record.get("result")),
+                    json.dumps(record, separators=(",", ":"), default=json_default)
+                ))
+            except (TypeError, ValueError, AttributeError) as e:
+                self.rejected += 1
+                logging.warning(f"Discarding a record from {node} that cannot be stored: {e}")
+        if not rows:
+            return
+        try:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT INTO results (received_at, node, temperature, top_class, payload) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._db.execute("COMMIT")
+            self.written += len(rows)
+        except (sqlite3.Error, OverflowError) as e:
+            logging.error(f"Failed to store {len(rows)} records: {e}")
+            if self._db.in_transaction:
+                self._db.execute("ROLLBACK")
@@ -1,26 +1,103 @@
-import requests
+"""
+Uploads a model to the REST receiver in chunks.
+
+The upload is identified by the model's SHA-256, so after a network error (or a restart
+of this script) it continues from the bytes the receiver already has instead of starting
+over. The receiver verifies the hash, validates the model and makes it current.
+
+Usage:
+    python tools/upload_model.py [models/model.tflite] [--url http://localhost:5000]
+"""
+import argparse
 import os
+import sys
+import time
+
+import requests
+
+# Edge node modules live in src/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from model_fetcher import file_sha256
 
-# Target REST endpoint
-UPLOAD_URL = "http://localhost:5000/api/model/upload"
+# Target REST receiver
+BASE_URL = "http://localhost:5000"
 MODEL_PATH = "models/model.tflite"  # Default model path to upload
+CHUNK_SIZE = 1024 * 1024
 
-def upload_model(filepath):
-    if not os.path.isfile(filepath):
-        print(f"File not found: {filepath}")
-        return
 
-    print(f"Uploading model: {filepath} → {UPLOAD_URL}")
-    try:
-        with open(filepath, 'rb') as f:
-            files = {'file': (os.path.basename(filepath), f, 'application/octet-stream')}
-            response = requests.post(UPLOAD_URL, files=files)
+def upload_model(filepath, base_url=BASE_URL, chunk_size=CHUNK_SIZE, retries=10, timeout=60):
+    """
+    Uploads filepath with the resumable protocol. Returns the receiver's final JSON response.
+    """
+    size = os.path.getsize(filepath)
+    sha256 = file_sha256(filepath)
+    print(f"Uploading model: {filepath} ({size} bytes, sha256 {sha256[:12]}) → {base_url}")
+
+    session = requests.Session()
+    uploads_url = f"{base_url}/api/model/uploads"
+    response = session.post(uploads_url, json={"filename": os.path.basename(filepath), "size": size,
+                                               "sha256": sha256}, timeout=timeout)
+    body = response.json()
+    if response.status_code >= 400 or body.get("complete"):
+        return body
+    upload_url = f"{uploads_url}/{body['upload_id']}"
+    offset = body["offset"]
+    if offset:
+        print(f"Resuming at byte {offset}")
+
+    failures = 0
+    with open(filepath, "rb") as f:
+        while True:
+            f.seek(offset)
+            chunk = f.read(chunk_size)
+            try:
+                response = session.patch(upload_url, data=chunk, headers={"Upload-Offset": str(offset)},
+                                         timeout=timeout)
+                body = response.json()
+            except (requests.RequestException, ValueError) as e:
+                failures += 1
+                if failures > retries:
+                    raise
+                delay = min(2 ** failures, 60)
+                print(f"Upload interrupted at byte {offset} ({e}); retrying in {delay}s")
+                time.sleep(delay)
+                try:
+                    # Ask where the receiver stands; part of the chunk may have been stored
+                    offset = session.get(upload_url, timeout=timeout).json().get("offset", offset)
+                except (requests.RequestException, ValueError):
+                    pass
+                continue
 
-        print(f"Response {response.status_code}: {response.json()}")
+            if response.status_code == 409:
+                offset = body["offset"]
+                continue
+            if response.status_code >= 400 or body.get("complete", True):
+                return body
+            failures = 0
+            offset = body["offset"]
+            print(f"  {offset}/{size} bytes ({offset / size:.0%})")
 
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload a model to the REST receiver (resumable).")
+    parser.add_argument("path", nargs="?", default=MODEL_PATH)
+    parser.add_argument("--url", default=BASE_URL, help="REST receiver base URL")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--retries", type=int, default=10, help="consecutive failed chunks before giving up")
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.path):
+        print(f"File not found: {args.path}")
+        sys.exit(1)
+    try:
+        result = upload_model(args.path, args.url, args.chunk_size, args.retries)
     except Exception as e:
         print(f"Failed to upload model: {e}")
+        sys.exit(1)
+    print(f"Response: {result}")
+    if result.get("status") != "ok":
+        sys.exit(1)
 
 
 if __name__ == "__main__":
-    upload_model(MODEL_PATH)
\ No newline at end of file
+    main()